@@ -1,3 +1,4 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 from .bench_dataset import bench_dataset
+from .evaluate import evaluate_bench_dataset
@@ -0,0 +1,153 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from nn_meter.predictor import LatencyMetrics
+logging = logging.getLogger("nn-Meter")
+
+
+def get_shards(filename, shard_size):
+    """
+    yield the shards of a jsonl file as (filename, offset, number of lines), by scanning the line breaks of the file
+    without parsing the json content. Each shard is read and parsed by the worker which evaluates it.
+    """
+    with open(filename, "rb") as fp:
+        offset, count = 0, 0
+        for line in fp:
+            if count == 0:
+                shard_offset = offset
+            offset += len(line)
+            if line.strip():
+                count += 1
+            if count == shard_size:
+                yield filename, shard_offset, count
+                count = 0
+        if count:
+            yield filename, shard_offset, count
+
+
+def read_shard(filename, offset, num_lines):
+    """ return the records of a shard of a jsonl file
+    """
+    records = []
+    with open(filename, "rb") as fp:
+        fp.seek(offset)
+        while len(records) < num_lines:
+            line = fp.readline()
+            if not line:
+                break
+            if line.strip():
+                records.append(json.loads(line))
+    return records
+
+
+def evaluate_records(predictor, records):
+    """
+    predict the nn-Meter IR graphs of the records on all devices of the `MultiDevicePredictor`, and return the list of
+    {device: (predicted latency, real latency)} of each record, where the devices without real latency are skipped
+    """
+    latencies = predictor.predict_batch([record["graph"] for record in records], model_type="nnmeter-ir")
+    return [
+        {device: (float(pred), record[device]) for device, pred in preds.items() if record.get(device) is not None}
+        for record, preds in zip(records, latencies)
+    ]
+
+
+# the predictor loaded once in each worker process
+_worker_predictor = None
+
+
+def init_evaluation_worker(predictor_names, predictor_versions):
+    global _worker_predictor
+    from nn_meter.predictor import load_multi_device_predictor
+    _worker_predictor = load_multi_device_predictor(predictor_names, predictor_versions, lazy=True)
+
+
+def evaluate_shard(filename, offset, num_lines):
+    records = read_shard(filename, offset, num_lines)
+    return filename, [record.get("id") for record in records], evaluate_records(_worker_predictor, records)
+
+
+def evaluate_bench_dataset(
+    datasets=None, predictor_names=None, predictor_versions=None, workers=1, shard_size=256, output=None
+):
+    """
+    evaluate the latency predictors on the benchmark dataset. The jsonl files are split into shards of `shard_size`
+    lines, which are evaluated by worker processes, each loading the predictors once and predicting each shard in one
+    batch on all devices. The metrics of `latency_metrics` are accumulated shard by shard.
+    @params:
+
+    datasets: the list of jsonl files of the dataset. The benchmark dataset is downloaded and used if not specified.
+
+    predictor_names: the list of predictor names, whose latency is recorded in the dataset with the predictor name as
+        the key. All built-in predictors are evaluated if not specified.
+
+    predictor_versions: the list of the versions of the predictors. The latest versions are used if not specified.
+
+    workers: the number of worker processes
+
+    shard_size: the number of models in a shard
+
+    output: an optional jsonl file to write the predicted and real latency of each model
+
+    return the dict from the predictor name to the dict from the dataset file (and "all" for all files) to its
+    `LatencyMetrics`
+    """
+    from .bench_dataset import bench_dataset
+    from nn_meter.predictor import list_latency_predictors
+    datasets = datasets if datasets is not None else bench_dataset()
+    if predictor_names is None:
+        predictor_names = list(dict.fromkeys(hw["name"] for hw in list_latency_predictors()))
+    predictor_versions = predictor_versions or [None] * len(predictor_names)
+
+    metrics = {name: {filename: LatencyMetrics() for filename in list(datasets) + ["all"]} for name in predictor_names}
+    writer = open(output, "w") if output else None
+
+    def collect(filename, ids, results):
+        # accumulate the metrics of a shard for each device
+        for name in predictor_names:
+            pairs = [result[name] for result in results if name in result]
+            if pairs:
+                y_pred, y_true = zip(*pairs)
+                metrics[name][filename].update(y_pred, y_true)
+        if writer:
+            for model_id, result in zip(ids, results):
+                writer.write(json.dumps({"file": filename, "id": model_id, **{
+                    name: {"predict": pred, "real": real} for name, (pred, real) in result.items()
+                }}) + "\n")
+
+    shards = (shard for filename in datasets for shard in get_shards(filename, shard_size))
+    try:
+        if workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=init_evaluation_worker, initargs=(predictor_names, predictor_versions)
+            ) as executor:
+                # keep a bounded number of shards in flight, so that the shards are streamed instead of queued at once
+                pending = set()
+                for shard in shards:
+                    pending.add(executor.submit(evaluate_shard, *shard))
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(*future.result())
+                for future in pending:
+                    collect(*future.result())
+        else:
+            init_evaluation_worker(predictor_names, predictor_versions)
+            for shard in shards:
+                collect(*evaluate_shard(*shard))
+    finally:
+        if writer:
+            writer.close()
+
+    for name in predictor_names:
+        for filename in datasets:
+            if metrics[name][filename].count > 0:
+                metrics[name]["all"].merge(metrics[name][filename])
+                rmse, rmspe, error, acc5, acc10, _ = metrics[name][filename].result()
+                logging.result(f'{filename} on {name}: rmse: {rmse}, 5%accuracy: {acc5}, 10%accuracy: {acc10}')
+        if metrics[name]["all"].count > 0:
+            rmse, rmspe, error, acc5, acc10, _ = metrics[name]["all"].result()
+            logging.result(f'All datasets on {name}: rmse: {rmse}, 5%accuracy: {acc5}, 10%accuracy: {acc10}')
+    return metrics
@@ -1,9 +1,10 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import os
+import json
 import random
 import torch
-import jsonlines
+import numpy as np
 from .bench_dataset import bench_dataset
 from nn_meter.utils import get_user_data_folder
 from nn_meter.utils.import_package import try_import_dgl
@@ -21,8 +22,15 @@ hws = [
 ]
 
 
+# the version of the dataset cache format, which should be increased when the cached arrays are changed
+__dataset_cache_version__ = 1
+
+
 class GNNDataset(torch.utils.data.Dataset):
-    def __init__(self, train=True, device="cortexA76cpu_tflite21", split_ratio=0.8):
+    # the compact arrays of all models, which are saved in the dataset cache
+    arrays = ["latency_list", "node_ptr", "node_types", "node_attrs", "edge_ptr", "edges"]
+
+    def __init__(self, train=True, device="cortexA76cpu_tflite21", split_ratio=0.8, cache=True):
         """
         Dataloader of the Latency Dataset
 
@@ -40,113 +48,111 @@ class GNNDataset(torch.utils.data.Dataset):
             Batch size.
         split_ratio: float
             The ratio to split the train dataset and the test dataset.
+        cache: bool
+            Whether to save the parsed dataset as compact arrays on first load, which are memory-mapped afterwards. The
+            cache is built again once the dataset files are changed.
         """
         err_str = "Not supported device type"
         assert device in hws, err_str
         self.device = device
         self.train = train
         self.split_ratio = split_ratio
-        self.adjs = {}
-        self.attrs = {}
-        self.nodename2id = {}
-        self.id2nodename = {}
         self.op_types = set()
         self.opname2id = {}
-        self.raw_data = {}
         self.name_list = []
         self.latencies = {}
         self.data_dir = bench_dataset(data_folder=__user_dataset_folder__)
-        self.load_model_archs_and_latencies(self.data_dir)
-        self.construct_attrs()
-        self.name_list = list(filter(lambda x: x in self.latencies, self.name_list))
+        self.cache_dir = os.path.join(
+            __user_dataset_folder__, "cache", f"{device}_{'train' if train else 'test'}_{split_ratio}"
+        )
+        if not (cache and self.load_cache()):
+            self.load_model_archs_and_latencies(self.data_dir)
+            if cache:
+                self.save_cache()
 
     def load_model_archs_and_latencies(self, data_dir):
+        # the models are parsed into compact arrays, with the op types interned in `type_names` and sorted at last
+        self._type_names, self._type_codes = [], {}
+        self._models = []
         for filename in data_dir:
             self.load_model(filename)
 
+        used_types = sorted({code for model in self._models for code in np.unique(model[0])})
+        self.op_types = {self._type_names[code] for code in used_types}
+        op_types_list = list(sorted(self.op_types))
+        for i, _op in enumerate(op_types_list):
+            self.opname2id[_op] = i
+        remap = np.zeros(len(self._type_names), dtype=np.int32)
+        for code in used_types:
+            remap[code] = self.opname2id[self._type_names[code]]
+
+        models = self._models
+        self.latency_list = np.array([self.latencies[name] for name in self.name_list], dtype=np.float64)
+        self.node_ptr = np.cumsum([0] + [len(model[0]) for model in models], dtype=np.int64)
+        if models:
+            self.node_types = remap[np.concatenate([model[0] for model in models])]
+            self.node_attrs = np.concatenate([model[1] for model in models])
+        else:
+            self.node_types = np.zeros(0, dtype=np.int32)
+            self.node_attrs = np.zeros((0, 6), dtype=np.float32)
+        self.edge_ptr = np.cumsum([0] + [len(model[2]) for model in models], dtype=np.int64)
+        self.edges = np.concatenate([model[2] for model in models]) if models else np.zeros((0, 2), dtype=np.int32)
+        del self._type_names, self._type_codes, self._models
+
     def load_model(self, fpath):
         """
-        Load a concrete model type.
+        Load a concrete model type. The ids and latency of the models are collected in one pass over the file, with the
+        offset of each line, and only the models in the split are read again and parsed into compact arrays.
         """
         assert os.path.exists(fpath), '{} does not exists'.format(fpath)
 
-        with jsonlines.open(fpath) as reader:
-            _names = []
-            for obj in reader:
-                if obj[self.device]:
-                    _names.append(obj['id'])
-                    self.latencies[obj['id']] = float(obj[self.device])
-
-            _names = sorted(_names)
-            split_ratio = self.split_ratio if self.train else 1-self.split_ratio
-            count = int(len(_names) * split_ratio)
-
-            if self.train:
-                _model_names = _names[:count]
-            else:
-                _model_names = _names[-1*count:]
-
-            self.name_list.extend(_model_names)
-
-        with jsonlines.open(fpath) as reader:
-            for obj in reader:
-                if obj['id'] in _model_names:
-                    model_name = obj['id']
-                    model_data = obj['graph']
-                    self.parse_model(model_name, model_data)
-                    self.raw_data[model_name] = model_data
-    
-    def construct_attrs(self):
-        """
-        Construct the attributes matrix for each model.
-        Attributes tensor:
-        one-hot encoded type + input_channel , output_channel,
-        input_h, input_w + kernel_size + stride
-        """
-        op_types_list = list(sorted(self.op_types))
-        for i, _op in enumerate(op_types_list):
-            self.opname2id[_op] = i
-        n_op_type = len(self.op_types)
-        attr_len = n_op_type + 6
-        for model_name in self.raw_data:
-            n_node = len(self.raw_data[model_name])
-            # print("Model: ", model_name, " Number of Nodes: ", n_node)
-            t_attr = torch.zeros(n_node, attr_len)
-            for node in self.raw_data[model_name]:
-                node_attr = self.raw_data[model_name][node]
-                nid = self.nodename2id[model_name][node]
-                op_type = node_attr['attr']['type']
-                op_id = self.opname2id[op_type]
-                t_attr[nid][op_id] = 1
-                other_attrs = self.parse_node(model_name, node)
-                t_attr[nid][-6:] = other_attrs
-            self.attrs[model_name] = t_attr
-
-    def parse_node(self, model_name, node_name):
+        offsets = {}
+        latencies = {}
+        with open(fpath, "rb") as fp:
+            offset = 0
+            for line in fp:
+                if line.strip():
+                    obj = json.loads(line)
+                    if obj[self.device]:
+                        latencies[obj['id']] = float(obj[self.device])
+                        offsets[obj['id']] = offset
+                offset += len(line)
+
+        _names = sorted(latencies)
+        split_ratio = self.split_ratio if self.train else 1 - self.split_ratio
+        count = int(len(_names) * split_ratio)
+
+        if self.train:
+            _model_names = _names[:count]
+        else:
+            _model_names = _names[-1 * count:]
+
+        with open(fpath, "rb") as fp:
+            for model_name in _model_names:
+                fp.seek(offsets[model_name])
+                self.name_list.append(model_name)
+                self.latencies[model_name] = latencies[model_name]
+                self._models.append(self.parse_model(json.loads(fp.readline())['graph']))
+
+    def parse_node(self, model_data, node_name):
         """
         Parse the attributes of specified node
         Get the input_c, output_c, input_h, input_w, kernel_size, stride
         of this node. Note: filled with 0 by default if this doesn't have
         coressponding attribute.
         """
-        node_data = self.raw_data[model_name][node_name]
-        t_attr = torch.zeros(6)
+        node_data = model_data[node_name]
+        t_attr = [0] * 6
         op_type = node_data['attr']['type']
-        if op_type =='Conv2D':
-            weight_shape = node_data['attr']['attr']['weight_shape']
-            kernel_size, _, in_c, out_c = weight_shape
-            stride, _= node_data['attr']['attr']['strides']
-            _, h, w, _ = node_data['attr']['output_shape'][0]
-            t_attr = torch.tensor([in_c, out_c, h, w, kernel_size, stride])
-        elif op_type == 'DepthwiseConv2dNative':
+        if op_type in ['Conv2D', 'DepthwiseConv2dNative']:
             weight_shape = node_data['attr']['attr']['weight_shape']
             kernel_size, _, in_c, out_c = weight_shape
             stride, _= node_data['attr']['attr']['strides']
             _, h, w, _ = node_data['attr']['output_shape'][0]
-            t_attr = torch.tensor([in_c, out_c, h, w, kernel_size, stride])
+            t_attr = [in_c, out_c, h, w, kernel_size, stride]
         elif op_type == 'MatMul':
             in_node = node_data['inbounds'][0]
-            in_shape = self.raw_data[model_name][in_node]['attr']['output_shape'][0]
+            in_shape = model_data[in_node]['attr']['output_shape'][0]
             in_c = in_shape[-1]
             out_c = node_data['attr']['output_shape'][0][-1]
             t_attr[0] = in_c
@@ -154,12 +160,11 @@ class GNNDataset(torch.utils.data.Dataset):
         elif len(node_data['inbounds']):
             in_node = node_data['inbounds'][0]
             h, w, in_c, out_c = 0, 0, 0, 0
-            in_shape = self.raw_data[model_name][in_node]['attr']['output_shape'][0]
+            in_shape = model_data[in_node]['attr']['output_shape'][0]
             in_c = in_shape[-1]
             if 'ConCat' in op_type:
-                for i in range(1, len(node_data['in_bounds'])):
-                    in_shape = self.raw_data[node_data['in_bounds']
-                                             [i]]['attr']['output_shape'][0]
+                for i in range(1, len(node_data['inbounds'])):
+                    in_shape = model_data[node_data['inbounds'][i]]['attr']['output_shape'][0]
                     in_c += in_shape[-1]
             if len(node_data['attr']['output_shape']):
                 out_shape = node_data['attr']['output_shape'][0]
@@ -167,53 +172,98 @@ class GNNDataset(torch.utils.data.Dataset):
                 out_c = out_shape[-1]
                 if len(out_shape) == 4:
                     h, w = out_shape[1], out_shape[2]
-            t_attr[-6:-2] = torch.tensor([in_c, out_c, h, w])
+            t_attr[-6:-2] = [in_c, out_c, h, w]
 
         return t_attr
 
-    def parse_model(self, model_name, model_data):
+    def parse_model(self, model_data):
         """
-        Parse the model data and build the adjacent matrixes
+        Parse the model data into compact arrays: the op type code of each node, the attributes of each node given by
+        `parse_node`, and the unique edges of the adjacent matrix (including self loops) in row-major order
         """
-        n_nodes = len(model_data)
-        m_adj = torch.zeros(n_nodes, n_nodes, dtype=torch.int32)
-        id2name = {}
-        name2id = {}
-        tmp_node_id = 0
-        # build the mapping between the node name and node id
-
-        for node_name in model_data.keys():
-            id2name[tmp_node_id] = node_name
-            name2id[node_name] = tmp_node_id
-            op_type = model_data[node_name]['attr']['type']
-            self.op_types.add(op_type)
-            tmp_node_id += 1
-
-        for node_name in model_data:
+        name2id = {node_name: i for i, node_name in enumerate(model_data)}
+        types = np.empty(len(model_data), dtype=np.int32)
+        attrs = np.empty((len(model_data), 6), dtype=np.float32)
+        edges = set()
+
+        for node_name, node_data in model_data.items():
             cur_id = name2id[node_name]
-            for node in model_data[node_name]['inbounds']:
-                if node not in name2id:
-                    # weight node
-                    continue
-                in_id = name2id[node]
-                m_adj[in_id][cur_id] = 1
-            for node in model_data[node_name]['outbounds']:
-                if node not in name2id:
-                    # weight node
-                    continue
-                out_id = name2id[node]
-                m_adj[cur_id][out_id] = 1
-        
-        for idx in range(n_nodes):
-            m_adj[idx][idx] = 1
-
-        self.adjs[model_name] = m_adj
-        self.nodename2id[model_name] = name2id
-        self.id2nodename[model_name] = id2name
+            op_type = node_data['attr']['type']
+            if op_type not in self._type_codes:
+                self._type_codes[op_type] = len(self._type_names)
+                self._type_names.append(op_type)
+            types[cur_id] = self._type_codes[op_type]
+            attrs[cur_id] = self.parse_node(model_data, node_name)
+
+            edges.add((cur_id, cur_id))
+            for node in node_data['inbounds']:
+                if node in name2id:  # skip weight nodes
+                    edges.add((name2id[node], cur_id))
+            for node in node_data['outbounds']:
+                if node in name2id:
+                    edges.add((cur_id, name2id[node]))
+
+        return types, attrs, np.array(sorted(edges), dtype=np.int32).reshape(-1, 2)
+
+    def _get_cache_signature(self):
+        files = []
+        for filename in sorted(self.data_dir):
+            stat = os.stat(filename)
+            files.append([os.path.abspath(filename), stat.st_size, stat.st_mtime_ns])
+        return {"version": __dataset_cache_version__, "files": files}
+
+    def load_cache(self):
+        """
+        load the memory-mapped arrays from the dataset cache, and return False if the cache is missing or outdated
+        """
+        meta_file = os.path.join(self.cache_dir, "meta.json")
+        if not os.path.isfile(meta_file):
+            return False
+        try:
+            with open(meta_file, "r") as fp:
+                meta = json.load(fp)
+            if meta["signature"] != self._get_cache_signature():
+                return False
+            for name in self.arrays:
+                setattr(self, name, np.load(os.path.join(self.cache_dir, f"{name}.npy"), mmap_mode="r"))
+        except (OSError, ValueError, KeyError):
+            return False
+        self.name_list = meta["names"]
+        self.latencies = dict(zip(self.name_list, self.latency_list.tolist()))
+        self.op_types = set(meta["op_types"])
+        self.opname2id = {_op: i for i, _op in enumerate(meta["op_types"])}
+        return True
+
+    def save_cache(self):
+        meta_file = os.path.join(self.cache_dir, "meta.json")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # remove the meta file first, so that a partially written cache is never loaded
+        if os.path.isfile(meta_file):
+            os.remove(meta_file)
+        for name in self.arrays:
+            np.save(os.path.join(self.cache_dir, f"{name}.npy"), getattr(self, name))
+        with open(meta_file + ".tmp", "w") as fp:
+            json.dump({
+                "signature": self._get_cache_signature(),
+                "names": self.name_list,
+                "op_types": sorted(self.op_types),
+            }, fp)
+        os.replace(meta_file + ".tmp", meta_file)
 
     def __getitem__(self, index):
         model_name = self.name_list[index]
-        return (self.adjs[model_name], self.attrs[model_name]), self.latencies[model_name], self.op_types
+        start, end = self.node_ptr[index], self.node_ptr[index + 1]
+        n_node = int(end - start)
+
+        # one-hot encoded type + input_channel, output_channel, input_h, input_w + kernel_size + stride
+        attrs = torch.zeros(n_node, len(self.op_types) + 6)
+        attrs[torch.arange(n_node), torch.from_numpy(np.array(self.node_types[start: end], dtype=np.int64))] = 1
+        attrs[:, -6:] = torch.from_numpy(np.array(self.node_attrs[start: end]))
+
+        edges = torch.from_numpy(np.array(self.edges[self.edge_ptr[index]: self.edge_ptr[index + 1]], dtype=np.int64))
+        adj = torch.zeros(n_node, n_node, dtype=torch.int32)
+        adj[edges[:, 0], edges[:, 1]] = 1
+        return (adj, attrs), self.latencies[model_name], self.op_types
 
     def __len__(self):
         return len(self.name_list)
@@ -8,13 +8,24 @@ from .shape_fetcher import ShapeFetcher
 from nn_meter.utils.graph_tool import ModelGraph
 
 class FrozenPbConverter:
-    def __init__(self, file_name):
+    def __init__(self, file_name, static_only=False):
+        """
+        Convert a frozen pb file to the nn-Meter IR graph.
+
+        Parameters
+        ----------
+        file_name : str
+            The path of the frozen pb file.
+        static_only : bool
+            If True, the pb file is converted without tensorflow, and all shapes are inferred by the static
+            `ShapeInference`. A `ValueError` is raised if the graph contains ops not supported by the static inference.
+        """
         self.model_graph = ModelGraph()
 
         # Parse pb to graph
-        parser = FrozenPbParser(file_name)
+        parser = FrozenPbParser(file_name, static_only=static_only)
         parser.parse_graph(self.model_graph)
-        dynamic_fetcher = ShapeFetcher(parser.graph)
+        dynamic_fetcher = None if static_only else ShapeFetcher(parser.graph)
 
         # Change split to more firendly scheme
         parser.fix_split_naming(self.model_graph)
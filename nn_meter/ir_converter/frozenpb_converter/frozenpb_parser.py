@@ -9,11 +9,25 @@ logging = logging.getLogger("nn-Meter")
 
 
 class FrozenPbParser:
-    def __init__(self, pb_file):
-        tf = try_import_tensorflow()
-        f = open(pb_file, "rb")
-        graph = tf.compat.v1.GraphDef()
-        graph.ParseFromString(f.read())
+    def __init__(self, pb_file, static_only=False):
+        """
+        Parse the GraphDef from a frozen pb file.
+
+        Parameters
+        ----------
+        pb_file : str
+            The path of the frozen pb file.
+        static_only : bool
+            If True, the GraphDef is parsed by the protobuf runtime without importing tensorflow.
+        """
+        if static_only:
+            from .graph_def import GraphDef
+            graph = GraphDef()
+        else:
+            tf = try_import_tensorflow()
+            graph = tf.compat.v1.GraphDef()
+        with open(pb_file, "rb") as f:
+            graph.ParseFromString(f.read())
 
         self.graph = graph
 
@@ -59,10 +73,8 @@ class FrozenPbParser:
                 if value["attr"]["type"] in stripped_nodes_type_all:
                     removed_node.append(key)
 
-        for key in removed_node:
-            del graph[key]
-
-        model_graph.refresh()
+        model_graph.remove_nodes(removed_node)
+        model_graph.refresh(incremental=True)
 
     @staticmethod
     def fix_split_naming(model_graph):
@@ -0,0 +1,105 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+
+# The subset of the tensorflow GraphDef schema (tensorflow/core/framework/*.proto) read by `FrozenPbParser`, with the
+# same field numbers as tensorflow. The fields out of the subset are skipped in parsing. The enums of data types are
+# declared as int32, which have the same encoding on the wire.
+_PACKAGE = "nn_meter.tensorflow"
+
+_MESSAGES = {
+    "TensorShapeProto": [
+        ("dim", 2, "repeated", ".nn_meter.tensorflow.TensorShapeProto.Dim"),
+        ("unknown_rank", 3, "optional", "bool"),
+    ],
+    "TensorShapeProto.Dim": [
+        ("size", 1, "optional", "int64"),
+        ("name", 2, "optional", "string"),
+    ],
+    "TensorProto": [
+        ("dtype", 1, "optional", "int32"),
+        ("tensor_shape", 2, "optional", ".nn_meter.tensorflow.TensorShapeProto"),
+        ("version_number", 3, "optional", "int32"),
+        ("tensor_content", 4, "optional", "bytes"),
+        ("float_val", 5, "repeated", "float"),
+        ("double_val", 6, "repeated", "double"),
+        ("int_val", 7, "repeated", "int32"),
+        ("string_val", 8, "repeated", "bytes"),
+        ("scomplex_val", 9, "repeated", "float"),
+        ("int64_val", 10, "repeated", "int64"),
+        ("bool_val", 11, "repeated", "bool"),
+        ("dcomplex_val", 12, "repeated", "double"),
+        ("half_val", 13, "repeated", "int32"),
+        ("uint32_val", 16, "repeated", "uint32"),
+        ("uint64_val", 17, "repeated", "uint64"),
+    ],
+    "AttrValue": [
+        ("list", 1, "optional", ".nn_meter.tensorflow.AttrValue.ListValue"),
+        ("s", 2, "optional", "bytes"),
+        ("i", 3, "optional", "int64"),
+        ("f", 4, "optional", "float"),
+        ("b", 5, "optional", "bool"),
+        ("type", 6, "optional", "int32"),
+        ("shape", 7, "optional", ".nn_meter.tensorflow.TensorShapeProto"),
+        ("tensor", 8, "optional", ".nn_meter.tensorflow.TensorProto"),
+        ("placeholder", 9, "optional", "string"),
+    ],
+    "AttrValue.ListValue": [
+        ("s", 2, "repeated", "bytes"),
+        ("i", 3, "repeated", "int64"),
+        ("f", 4, "repeated", "float"),
+        ("b", 5, "repeated", "bool"),
+        ("type", 6, "repeated", "int32"),
+        ("shape", 7, "repeated", ".nn_meter.tensorflow.TensorShapeProto"),
+        ("tensor", 8, "repeated", ".nn_meter.tensorflow.TensorProto"),
+    ],
+    "NodeDef": [
+        ("name", 1, "optional", "string"),
+        ("op", 2, "optional", "string"),
+        ("input", 3, "repeated", "string"),
+        ("device", 4, "optional", "string"),
+        ("attr", 5, "repeated", ".nn_meter.tensorflow.NodeDef.AttrEntry"),
+    ],
+    "NodeDef.AttrEntry": [
+        ("key", 1, "optional", "string"),
+        ("value", 2, "optional", ".nn_meter.tensorflow.AttrValue"),
+    ],
+    "GraphDef": [
+        ("node", 1, "repeated", ".nn_meter.tensorflow.NodeDef"),
+    ],
+}
+
+
+def _build_file_descriptor():
+    file_proto = descriptor_pb2.FileDescriptorProto(name="nn_meter/graph_def.proto", package=_PACKAGE, syntax="proto3")
+    messages = {}
+    for full_name, fields in _MESSAGES.items():
+        parent, _, name = full_name.rpartition(".")
+        container = messages[parent].nested_type if parent else file_proto.message_type
+        message = container.add(name=name)
+        if name.endswith("Entry"):
+            message.options.map_entry = True
+        for field_name, number, label, field_type in fields:
+            field = message.field.add(name=field_name, number=number)
+            field.label = getattr(descriptor_pb2.FieldDescriptorProto, f"LABEL_{label.upper()}")
+            if field_type.startswith("."):
+                field.type = descriptor_pb2.FieldDescriptorProto.TYPE_MESSAGE
+                field.type_name = field_type
+            else:
+                field.type = getattr(descriptor_pb2.FieldDescriptorProto, f"TYPE_{field_type.upper()}")
+        messages[full_name] = message
+    return file_proto
+
+
+def _get_message_class(pool, name):
+    descriptor = pool.FindMessageTypeByName(f"{_PACKAGE}.{name}")
+    if hasattr(message_factory, "GetMessageClass"):
+        return message_factory.GetMessageClass(descriptor)
+    return message_factory.MessageFactory(pool).GetPrototype(descriptor)
+
+
+_pool = descriptor_pool.DescriptorPool()
+_pool.Add(_build_file_descriptor())
+
+GraphDef = _get_message_class(_pool, "GraphDef")
@@ -7,22 +7,29 @@ from nn_meter.utils.import_package import try_import_tensorflow
 class ShapeFetcher:
     def __init__(self, input_graph):
         """
-        Dynamically inference the node shapes.
+        Dynamically inference the node shapes. The graph_def is imported into tensorflow the first time a shape is
+        fetched, so that tensorflow is not touched if all shapes are inferred statically.
 
         Parameters
         ----------
         input_graph : graph_def
             The tensorflow input graph_def file.
         """
+        self.input_graph = input_graph
+        self.graph = None
+        self.shapes = {}
+
+    def _load_graph(self):
         self.tf = try_import_tensorflow()
         self.tf.compat.v1.disable_eager_execution()
 
         graph = self.tf.Graph()
 
         with graph.as_default():
-            self.tf.import_graph_def(graph_def=input_graph, name="")
-        
+            self.tf.import_graph_def(graph_def=self.input_graph, name="")
+
         self.ops = graph.get_operations()
+        self.op_index = {op.name: op for op in self.ops}
         placeholders = list(filter(lambda op: op.type == "Placeholder", self.ops))
         assert len(placeholders) == 1
         self.graph_input_tensor = placeholders[0].outputs[0]
@@ -32,6 +39,42 @@ class ShapeFetcher:
         self.imsize = graph_input_tensor_shape[1]
         self.graph = graph
 
+    def fetch_shapes(self, op_names: List[str]):
+        """
+        Fetch the input and output shapes of the nodes in one session run, and cache them for `get_shape_by_name`.
+
+        Parameters
+        ----------
+        op_names : list of str
+            The names of the target nodes.
+        """
+        op_names = [op_name for op_name in dict.fromkeys(op_names) if op_name not in self.shapes]
+        if not op_names:
+            return
+        if self.graph is None:
+            self._load_graph()
+
+        shape_tensors, slices = [], {}
+        with self.graph.as_default():
+            for op_name in op_names:
+                op = self.op_index.get(op_name)
+                tensors = (list(op.inputs), list(op.outputs)) if op is not None else ([], [])
+                start = len(shape_tensors)
+                shape_tensors.extend(self.tf.compat.v1.shape(tensor) for tensor in tensors[0] + tensors[1])
+                slices[op_name] = (start, start + len(tensors[0]), len(shape_tensors))
+
+        results = []
+        if shape_tensors:
+            with self.tf.compat.v1.Session(graph=self.graph) as sess:
+                fake_input = np.random.randn(1, self.imsize, self.imsize, 3)
+                results = sess.run(shape_tensors, feed_dict={self.graph_input_tensor: fake_input})
+
+        for op_name, (start, middle, end) in slices.items():
+            self.shapes[op_name] = (
+                [shape.tolist() for shape in results[start: middle]],
+                [shape.tolist() for shape in results[middle: end]],
+            )
+
     def get_shape_by_name(self, op_name):
         """
         Get the node output shape by its name
@@ -41,32 +84,6 @@ class ShapeFetcher:
         op_name : str
             The name of the target node.
         """
-        input_tensors_to_fetch = []
-        output_tensors_to_fetch = []
-        for op in filter(lambda op: op.name == op_name, self.ops):
-            input_tensors_to_fetch.extend(op.inputs)
-            output_tensors_to_fetch.extend(op.outputs)
-        
-        input_shape_tensors = []
-        for tensor in input_tensors_to_fetch:
-            input_shape_tensors.append(self.tf.compat.v1.shape(tensor))
-        
-        output_shape_tensors = []
-        for tensor in output_tensors_to_fetch:
-            output_shape_tensors.append(self.tf.compat.v1.shape(tensor))
-
-        
-        intput_shape_results = []
-        output_shape_results = []
-        with self.tf.compat.v1.Session(graph=self.graph) as sess:
-            fake_input = np.random.randn(1, self.imsize, self.imsize, 3)
-            for shape_tensor in input_shape_tensors:
-                intput_shape_results.append(sess.run(
-                    shape_tensor, feed_dict={self.graph_input_tensor: fake_input}
-                ).tolist())
-            for shape_tensor in output_shape_tensors:
-                output_shape_results.append(sess.run(
-                    shape_tensor, feed_dict={self.graph_input_tensor: fake_input}
-                ).tolist())
-
-        return intput_shape_results, output_shape_results
\ No newline at end of file
+        if op_name not in self.shapes:
+            self.fetch_shapes([op_name])
+        return self.shapes[op_name]
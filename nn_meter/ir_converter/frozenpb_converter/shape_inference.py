@@ -911,6 +911,15 @@ class ShapeInference:
                     )
         return [[0, 0, 0, 0]], [[0, 0, 0, 0]]
 
+    @classmethod
+    def is_static(cls, node_type):
+        """
+        Whether the shape of the node type could be inferred statically.
+        """
+        return node_type in cls.TF_PRODCAST_MATH_OPS or \
+            node_type in cls.TF_PROPAGATE_MATH_OPS or \
+            hasattr(cls, node_type + "_get_shape")
+
     def __init__(self, model_graph, dynamic_fetcher):
         """
         Take the graph, and append output shape
@@ -920,19 +929,30 @@ class ShapeInference:
         ----------
         model_graph : ModelGraph
             The ModelGraph IR class.
+        dynamic_fetcher : ShapeFetcher
+            The fetcher of the shapes not supported by static inference, or None to allow static inference only.
         """
         graph = model_graph.get_graph()
         seq = ph.get_graph_seq(graph, model_graph.get_graph_head())
 
+        # fetch the shapes of all nodes not supported by static inference in one batch
+        dynamic_nodes = [node_name for node_name in seq if not self.is_static(model_graph.get_node_type(node_name))]
+        if dynamic_nodes and dynamic_fetcher is None:
+            unsupported_types = sorted({model_graph.get_node_type(node_name) for node_name in dynamic_nodes})
+            raise ValueError(
+                f"The ops {unsupported_types} are not supported by static inference. Please convert the model with "
+                "tensorflow instead of the static only mode."
+            )
+        if dynamic_nodes:
+            dynamic_fetcher.fetch_shapes(dynamic_nodes)
+
         # Pass #1
         for node_name in seq:
             node_type = model_graph.get_node_type(node_name)
             node_get_shape_name = node_type + "_get_shape"
 
             # if node type find in supported ops, use faster static inference
-            if node_type in self.TF_PRODCAST_MATH_OPS or \
-                node_type in self.TF_PROPAGATE_MATH_OPS or \
-                node_get_shape_name in dir(self) :
+            if self.is_static(node_type):
 
                 if node_type in self.TF_PRODCAST_MATH_OPS:
                     input_shape, output_shape = ShapeInference.eval_prodcast(graph, graph[node_name])
@@ -2,7 +2,7 @@
 # Licensed under the MIT license.
 import logging
 from itertools import chain
-from .utils import get_tensor_shape
+from .utils import get_tensor_shape, has_static_shape
 from .constants import SLICE_TYPE
 from nn_meter.utils.import_package import try_import_onnx
 logging = logging.getLogger("nn-Meter")
@@ -10,10 +10,16 @@ logging = logging.getLogger("nn-Meter")
 
 class OnnxConverter:
     def __init__(self, model):
-        onnx = try_import_onnx()
-        from onnx import shape_inference
-        inferred_model = shape_inference.infer_shapes(model)
-        self.graph = inferred_model.graph
+        """
+        model: the ONNX model object. The shape inference of onnx is skipped if the shapes of all node outputs are
+            already annotated in the model, and the weights are never read, so the model could be loaded by
+            `onnx.load(..., load_external_data=False)`.
+        """
+        self.graph = model.graph
+        if not self.is_fully_annotated(self.graph):
+            try_import_onnx()
+            from onnx import shape_inference
+            self.graph = shape_inference.infer_shapes(model).graph
 
         self.tensors = {}
         for tensor in chain(self.graph.input, self.graph.value_info, self.graph.output):
@@ -31,6 +37,19 @@ class OnnxConverter:
                 if output_name in self.tensors:
                     self.tensors[output_name]["inputs"].append(node)
 
+    @staticmethod
+    def is_fully_annotated(graph):
+        """
+        whether the graph inputs and the outputs of all nodes have concrete shapes in the graph, such that shape
+        inference is not needed
+        """
+        initializers = {tensor.name for tensor in graph.initializer}
+        annotated = {
+            tensor.name for tensor in chain(graph.input, graph.value_info, graph.output) if has_static_shape(tensor)
+        }
+        return all(tensor.name in annotated for tensor in graph.input if tensor.name not in initializers) and \
+            all(name in annotated for node in graph.node for name in node.output if name)
+
     def fetch_attrs(self, node):
         from onnx import AttributeProto
         attrs = {}
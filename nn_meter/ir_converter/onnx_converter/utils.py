@@ -1,5 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+def has_static_shape(tensor):
+    """ whether the shape of the tensor is annotated with a concrete value in each dimension
+    """
+    tensor_type = tensor.type.tensor_type
+    return tensor_type.HasField("shape") and all(dim.HasField("dim_value") for dim in tensor_type.shape.dim)
+
+
 def get_tensor_shape(tensor):
     shape = []
     for dim in tensor.type.tensor_type.shape.dim:
@@ -9,7 +9,8 @@ from nn_meter.utils.import_package import try_import_onnx, try_import_torch, try
 logging = logging.getLogger("nn-Meter")
 
 
-def model_file_to_graph(filename: str, model_type: str, input_shape=(1, 3, 224, 224), apply_nni=False):
+def model_file_to_graph(filename: str, model_type: str, input_shape=(1, 3, 224, 224), apply_nni=False,
+                        static_only=False):
     """
     read the given file and convert the model in the file content to nn-Meter IR graph object 
     @params:
@@ -32,14 +33,19 @@ def model_file_to_graph(filename: str, model_type: str, input_shape=(1, 3, 224,
         converter is used, which requires onnx installation (well tested version is onnx==1.9.0). NNI-based converter is much faster while the conversion is unstable 
         as it could fail in some case. Onnx-based converter is much slower but stable compared to NNI-based converter. This parameter is only accessed when 
         model_type == 'torch'
+
+    static_only: if True, the tensorflow model is parsed by the protobuf runtime without importing tensorflow, and all
+        shapes are inferred statically. A ValueError is raised if the model contains ops not supported by the static
+        inference. This parameter is only accessed when model_type == 'pb'
     """
     if model_type == "onnx":
         onnx = try_import_onnx()
-        model = onnx.load(filename)
+        # the weights are not used in conversion, so the external weight files are not loaded
+        model = onnx.load(filename, load_external_data=False)
         return onnx_model_to_graph(model)
 
     elif model_type == "pb":
-        converter = FrozenPbConverter(filename)
+        converter = FrozenPbConverter(filename, static_only=static_only)
         return converter.get_flatten_graph()
 
     elif model_type == "nni-ir":
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.utils.indexed_graph import IndexedGraph
 from .utils.constants import DUMMY_TYPES
 from .utils.ir_tools import convert_nodes
 from .rule_reader import RuleReader
@@ -15,9 +16,17 @@ class KernelDetector:
         self.bbs = []
         self._global_index = 0
 
-    def load_graph(self, graph):
-        new_graph = convert_nodes(graph)
-        self.model_graph = ModelGraph(graph=new_graph)
+    def load_graph(self, graph, copy=True):
+        """
+        graph: the nn-Meter IR graph in dict, or `IndexedGraph`
+        copy: if True, the detector works on a private copy of the graph structure, and the attribute values are shared
+            with the graph. Otherwise, the dict graph is owned by the detector and modified in place, which should only
+            be used if the graph is not used by others.
+        """
+        if isinstance(graph, IndexedGraph):
+            graph = graph.to_dict()
+        new_graph = convert_nodes(graph, copy=copy)
+        self.model_graph = ModelGraph(graph=new_graph, copy_graph=False)
         self.model_graph.refresh()
         self.bbs = self.splitter.split(self.model_graph)
 
@@ -1,46 +1,60 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
+import os
 import json
+import pickle
+import hashlib
+import logging
+import threading
+from functools import lru_cache
 from .fusion_lib import get_fusion_unit
+from .fusion_lib.utils import BASE_DIR as FUSION_LIB_DIR
+from .utils.pattern_matcher import PatternMatcher
 from nn_meter.utils.graph_tool import ModelGraph
+logging = logging.getLogger("nn-Meter")
 
 
-class RuleReader:
-    rules_default = {
-        "MON": 0,
-        "FN": True,
-    }
+# the version of the compiled rules format, to be increased when `CompiledRules` or `PatternMatcher` is changed
+__compiled_rules_version__ = 2
+
+
+class CompiledRules:
+    """
+    The fusion rules compiled from a rule file, which are shared by all `RuleReader` of the same rule content and should
+    not be modified.
+    @params:
+
+    rules: the rule dict loaded from the rule file
 
+    fusible: the set of fusible (node type, outnode type) pairs
+
+    fusion_units: the dict from the kernel type to the list of fusion unit graphs in `ModelGraph`, including the
+        multi-op blocks
+
+    matchers: the dict from the kernel type to the list of `PatternMatcher` of the fusion units
+    """
     multiop_blocks = ["se", "hswish", "channelshuffle", "gap"]
 
-    def __init__(self, rule_file=None):
-        self.rules = {}
-        if rule_file:
-            with open(rule_file, "r") as fp:
-                self.rules = json.load(fp)
+    def __init__(self, rules):
+        self.rules = rules
+        self.fusible = set()
+        self.fusion_units = {}
         self._extract_fusible()
         self._parse_multiop_block()
-
-    def is_fusible(self, node_type, outnode_type):
-        return (node_type, outnode_type) in self.fusible
-
-    def query_rule(self, rule):
-        if rule not in self.rules or self.rules[rule]["obey"] is None:
-            return self.rules_default[rule]
-        else:
-            return self.rules[rule]["obey"]
+        self.matchers = {
+            type: [PatternMatcher(block) for block in blocks]
+            for type, blocks in self.fusion_units.items()
+        }
 
     def _extract_fusible(self):
         def get_name(i):
             return f"{ops[i]}_{i}"
 
-        self.fusible = []
-        self.fusion_units = {}
         for name, rule in self.rules.items():
             if rule["obey"] and name.startswith("BF"):
                 ops = name.split("_")[1:]
                 if len(ops) == 2:
-                    self.fusible.append((ops[0], ops[1]))
+                    self.fusible.add((ops[0], ops[1]))
                 elif len(ops) > 2:
                     fusion_unit = {}
                     for i in range(0, len(ops)):
@@ -52,8 +66,138 @@ class RuleReader:
                             "inbounds": [get_name(i - 1)] if i > 0 else [],
                             "outbounds": [get_name(i + 1)] if i < len(ops) - 1 else [],
                         }
-                    self.fusion_units["-".join(ops)] = [ModelGraph(graph=fusion_unit)]
+                    self.fusion_units["-".join(ops)] = [ModelGraph(graph=fusion_unit, copy_graph=False)]
+        self.fusible = frozenset(self.fusible)
 
     def _parse_multiop_block(self):
         for block in self.multiop_blocks:
             self.fusion_units[block] = get_fusion_unit(block)
+
+
+@lru_cache(maxsize=None)
+def get_compiled_rules_signature():
+    """ return the hash of the nn-Meter version and the fusion units in `fusion_lib`, which the compiled rules depend on
+    besides the rule file
+    """
+    from nn_meter import __version__
+    digest = hashlib.sha256(f"{__version__}_v{__compiled_rules_version__}".encode())
+    for filename in sorted(os.listdir(FUSION_LIB_DIR)):
+        if filename.endswith(".json"):
+            digest.update(filename.encode())
+            with open(os.path.join(FUSION_LIB_DIR, filename), "rb") as fp:
+                digest.update(hashlib.sha256(fp.read()).digest())
+    return digest.hexdigest()
+
+
+class CompiledRulesCache:
+    """
+    A thread-safe cache of `CompiledRules` keyed by the content hash of the rule file, so that the rule files with the
+    same content are parsed and compiled only once in the process. If `folder` is given, the compiled rules are also
+    pickled to the folder and reused by other processes. The pickled rules are also keyed by
+    `get_compiled_rules_signature`, so that they are compiled again after nn-Meter or its fusion units are updated.
+    @params:
+
+    folder: the folder to save the compiled rules, or None to cache in memory only
+    """
+    def __init__(self, folder=None):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._rules = {}
+
+    def get(self, rule_file=None):
+        """ return the compiled rules of the rule file. The empty rules are returned if `rule_file` is None.
+        """
+        content = b"{}"
+        if rule_file:
+            with open(rule_file, "rb") as fp:
+                content = fp.read()
+        key = hashlib.sha256(content + get_compiled_rules_signature().encode()).hexdigest()
+
+        compiled = self._rules.get(key)
+        if compiled is not None:
+            return compiled
+        with self._lock:
+            compiled = self._rules.get(key)
+            if compiled is None:
+                compiled = self._load(key)
+                if compiled is None:
+                    compiled = CompiledRules(json.loads(content))
+                    self._save(key, compiled)
+                self._rules[key] = compiled
+            return compiled
+
+    def clear(self):
+        with self._lock:
+            self._rules.clear()
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _get_filename(self, key):
+        return os.path.join(self.folder, f"{key}.pkl")
+
+    def _load(self, key):
+        if self.folder is None or not os.path.isfile(self._get_filename(key)):
+            return None
+        try:
+            with open(self._get_filename(key), "rb") as fp:
+                return pickle.load(fp)
+        except Exception as e:
+            logging.warning(f"Failed to load the compiled fusion rules from {self._get_filename(key)}: {e}")
+            return None
+
+    def _save(self, key, compiled):
+        if self.folder is None:
+            return
+        filename = self._get_filename(key)
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            # write to a temporary file first, so that other processes never read a partial file
+            with open(f"{filename}.{os.getpid()}.tmp", "wb") as fp:
+                pickle.dump(compiled, fp)
+            os.replace(f"{filename}.{os.getpid()}.tmp", filename)
+        except OSError as e:
+            logging.warning(f"Failed to save the compiled fusion rules to {filename}: {e}")
+
+
+def get_compiled_rules_cache():
+    """ return the process-wide cache of compiled rules, which is saved in `<user_data_folder>/cache/fusion_rules`
+    """
+    global _compiled_rules_cache
+    if _compiled_rules_cache is None:
+        from nn_meter.utils import get_user_data_folder
+        _compiled_rules_cache = CompiledRulesCache(os.path.join(get_user_data_folder(), "cache", "fusion_rules"))
+    return _compiled_rules_cache
+
+
+_compiled_rules_cache = None
+
+
+class RuleReader:
+    rules_default = {
+        "MON": 0,
+        "FN": True,
+    }
+
+    multiop_blocks = CompiledRules.multiop_blocks
+
+    def __init__(self, rule_file=None, cache=None):
+        """
+        @params:
+        rule_file: the path of the fusion rule file
+        cache: the `CompiledRulesCache` to look up the compiled rules, or None to use the process-wide cache
+        """
+        self.compiled = (cache if cache is not None else get_compiled_rules_cache()).get(rule_file)
+        self.rules = self.compiled.rules
+        self.fusible = self.compiled.fusible
+        self.fusion_units = self.compiled.fusion_units
+        self.matchers = self.compiled.matchers
+
+    def is_fusible(self, node_type, outnode_type):
+        return (node_type, outnode_type) in self.fusible
+
+    def query_rule(self, rule):
+        if rule not in self.rules or self.rules[rule]["obey"] is None:
+            return self.rules_default[rule]
+        else:
+            return self.rules[rule]["obey"]
@@ -1,28 +1,44 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 from .rule_reader import RuleReader
-from .utils.match_helper import MatchHelper
 from .utils.fusion_aware_graph import FusionAwareGraph
 from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.utils.indexed_graph import IndexedGraph
 
 
 class RuleSplitter:
     def __init__(self, rule_reader: RuleReader):
         self.rule_reader = rule_reader
+        self.matchers = rule_reader.matchers
 
     def fuse_multiop_blocks(self, model_graph: ModelGraph):
-        for type, blocks in self.rule_reader.fusion_units.items():
-            for block in blocks:
-                subgraphs = model_graph.find_subgraphs(block, MatchHelper.op_type_matcher)
-                for subgraph in subgraphs:
-                    model_graph.fuse(subgraph.keys(), type)
+        """
+        fuse the multi-op blocks in the model graph in place, and return the `IndexedGraph` of the fused graph
+        """
+        indexed_graph = IndexedGraph.from_model_graph(model_graph)
+        for type, matchers in self.matchers.items():
+            for matcher in matchers:
+                changed = []
+                for subgraph in matcher.find_subgraphs(indexed_graph):
+                    if model_graph.fuse(subgraph.keys(), type):
+                        changed.extend(subgraph)
+                        changed.append(";".join(subgraph))
+                # update the fused nodes and their neighbors in the index instead of indexing the whole graph again
+                if changed:
+                    indexed_graph.update(model_graph.get_graph(), changed)
+        return indexed_graph
 
-    def split(self, model_graph: ModelGraph):
+    def split(self, model_graph):
         """
         Apply rules to graph
+        @params:
+        model_graph: `ModelGraph` or `IndexedGraph`. The `ModelGraph` is modified in place by fusing the multi-op
+            blocks.
         """
-        self.preprocess(model_graph)
-        fusion_graph = FusionAwareGraph(model_graph)
+        if isinstance(model_graph, IndexedGraph):
+            model_graph = model_graph.to_model_graph()
+        indexed_graph = self.preprocess(model_graph)
+        fusion_graph = FusionAwareGraph(indexed_graph)
 
         i = -1
         while i < len(fusion_graph) - 1:
@@ -62,4 +78,4 @@ class RuleSplitter:
         return fusion_graph.get_basicblocks()
 
     def preprocess(self, model_graph: ModelGraph):
-        self.fuse_multiop_blocks(model_graph)
+        return self.fuse_multiop_blocks(model_graph)
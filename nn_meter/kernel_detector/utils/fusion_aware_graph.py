@@ -1,33 +1,41 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-import networkx as nx
 from .union_find import UF
 from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.utils.indexed_graph import IndexedGraph
 
 
 class FusionAwareGraph:
-    def __init__(self, model_graph: ModelGraph):
+    def __init__(self, model_graph):
+        """
+        model_graph: `ModelGraph` or `IndexedGraph`
+        """
         self._model_graph = model_graph
-        self._dag = list(nx.topological_sort(model_graph.get_networkx_graph()))
+        if isinstance(model_graph, ModelGraph):
+            model_graph = IndexedGraph.from_model_graph(model_graph)
+        order = model_graph.topological_sort()
+        self._dag = [model_graph.get_node_name(node) for node in order]
         self._uf = UF(len(self._dag))
 
-        reverse = {}
-        for index, name in enumerate(self._dag):
-            reverse[name] = index
+        reverse = [0] * len(model_graph.nodes)
+        for index, node in enumerate(order):
+            reverse[node] = index
+        in_indptr, in_indices = model_graph.in_indptr.tolist(), model_graph.in_indices.tolist()
+        out_indptr, out_indices = model_graph.out_indptr.tolist(), model_graph.out_indices.tolist()
         outbounds = []
         inbounds = []
-        for index, name in enumerate(self._dag):
+        for node in order:
             outbounds.append(
-                {reverse[outbound] for outbound in self._model_graph.get_node_outbounds(name)}
+                {reverse[outbound] for outbound in out_indices[out_indptr[node]: out_indptr[node + 1]]}
             )
             inbounds.append(
-                {reverse[inbound] for inbound in self._model_graph.get_node_inbounds(name)}
+                {reverse[inbound] for inbound in in_indices[in_indptr[node]: in_indptr[node + 1]]}
             )
 
         self._outbounds = outbounds
         self._inbounds = inbounds
         self._ready = [not inbounds[i] for i in range(0, len(self))]
-        self._types = [model_graph.get_node_type(name) for name in self._dag]
+        self._types = [model_graph.get_node_type(node) for node in order]
 
     @property
     def nodes(self):
@@ -1,14 +1,37 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-import copy
 from .constants import OP_ALIAS
 
 
-def convert_nodes(graph):
+def copy_graph_structure(graph):
+    """
+    copy the structure of the graph which is modified in kernel detection, i.e., the node dicts, the "attr" dicts and
+    the inbounds and outbounds lists, while the attribute values such as shapes are shared with the original graph
+    instead of deep copied
+    """
+    new_graph = {}
+    for name, node in graph.items():
+        new_node = dict(node)
+        if "attr" in node:
+            new_node["attr"] = dict(node["attr"])
+            if "attr" in node["attr"]:
+                new_node["attr"]["attr"] = dict(node["attr"]["attr"])
+        for key in ["inbounds", "outbounds"]:
+            if key in node:
+                new_node[key] = list(node[key])
+        new_graph[name] = new_node
+    return new_graph
+
+
+def convert_nodes(graph, copy=True):
     """
     Resolve inconsistency between ONNX and Tensorflow
+    @params:
+    graph: the nn-Meter IR graph
+    copy: if True, the graph is not modified and the result shares the attribute values with the graph, see
+        `copy_graph_structure`. Otherwise, the graph is converted in place.
     """
-    new_graph = copy.deepcopy(graph)
+    new_graph = copy_graph_structure(graph) if copy else graph
 
     for _, node in new_graph.items():
         type = node["attr"]["type"]
@@ -23,10 +23,8 @@ class MatchHelper:
             if value["attr"]["type"] in stripped_nodes:
                 removed_node.append(key)
 
-        for key in removed_node:
-            del graph[key]
-
-        model_graph.refresh()
+        model_graph.remove_nodes(removed_node)
+        model_graph.refresh(incremental=True)
 
     @staticmethod
     def tag_matched_nodes(model_graph, matched_subgraph):
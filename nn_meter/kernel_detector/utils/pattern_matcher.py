@@ -0,0 +1,215 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.utils.indexed_graph import IndexedGraph
+
+
+class PatternMatcher:
+    """
+    A matcher to find the subgraphs of a model graph that are isomorphic to a small pattern graph, such as a fusion
+    unit. It gives the same matches as `ModelGraph.find_subgraphs(pattern, MatchHelper.op_type_matcher)`, i.e.,
+    node-induced subgraph isomorphism with the same number of edges between the matched nodes, where a "dummy" node
+    matches a node of any type and tagged nodes are never matched. Each match is a dict from the graph node to the
+    pattern node excluding the dummy nodes, whose keys are in the same order as the networkx VF2 matcher. The matches
+    are also returned in the same order as VF2, since the first of the overlapping matches is the one fused.
+
+    Instead of the general VF2 search from every node, the search starts from the graph nodes with the rarest op type in
+    the pattern, which are looked up by an op type index, and extends the match to the neighbors of the matched nodes by
+    a depth-first search on the `IndexedGraph`. The time is linear in the graph size for the small and mostly
+    chain-shaped fusion units.
+    @params:
+
+    pattern: the pattern graph in `ModelGraph`
+    """
+    def __init__(self, pattern: ModelGraph):
+        # number the pattern nodes in the order of `ModelGraph.get_networkx_graph`
+        self.nodes = []
+        index = {}
+
+        def get_index(name):
+            if name not in index:
+                index[name] = len(self.nodes)
+                self.nodes.append(name)
+            return index[name]
+
+        edges = []
+        for name, value in pattern.get_graph().items():
+            get_index(name)
+            for inbound in value.get("inbounds", []):
+                edges.append((get_index(inbound), index[name]))
+
+        graph = pattern.get_graph()
+        self.types = [graph[name]["attr"]["type"] if name in graph else None for name in self.nodes]
+        self.valid = all(graph[name]["attr"].get("type") is not None and "_tagged" not in graph[name]["attr"]["attr"]
+                         if name in graph else False for name in self.nodes)
+        self.edge_count = {}
+        self.succs = [[] for _ in self.nodes]
+        self.preds = [[] for _ in self.nodes]
+        for src, dst in edges:
+            self.edge_count[src, dst] = self.edge_count.get((src, dst), 0) + 1
+            if dst not in self.succs[src]:
+                self.succs[src].append(dst)
+            if src not in self.preds[dst]:
+                self.preds[dst].append(src)
+        self.key_order, self.terminal_sets = self._get_vf2_order()
+
+    def _get_vf2_order(self):
+        """ return the order that VF2 adds the pattern nodes to a successful match, which is the order of the keys in
+        the match, and for each pattern node, the terminal set ("out", "in" or None for all nodes) that VF2 takes the
+        candidate graph nodes from
+        """
+        order, terminal_sets, mapped = [], [], set()
+        while len(order) < len(self.nodes):
+            out_nodes = [succ for node in order for succ in self.succs[node] if succ not in mapped]
+            in_nodes = [pred for node in order for pred in self.preds[node] if pred not in mapped]
+            if out_nodes:
+                candidates, terminal_set = out_nodes, "out"
+            elif in_nodes:
+                candidates, terminal_set = in_nodes, "in"
+            else:
+                candidates, terminal_set = [node for node in range(len(self.nodes)) if node not in mapped], None
+            node = min(candidates)
+            order.append(node)
+            terminal_sets.append(terminal_set)
+            mapped.add(node)
+        return order, terminal_sets
+
+    def _sort_vf2_order(self, model_graph, cores):
+        """ sort the matches given by their dicts from the pattern node to the graph node id in the order that VF2 finds
+        them, i.e., by the position of each matched graph node among the VF2 candidates in the order of `key_order`.
+
+        VF2 takes the candidates from the terminal sets of the partial match, which are dicts filled from python sets of
+        the node names, so the order depends on the string hashes of the process and is replayed by the same sets here.
+        The graph nodes are ordered as in `ModelGraph.get_networkx_graph`, where a node is added before its inbounds.
+        """
+        nodes = model_graph.nodes
+        inbounds = model_graph.get_inbound_lists()
+        succs = model_graph.get_successors()
+        nx_order = {}
+        for index, node in enumerate(nodes):
+            if node is not None:
+                nx_order.setdefault(index, None)
+                nx_order.update(dict.fromkeys(inbounds[index]))
+        all_rank = {name: rank for rank, name in enumerate(set(nodes[index].name for index in nx_order))}
+        preds = [list(dict.fromkeys(inbound)) for inbound in inbounds]
+        succs = [list(dict.fromkeys(succ)) for succ in succs]
+
+        def get_key(core):
+            key, mapped = [], {}
+            in_set, out_set = {}, {}
+            for node, terminal_set in zip(self.key_order, self.terminal_sets):
+                index = core[node]
+                name = nodes[index].name
+                if terminal_set is None:
+                    key.append(all_rank[name])
+                else:
+                    terminal = out_set if terminal_set == "out" else in_set
+                    key.append([other for other in terminal if other not in mapped].index(name))
+                mapped[name] = index
+                in_set.setdefault(name, None)
+                out_set.setdefault(name, None)
+                # the same updates of the terminal sets as `DiGMState`
+                for terminal, neighbors in ((in_set, preds), (out_set, succs)):
+                    new_nodes = set()
+                    for other in mapped.values():
+                        new_nodes.update([
+                            nodes[neighbor].name for neighbor in neighbors[other] if nodes[neighbor].name not in mapped
+                        ])
+                    for other in new_nodes:
+                        terminal.setdefault(other, None)
+            return key
+
+        return sorted(cores, key=get_key)
+
+    def _get_search_plan(self, type_count):
+        """ return the search order of the pattern nodes starting from the rarest op type, and for each node, a matched
+        neighbor to fetch the candidates from, together with the direction of the edge
+        """
+        typed = [node for node in range(len(self.nodes)) if self.types[node] != "dummy"] or [0]
+        start = min(typed, key=lambda node: (type_count.get(self.types[node], 0), node))
+        plan, mapped = [(start, None, None)], {start}
+
+        def rank(node):
+            # the typed neighbors are searched before the dummy ones
+            return (self.types[node] == "dummy", node)
+
+        while len(plan) < len(self.nodes):
+            step = None
+            for node, _, _ in plan:
+                for succ in self.succs[node]:
+                    if succ not in mapped and (step is None or rank(succ) < rank(step[0])):
+                        step = (succ, node, "out")
+                for pred in self.preds[node]:
+                    if pred not in mapped and (step is None or rank(pred) < rank(step[0])):
+                        step = (pred, node, "in")
+            if step is None:  # the pattern is not connected, start from a new node
+                node = min((node for node in range(len(self.nodes)) if node not in mapped),
+                           key=lambda node: (self.types[node] == "dummy", type_count.get(self.types[node], 0), node))
+                step = (node, None, None)
+            plan.append(step)
+            mapped.add(step[0])
+        return plan
+
+    def find_subgraphs(self, model_graph):
+        """ return the list of matches in the model graph (`ModelGraph` or `IndexedGraph`), where each match is a dict
+        from the graph node name to the pattern node name
+        """
+        if not self.valid:
+            return []
+        if isinstance(model_graph, ModelGraph):
+            model_graph = IndexedGraph.from_model_graph(model_graph)
+        nodes = model_graph.nodes
+        inbounds = model_graph.get_inbound_lists()
+        succs = model_graph.get_successors()
+        type_index = model_graph.get_type_index()
+        dummy_code = model_graph.get_type_code("dummy")
+        codes = [
+            dummy_code if node_type == "dummy" else model_graph.get_type_code(node_type) for node_type in self.types
+        ]
+        type_count = {node_type: len(type_index.get(code, [])) for node_type, code in zip(self.types, codes)}
+
+        def get_candidates(node, neighbor, direction):
+            if neighbor is not None:
+                image = core[neighbor]
+                return dict.fromkeys(succs[image] if direction == "out" else inbounds[image])
+            if self.types[node] == "dummy":
+                return range(len(nodes))
+            return type_index.get(codes[node], []) + type_index.get(dummy_code, [])
+
+        def is_feasible(node, index):
+            if index in used or "_tagged" in nodes[index].attr["attr"]:
+                return False
+            node_type = nodes[index].type
+            if self.types[node] != "dummy" and node_type != dummy_code and node_type != codes[node]:
+                return False
+            if inbounds[index].count(index) != self.edge_count.get((node, node), 0):
+                return False
+            for mapped_node, mapped_index in core.items():
+                if inbounds[mapped_index].count(index) != self.edge_count.get((node, mapped_node), 0):
+                    return False
+                if inbounds[index].count(mapped_index) != self.edge_count.get((mapped_node, node), 0):
+                    return False
+            return True
+
+        plan = self._get_search_plan(type_count)
+        cores, core, used = [], {}, set()
+
+        def search(depth):
+            if depth == len(plan):
+                cores.append(dict(core))
+                return
+            node, neighbor, direction = plan[depth]
+            for index in get_candidates(node, neighbor, direction):
+                if is_feasible(node, index):
+                    core[node] = index
+                    used.add(index)
+                    search(depth + 1)
+                    del core[node]
+                    used.discard(index)
+
+        search(0)
+        if len(cores) > 1:
+            cores = self._sort_vf2_order(model_graph, cores)
+        return [{
+            nodes[core[node]].name: self.nodes[node] for node in self.key_order if self.types[node] != "dummy"
+        } for core in cores]
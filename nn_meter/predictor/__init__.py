@@ -1,4 +1,10 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-from .prediction.utils import latency_metrics
-from .nn_meter_predictor import nnMeterPredictor, list_latency_predictors, load_latency_predictor
+from .prediction.utils import latency_metrics, LatencyMetrics
+from .prediction.predict_by_kernel import KernelLatencyCache, ModelLatencyMemo
+from .prediction.breakdown import LatencyBreakdown
+from .prediction.extract_feature import KernelDispatchTable
+from .nn_meter_predictor import nnMeterPredictor, list_latency_predictors, load_latency_predictor, \
+    compile_latency_predictor, MultiDevicePredictor, load_multi_device_predictor
+from .predictor_registry import PredictorRegistry, predictor_registry
+from .prediction_service import PredictionService
@@ -1,12 +1,17 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import os
+import time
 import logging
+import threading
 from packaging import version
-from .utils import load_config_file, loading_to_local, loading_customized_predictor
-from .prediction.predict_by_kernel import nn_predict
+from .utils import load_config_file, loading_to_local, loading_customized_predictor, check_predictors, \
+    dump_compiled_predictors, LazyKernelPredictors
+from .prediction.extract_feature import KernelDispatchTable, get_feature_matrices
+from .prediction.predict_by_kernel import nn_predict, nn_predict_batch, nn_predict_breakdown, \
+    predict_feature_matrices, predict_feature_matrices_batch
 from nn_meter.kernel_detector import KernelDetector
-from nn_meter.utils import get_user_data_folder
+from nn_meter.utils import get_user_data_folder, download_from_url, get_graph_fingerprint
 from nn_meter.ir_converter import model_file_to_graph, model_to_graph
 logging = logging.getLogger("nn-Meter")
 
@@ -49,7 +54,8 @@ def load_predictor_config(predictor_name: str, predictor_version: float = None):
         raise NotImplementedError('No predictor that meets the required name and version, please try again.')
 
 
-def load_latency_predictor(predictor_name: str, predictor_version: float = None):
+def load_latency_predictor(predictor_name: str, predictor_version: float = None, compile_forest: bool = False,
+                           lazy: bool = False, warmup: list = None, shared: bool = False):
     """ 
     return the predictor model according to the given predictor name and version
     @params:
@@ -59,28 +65,152 @@ def load_latency_predictor(predictor_name: str, predictor_version: float = None)
     
     predictor_version: string to specify the version of the target latency predictor. If not specified (default as None), the lateast version of the 
         predictor will be loaded.
+
+    compile_forest: whether to compile the random forest kernel predictors into flat array-backed tree ensembles. The
+        compiled predictors give the identical results as sklearn, with lower prediction overhead and memory usage. The
+        package created by `compile_latency_predictor` is memory-mapped instead if it is up to date.
+
+    lazy: whether to load each kernel predictor the first time a kernel of its type appears in a model, which speeds up
+        the loading and cuts memory for models containing only a few kernel types.
+
+    warmup: a list of kernel predictor names (such as ["conv-bn-relu", "dwconv-bn-relu", "fc"]) to load in advance when
+        `lazy` is True.
+
+    shared: whether to return the predictor shared in the process-wide `predictor_registry`. The shared predictor is
+        loaded only once and reused by all later calls, until its files are changed. The loading options of the first
+        call are used for the shared predictor.
     """
-    user_data_folder = get_user_data_folder()
+    if shared:
+        from .predictor_registry import predictor_registry
+        return predictor_registry.get(
+            predictor_name, predictor_version, compile_forest=compile_forest, lazy=lazy, warmup=warmup
+        )
+
     pred_info = load_predictor_config(predictor_name, predictor_version)
+    return load_predictor_by_info(pred_info, compile_forest, lazy, warmup)
+
+
+def load_predictor_by_info(pred_info, compile_forest=False, lazy=False, warmup=None):
+    """
+    return the predictor model according to the predictor information from the predictor config file. Refer to
+    `load_latency_predictor` for the loading options.
+    """
+    user_data_folder = get_user_data_folder()
+    if "download" in pred_info:
+        kernel_predictors, fusionrule = loading_to_local(
+            pred_info, os.path.join(user_data_folder, 'predictor'), compile_forest, lazy
+        )
+    else:
+        kernel_predictors, fusionrule = loading_customized_predictor(pred_info, compile_forest, lazy)
+
+    predictor = nnMeterPredictor(kernel_predictors, fusionrule, name=pred_info['name'], version=pred_info['version'])
+    if warmup:
+        predictor.warmup(warmup)
+    return predictor
+
+
+def load_multi_device_predictor(predictor_names: list, predictor_versions: list = None, **kwargs):
+    """
+    return the `MultiDevicePredictor` of the given predictors
+    @params:
+
+    predictor_names: the list of the names of the target latency predictors, such as
+        ["cortexA76cpu_tflite21", "adreno640gpu_tflite21"]
+
+    predictor_versions: the list of the versions of the predictors. The latest versions are loaded if not specified.
+
+    The other keyword arguments (such as `compile_forest`, `lazy` and `shared`) are passed to `load_latency_predictor`
+    for each predictor.
+    """
+    predictor_versions = predictor_versions or [None] * len(predictor_names)
+    return MultiDevicePredictor({
+        name: load_latency_predictor(name, version, **kwargs)
+        for name, version in zip(predictor_names, predictor_versions)
+    })
+
+
+def get_predictor_path(pred_info):
+    """
+    return the folder of the kernel predictors and fusion rules according to the predictor information
+    """
     if "download" in pred_info:
-        kernel_predictors, fusionrule = loading_to_local(pred_info, os.path.join(user_data_folder, 'predictor'))
+        return os.path.join(get_user_data_folder(), 'predictor', pred_info['name'])
     else:
-        kernel_predictors, fusionrule = loading_customized_predictor(pred_info)
-        
-    return nnMeterPredictor(kernel_predictors, fusionrule)
+        return pred_info['package_location']
+
+
+def compile_latency_predictor(predictor_name: str, predictor_version: float = None):
+    """
+    compile the kernel predictors of the predictor into a memory-mapped package, which is used by
+    `load_latency_predictor(..., compile_forest=True)` afterwards instead of unpickling and compiling the kernel
+    predictors. The package is not used if the kernel predictors are updated after the compilation.
+    @params:
+
+    predictor_name: string to specify the name of the target latency predictor.
+
+    predictor_version: string to specify the version of the target latency predictor. If not specified (default as
+        None), the lateast version of the predictor will be compiled.
+    """
+    pred_info = load_predictor_config(predictor_name, predictor_version)
+    ppath = get_predictor_path(pred_info)
+    if "download" in pred_info and not check_predictors(ppath, pred_info["kernel_predictors"]):
+        logging.keyinfo(f'Download from {pred_info["download"]} ...')
+        download_from_url(pred_info["download"], os.path.dirname(ppath))
+    return dump_compiled_predictors(ppath)
 
 
 class nnMeterPredictor:
-    def __init__(self, predictors, fusionrule):
+    def __init__(self, predictors, fusionrule, cache=None, memo=None, name=None, version=None):
+        """
+        @params:
+
+        predictors: dictionary object, key: kernel name, object: loaded kernel latency predictor
+
+        fusionrule: path to the fusion rule file of the predictor
+
+        cache: an optional `KernelLatencyCache` object. If given, the latency of kernels that have been predicted before
+            is read from the cache instead of being predicted again. Use `cache.stats()` to view the hit and miss
+            statistics.
+
+        memo: an optional `ModelLatencyMemo` object. If given, the latency of models whose nn-Meter IR graph has the
+            same fingerprint as a model predicted before is read from the memo, skipping kernel detection and
+            prediction.
+
+        name, version: the name and version of the predictor, which identify the predictor in the keys of `memo`. The
+            path of the fusion rule file is used if the name is not given.
+        """
         self.kernel_predictors = predictors
         self.fusionrule = fusionrule
+        self.cache = cache
+        self.memo = memo
+        self.name = name
+        self.version = version
         self.kd = KernelDetector(self.fusionrule)
+        # resolve the kernel predictor and feature extractors of each op only the first time it appears
+        self.dispatch_table = KernelDispatchTable()
+        self._kd_lock = threading.Lock()
+
+    def warmup(self, kernel_names=None):
+        """
+        load the lazily loaded kernel predictors in advance. Nothing will be done if the kernel predictors are loaded
+        eagerly.
+        @params:
+
+        kernel_names: a list of kernel predictor names or kernel types. All kernel predictors are loaded if not
+            specified.
+        """
+        if isinstance(self.kernel_predictors, LazyKernelPredictors):
+            if kernel_names is not None:
+                kernel_names = [self.dispatch_table.resolve(name).kernelname for name in kernel_names]
+            self.kernel_predictors.warmup(kernel_names)
 
     def predict(
-        self, model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False
+        self, model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, details=None, return_breakdown=False,
+        static_only=False
     ):
         """
-        return the predicted latency in microseconds (ms)
+        return the predicted latency in microseconds (ms), or the `LatencyBreakdown` of the model if `return_breakdown`
+        is True
         @params:
 
         model: the model to be predicted, allowed file include
@@ -100,16 +230,242 @@ class nnMeterPredictor:
             converter is used, which requires onnx installation (well tested version is onnx==1.9.0). NNI-based converter is much faster while the conversion is unstable 
             as it could fail in some case. Onnx-based converter is much slower but stable compared to NNI-based converter. This parameter is only accessed when 
             model_type == 'torch'
+
+        static_only: if True, the tensorflow model file is converted without importing tensorflow, where all shapes are
+            inferred statically. A ValueError is raised if the model contains ops not supported by the static inference.
+            This parameter is only accessed when model_type == 'pb'
+
+        details: an optional dict to be filled with the details of the prediction, including the total latency of each
+            kernel predictor in ms as `details["kernels"]`, and the time cost in seconds of model conversion, kernel
+            detection and kernel prediction as `details["timings"]`
+
+        return_breakdown: if True, return a `LatencyBreakdown` object holding the name, type, prediction features and
+            predicted latency in ms of each detected kernel, as well as the total latency as `.total`
+
+        The `memo` of the predictor is only used when neither `details` nor `return_breakdown` is requested.
         """
         logging.info("Start latency prediction ...")
+        timings = {}
+        graph = self._convert_model(model, model_type, input_shape, apply_nni, timings, static_only)
+
+        memo_key = None
+        if self.memo is not None and details is None and not return_breakdown:
+            memo_key = self.get_memo_key(graph)
+            py = self.memo.get(memo_key)
+            if py is not None:
+                logging.info(f"Predict latency: {py} ms (memoized)")
+                return py
+
+        kernels = self._detect_graph_kernels(graph, graph is model, timings)
+
+        start = time.perf_counter()
+        breakdown = {} if details is not None else None
+        if return_breakdown:
+            result = nn_predict_breakdown(self.kernel_predictors, kernels, self.cache, breakdown, self.dispatch_table)
+            py = result.total
+        else:
+            # in unit of ms
+            py = result = nn_predict(self.kernel_predictors, kernels, self.cache, breakdown, self.dispatch_table)
+        timings["predict"] = time.perf_counter() - start
+        logging.info(f"Predict latency: {py} ms")
+        if memo_key is not None:
+            self.memo.put(memo_key, py)
+
+        if details is not None:
+            details["kernels"] = breakdown
+            details["timings"] = timings
+        return result
+
+    def predict_batch(
+        self, models, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, static_only=False
+    ):
+        """
+        return the list of predicted latency in microseconds (ms) for a list of models. Kernels are detected model by
+        model, while the kernel predictors are called only once for each kernel type over all models, which is much
+        faster than calling `predict` for each model.
+        @params:
+
+        models: a list of models to be predicted. All models should be of the same `model_type`. Refer to `predict` for
+            the allowed model formats.
+
+        model_type: string to specify the type of parameter model, allowed items are ["pb", "torch", "onnx",
+            "nnmeter-ir", "nni-ir"]
+
+        input_shape: the shape of input tensor for inference (if necessary). Refer to `predict` for more information.
+
+        apply_nni: switch the torch converter used for torch model parsing. Refer to `predict` for more information.
+
+        static_only: whether to convert the tensorflow model files without tensorflow. Refer to `predict` for more
+            information.
+        """
+        logging.info(f"Start latency prediction for {len(models)} models ...")
+        kernels_list = [
+            self._detect_kernels(model, model_type, input_shape, apply_nni, static_only=static_only) for model in models
+        ]
+
+        pys = nn_predict_batch(self.kernel_predictors, kernels_list, self.cache, self.dispatch_table)  # in unit of ms
+        logging.info(f"Predict latency: {pys} ms")
+        return pys
+
+    def get_memo_key(self, graph, fingerprint=None):
+        """
+        return the key of the nn-Meter IR graph in `memo`, i.e., (predictor name, predictor version, graph fingerprint).
+        The fingerprint is computed from the graph if not given.
+        """
+        if fingerprint is None:
+            fingerprint = get_graph_fingerprint(graph)
+        return (self.name or os.path.abspath(self.fusionrule), self.version, fingerprint)
+
+    def _detect_kernels(self, model, model_type, input_shape, apply_nni, timings=None, static_only=False):
+        graph = self._convert_model(model, model_type, input_shape, apply_nni, timings, static_only)
+        return self._detect_graph_kernels(graph, graph is model, timings)
+
+    def _convert_model(self, model, model_type, input_shape, apply_nni, timings=None, static_only=False):
+        start = time.perf_counter()
         if isinstance(model, str):
-            graph = model_file_to_graph(model, model_type, input_shape, apply_nni=apply_nni)
+            graph = model_file_to_graph(model, model_type, input_shape, apply_nni=apply_nni, static_only=static_only)
         else:
             graph = model_to_graph(model, model_type, input_shape=input_shape, apply_nni=apply_nni)
-        
+
+        if timings is not None:
+            timings["convert"] = time.perf_counter() - start
+        return graph
+
+    def _detect_graph_kernels(self, graph, shared, timings=None):
         # logging.info(graph)
-        self.kd.load_graph(graph)
+        with self._kd_lock:  # the kernel detector holds the state of one graph at a time
+            start = time.perf_counter()
+            # the graph converted from the model is owned by the detector, while the nn-Meter IR graph of users should
+            # not be modified
+            self.kd.load_graph(graph, copy=shared)
+            kernels = self.kd.get_kernels()
 
-        py = nn_predict(self.kernel_predictors, self.kd.get_kernels()) # in unit of ms
-        logging.info(f"Predict latency: {py} ms")
-        return py
+        if timings is not None:
+            timings["detect"] = time.perf_counter() - start
+        return kernels
+
+
+class MultiDevicePredictor:
+    def __init__(self, predictors):
+        """
+        Predict the latency of a model on several devices in one pass. The model is converted to the nn-Meter IR graph
+        once, the kernels are detected once for the devices sharing identical fusion rules, and the prediction features
+        of the kernels are extracted once and shared by the kernel predictors of these devices. The predicted latency of
+        each device is identical to the `predict` of its predictor.
+        @params:
+
+        predictors: dict object, key: device name, object: `nnMeterPredictor` of the device. The `cache` and `memo` of
+            each predictor are used if set.
+        """
+        self.predictors = dict(predictors)
+        # group the devices by the compiled fusion rules, which are shared by the rule files with the same content
+        groups = {}
+        for device, predictor in self.predictors.items():
+            groups.setdefault(id(predictor.kd.reader.compiled), []).append(device)
+        self.device_groups = list(groups.values())
+
+    def predict(self, model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, static_only=False):
+        """
+        return the dict of the predicted latency in microseconds (ms) on each device. Refer to
+        `nnMeterPredictor.predict` for the parameters.
+        """
+        logging.info(f"Start latency prediction on {len(self.predictors)} devices ...")
+        graph = self._convert_model(model, model_type, input_shape, apply_nni, static_only)
+        fingerprint = None
+        if any(predictor.memo is not None for predictor in self.predictors.values()):
+            fingerprint = get_graph_fingerprint(graph)
+
+        result = {}
+        for i, devices in enumerate(self.device_groups):
+            memo_keys = {}
+            for device in devices:
+                predictor = self.predictors[device]
+                if predictor.memo is not None:
+                    memo_keys[device] = predictor.get_memo_key(graph, fingerprint)
+                    py = predictor.memo.get(memo_keys[device])
+                    if py is not None:
+                        result[device] = py
+            pending = [device for device in devices if device not in result]
+            if not pending:
+                continue
+
+            # the graph is copied by the detector unless it is owned and not used by the later groups
+            shared = graph is model or i < len(self.device_groups) - 1
+            kernels = self.predictors[pending[0]]._detect_graph_kernels(graph, shared)
+            features = {}
+            for device in pending:
+                predictor = self.predictors[device]
+                dispatch_table = predictor.dispatch_table
+                if id(dispatch_table) not in features:
+                    features[id(dispatch_table)] = get_feature_matrices(kernels, dispatch_table=dispatch_table)
+                result[device] = predict_feature_matrices(
+                    features[id(dispatch_table)], predictor.kernel_predictors, predictor.cache
+                )  # in unit of ms
+                if device in memo_keys:
+                    predictor.memo.put(memo_keys[device], result[device])
+
+        result = {device: result[device] for device in self.predictors}
+        logging.info(f"Predict latency: {result} ms")
+        return result
+
+    def predict_batch(self, models, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, static_only=False):
+        """
+        return the list of the dicts of the predicted latency in microseconds (ms) on each device for a list of models.
+        The kernel predictors of each device are called only once over all models, and the models found in the `memo` of
+        a device are not predicted again on the device. Refer to `nnMeterPredictor.predict_batch` for the parameters.
+        """
+        logging.info(f"Start latency prediction for {len(models)} models on {len(self.predictors)} devices ...")
+        graphs = [self._convert_model(model, model_type, input_shape, apply_nni, static_only) for model in models]
+        fingerprints = [None] * len(models)
+        if any(predictor.memo is not None for predictor in self.predictors.values()):
+            fingerprints = [get_graph_fingerprint(graph) for graph in graphs]
+
+        result = [{} for _ in models]
+        for i, devices in enumerate(self.device_groups):
+            memo_keys = {}
+            for device in devices:
+                predictor = self.predictors[device]
+                if predictor.memo is not None:
+                    memo_keys[device] = [predictor.get_memo_key(graph, fp) for graph, fp in zip(graphs, fingerprints)]
+                    for latencies, memo_key in zip(result, memo_keys[device]):
+                        py = predictor.memo.get(memo_key)
+                        if py is not None:
+                            latencies[device] = py
+            # the models missing from the memo of any device of the group
+            pending = [
+                index for index, latencies in enumerate(result) if any(device not in latencies for device in devices)
+            ]
+            if not pending:
+                continue
+
+            detector = self.predictors[devices[0]]
+            # the converted graphs are owned by the detector of the last device group only
+            last_group = i == len(self.device_groups) - 1
+            kernels_list = [
+                detector._detect_graph_kernels(graphs[index], graphs[index] is models[index] or not last_group)
+                for index in pending
+            ]
+            features = {}
+            for device in devices:
+                predictor = self.predictors[device]
+                dispatch_table = predictor.dispatch_table
+                if id(dispatch_table) not in features:
+                    features[id(dispatch_table)] = [
+                        get_feature_matrices(kernels, dispatch_table=dispatch_table) for kernels in kernels_list
+                    ]
+                rows = [row for row, index in enumerate(pending) if device not in result[index]]
+                pys = predict_feature_matrices_batch(
+                    [features[id(dispatch_table)][row] for row in rows], predictor.kernel_predictors, predictor.cache
+                )  # in unit of ms
+                for row, py in zip(rows, pys):
+                    result[pending[row]][device] = py
+                    if device in memo_keys:
+                        predictor.memo.put(memo_keys[device][pending[row]], py)
+
+        result = [{device: latencies[device] for device in self.predictors} for latencies in result]
+        logging.info(f"Predict latency: {result} ms")
+        return result
+
+    def _convert_model(self, model, model_type, input_shape, apply_nni, static_only):
+        predictor = next(iter(self.predictors.values()))
+        return predictor._convert_model(model, model_type, input_shape, apply_nni, static_only=static_only)
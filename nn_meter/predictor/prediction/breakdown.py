@@ -0,0 +1,88 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import numpy as np
+
+
+class LatencyBreakdown:
+    """
+    The per-kernel latency breakdown of a model, which is backed by a numpy structured array with one row for each
+    detected kernel in the order of `KernelDetector.get_kernels`. The kernels without a matching kernel predictor have
+    zero latency and no features.
+    @params:
+
+    names: the kernel names, such as "conv-bn-relu#12"
+
+    ops: the kernel types, such as "conv-bn-relu"
+
+    features: the list of prediction features of each kernel, or None if the kernel is not predicted
+
+    latencies: the predicted latency of each kernel in ms
+
+    total: the predicted latency of the model in ms, which is identical to the result of `nnMeterPredictor.predict`
+    """
+    def __init__(self, names, ops, features, latencies, total):
+        n_features = max([len(f) for f in features if f is not None], default=0)
+        self.kernels = np.zeros(len(names), dtype=[
+            ("name", object), ("op", object), ("predicted", bool), ("features", np.float64, (n_features,)),
+            ("latency", np.float64)
+        ])
+        self.kernels["name"] = names
+        self.kernels["op"] = ops
+        self.kernels["features"] = np.nan
+        for i, f in enumerate(features):
+            if f is not None:
+                self.kernels["predicted"][i] = True
+                self.kernels["features"][i, :len(f)] = f
+        self.kernels["latency"] = latencies
+        self.total = total
+
+    def __len__(self):
+        return len(self.kernels)
+
+    def __getitem__(self, index):
+        return self.kernels[index]
+
+    def __iter__(self):
+        return iter(self.kernels)
+
+    def __float__(self):
+        return float(self.total)
+
+    def __repr__(self):
+        return f"LatencyBreakdown(total={self.total}, kernels={len(self)})"
+
+    @property
+    def names(self):
+        return self.kernels["name"]
+
+    @property
+    def ops(self):
+        return self.kernels["op"]
+
+    @property
+    def latencies(self):
+        return self.kernels["latency"]
+
+    def by_op(self):
+        """ return the dict of the total latency of each kernel type, in the order of first appearance
+        """
+        result = {}
+        for op, latency in zip(self.kernels["op"], self.kernels["latency"]):
+            result[op] = result.get(op, 0) + float(latency)
+        return result
+
+    def top(self, k=10):
+        """ return the `k` kernels with the highest latency
+        """
+        order = np.argsort(-self.kernels["latency"], kind="stable")
+        return self.kernels[order[:k]]
+
+    def to_list(self):
+        """ return the breakdown as a list of dict, where the features of each kernel are trimmed to its own length
+        """
+        return [{
+            "name": row["name"],
+            "op": row["op"],
+            "features": row["features"][~np.isnan(row["features"])].tolist() if row["predicted"] else None,
+            "latency": float(row["latency"])
+        } for row in self.kernels]
@@ -2,7 +2,9 @@
 # Licensed under the MIT license.
 import logging
 import numpy as np
+from functools import lru_cache
 from sklearn.metrics import mean_squared_error
+from .utils import get_kernel_name, merge_conv_kernels
 
 
 def get_flop(input_channel, output_channel, k, H, W, stride):
@@ -33,95 +35,323 @@ def get_flops_params(blocktype, hw, cin, cout, kernelsize, stride):
         return flop, flop
 
 
-def get_predict_features(config):
+def _get_conv_params(item):
+    return item["inputh"], item["cin"], item["cout"], item["ks"][1], item["strides"][1] if "strides" in item else 1
+
+
+def get_conv_features(item):
+    inputh, cin, cout, ks, s = _get_conv_params(item)
+    flops, params = get_flops_params(item["op"], inputh, cin, cout, ks, s)
+    return [inputh, cin, cout, ks, s, flops / 2e6, params / 1e6]
+
+
+def get_fc_features(item):
+    cout = item["cout"]
+    cin = item["cin"]
+    flop = (2 * cin + 1) * cout
+    return [cin, cout, flop / 2e6, flop / 1e6]
+
+
+def get_pool_features(item):
+    return list(_get_conv_params(item))
+
+
+def get_global_pool_features(item):
+    inputh = item["inputh"] if hasattr(item, "inputh") else 1
+    cin = item["cin"]
+    return [inputh, cin]
+
+
+def get_channelshuffle_features(item):
+    [b, inputh, inputw, cin] = item["input_tensors"][0]
+    return [inputh, cin]
+
+
+def get_se_features(item):
+    inputh = item["input_tensors"][-1][-2]
+    cin = item["input_tensors"][-1][-1]
+    return [inputh, cin]
+
+
+def get_concat_features(item):  # maximum 4 branches
+    itensors = item["input_tensors"]
+    inputh = itensors[0][1]
+    features = [inputh, len(itensors)]
+    for it in itensors:
+        co = it[-1]
+        features.append(co)
+    if len(features) < 6:
+        features = features + [0] * (6 - len(features))
+    elif len(features) > 6:
+        nf = features[0:6]
+        features = nf
+        features[1] = 6
+    return features
+
+
+def get_hswish_features(item):
+    if "inputh" in item:
+        inputh = item["inputh"]
+    else:
+        if len(item["input_tensors"][0]) == 2:
+            inputh = item["input_tensors"][0][0]
+        else:
+            inputh = item["input_tensors"][0][1]
+    cin = item["cin"]
+    return [inputh, cin]
+
+
+def get_bn_relu_features(item):
+    itensors = item["input_tensors"]
+    if len(itensors[0]) == 4:
+        inputh = itensors[0][1]
+        cin = itensors[0][3]
+    else:
+        inputh = itensors[0][0]
+        cin = itensors[0][1]
+    return [inputh, cin]
+
+
+def get_add_features(item):
+    itensors = item["input_tensors"]
+    inputh = itensors[0][1]
+    cin1 = itensors[0][3]
+    cin2 = itensors[1][3]
+    return [inputh, cin1, cin2]
+
+
+def _get_columns(items, keys):
+    """ return the float matrix of the given fields of the kernels
     """
-    get prediction features
+    columns = np.empty((len(items), len(keys)))
+    for j, key in enumerate(keys):
+        columns[:, j] = [item[key] for item in items]
+    return columns
+
+
+def _get_conv_columns(items):
+    features = np.empty((len(items), 7))
+    features[:, 0: 3] = _get_columns(items, ["inputh", "cin", "cout"])
+    features[:, 3] = [item["ks"][1] for item in items]
+    features[:, 4] = [item["strides"][1] if "strides" in item else 1 for item in items]
+    return features
+
+
+def get_conv_feature_matrix(items):
+    features = _get_conv_columns(items)
+    hw, cin, cout, ks, s = features[:, 0: 5].T
+    # the same expressions as `get_flop`, so that the features are identical to `get_conv_features`
+    params = cout * (ks * ks * cin + 1)
+    flops = 2 * hw / s * hw / s * params
+    features[:, 5] = flops / 2e6
+    features[:, 6] = params / 1e6
+    return features
+
+
+def get_dwconv_feature_matrix(items):
+    features = _get_conv_columns(items)
+    hw, cin, cout, ks, s = features[:, 0: 5].T
+    # the same expressions as `get_depthwise_flop`
+    params = cout * (ks * ks + 1)
+    flops = 2 * hw / s * hw / s * params
+    features[:, 5] = flops / 2e6
+    features[:, 6] = params / 1e6
+    return features
+
+
+def get_fc_feature_matrix(items):
+    features = np.empty((len(items), 4))
+    features[:, 0: 2] = _get_columns(items, ["cin", "cout"])
+    flop = (2 * features[:, 0] + 1) * features[:, 1]
+    features[:, 2] = flop / 2e6
+    features[:, 3] = flop / 1e6
+    return features
+
+
+def get_pool_feature_matrix(items):
+    return _get_conv_columns(items)[:, 0: 5]
+
+
+@lru_cache(maxsize=None)
+def get_row_feature_matrix(extract):
+    """ return the function extracting the feature matrix of kernels row by row with the feature extractor `extract`
     """
-    mdicts = {}
-    layer = 0
-    for item in config:
-        logging.info(item)
-    for item in config:
-        op = item["op"]
-        if "conv" in op or "maxpool" in op or "avgpool" in op:
-            cout = item["cout"]
-            cin = item["cin"]
-            ks = item["ks"][1]
-            s = item["strides"][1] if "strides" in item else 1
-            inputh = item["inputh"]
-        if op in ["channelshuffle", "split"]:
-            [b, inputh, inputw, cin] = item["input_tensors"][0]
+    def extract_matrix(items):
+        return np.array([extract(item) for item in items], dtype=float)
+    return extract_matrix
 
+
+class KernelDispatch:
+    """
+    The dispatch entry of an op in `KernelDispatchTable`.
+    @params:
+
+    kernelname: the name of the kernel predictor of the op
+
+    extract: the function returning the prediction features in list of a detected kernel, or None if there is no
+        matching predictor for the op
+
+    extract_matrix: the function returning the feature matrix of a list of detected kernels of the op. The ops with the
+        same kernel predictor and `extract_matrix` are predicted in one group.
+    """
+    __slots__ = ("kernelname", "extract", "extract_matrix")
+
+    def __init__(self, kernelname, extract, extract_matrix=None):
+        self.kernelname = kernelname
+        self.extract = extract
+        if extract is not None and extract_matrix is None:
+            extract_matrix = get_row_feature_matrix(extract)
+        self.extract_matrix = extract_matrix
+
+    def __repr__(self):
+        extract = getattr(self.extract, "__name__", None)
+        return f"KernelDispatch(kernelname={self.kernelname!r}, extract={extract})"
+
+
+class KernelDispatchTable:
+    """
+    A memo from the op of detected kernels (such as "conv-bn-relu6" or "dwconv-bn-hswish") to its `KernelDispatch`,
+    i.e., the kernel predictor name and the feature extractors. Each op is resolved by `get_kernel_name` and the op
+    checks of the feature extractors only the first time it appears, including the ops without matching predictors.
+    Use `register` to add kernel types.
+    """
+    def __init__(self):
+        self._entries = {}
+        self._registrations = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, op):
+        return op in self._entries
+
+    def resolve(self, op):
+        entry = self._entries.get(op)
+        if entry is None:
+            entry = self._entries[op] = self.resolve_op(op)
+        return entry
+
+    def register(self, op, kernelname, extract, extract_matrix=None):
+        """
+        register the kernel predictor and the feature extractors of an op, which overrides the built-in resolution
+        @params:
+        op: the op of the detected kernels
+        kernelname: the name of the kernel predictor
+        extract: the function returning the prediction features in list of a detected kernel
+        extract_matrix: an optional function returning the feature matrix of a list of detected kernels. The features
+            are extracted row by row with `extract` if not specified.
+        """
+        self._entries[op] = KernelDispatch(kernelname, extract, extract_matrix)
+        self._registrations[op] = (kernelname, extract, extract_matrix)
+
+    def get_registrations(self):
+        """ return the list of (op, kernelname, extract, extract_matrix) given to `register` in the registration order
+        """
+        return [(op, *registration) for op, registration in self._registrations.items()]
+
+    @staticmethod
+    def resolve_op(op):
+        """ return the built-in `KernelDispatch` of the op
+        """
+        kernelname = get_kernel_name(op)
         if "conv" in op:
-            flops, params = get_flops_params(op, inputh, cin, cout, ks, s)
-            features = [inputh, cin, cout, ks, s, flops / 2e6, params / 1e6]
-        elif "fc" in op or "fc-relu" in op:
-            cout = item["cout"]
-            cin = item["cin"]
-            flop = (2 * cin + 1) * cout
-            features = [cin, cout, flop / 2e6, flop / 1e6]
+            if "dwconv" in op:
+                return KernelDispatch(kernelname, get_conv_features, get_dwconv_feature_matrix)
+            return KernelDispatch(kernelname, get_conv_features, get_conv_feature_matrix)
+        elif "fc" in op:
+            return KernelDispatch(kernelname, get_fc_features, get_fc_feature_matrix)
         elif "pool" in op and "global" not in op:
-            features = [inputh, cin, cout, ks, s]
+            return KernelDispatch(kernelname, get_pool_features, get_pool_feature_matrix)
         elif "global-pool" in op or "global-avgpool" in op or "gap" in op:
-            inputh = item["inputh"] if hasattr(item, "inputh") else 1
-            cin = item["cin"]
-            features = [inputh, cin]
-        elif "channelshuffle" in op:
-            features = [inputh, cin]
-        elif "split" in op:
-            features = [inputh, cin]
+            return KernelDispatch(kernelname, get_global_pool_features)
+        elif "channelshuffle" in op or "split" in op:
+            return KernelDispatch(kernelname, get_channelshuffle_features)
         elif "se" in op or "SE" in op:
-            inputh = item["input_tensors"][-1][-2]
-            cin = item["input_tensors"][-1][-1]
-            features = [inputh, cin]
-        elif "concat" in op:  # maximum 4 branches
-            itensors = item["input_tensors"]
-            inputh = itensors[0][1]
-            features = [inputh, len(itensors)]
-            for it in itensors:
-                co = it[-1]
-                features.append(co)
-            if len(features) < 6:
-                features = features + [0] * (6 - len(features))
-            elif len(features) > 6:
-                nf = features[0:6]
-                features = nf
-                features[1] = 6
+            return KernelDispatch(kernelname, get_se_features)
+        elif "concat" in op:
+            return KernelDispatch(kernelname, get_concat_features)
         elif op in ["hswish"]:
-            if "inputh" in item:
-                inputh = item["inputh"]
-            else:
-                if len(item["input_tensors"][0]) == 2:
-                    inputh = item["input_tensors"][0][0]
-                else:
-                    inputh = item["input_tensors"][0][1]
-            cin = item["cin"]
-            features = [inputh, cin]
+            return KernelDispatch(kernelname, get_hswish_features)
         elif op in ["bn", "relu", "bn-relu"]:
-            itensors = item["input_tensors"]
-            if len(itensors[0]) == 4:
-                inputh = itensors[0][1]
-                cin = itensors[0][3]
-            else:
-                inputh = itensors[0][0]
-                cin = itensors[0][1]
-            features = [inputh, cin]
-
+            return KernelDispatch(kernelname, get_bn_relu_features)
         elif op in ["add-relu", "add"]:
-            itensors = item["input_tensors"]
-            inputh = itensors[0][1]
-            cin1 = itensors[0][3]
-            cin2 = itensors[1][3]
-            features = [inputh, cin1, cin2]
-        else: # indicates that there is no matching predictor for this op
-            # logging.warning(f'There is no matching predictor for op {op}.')
+            return KernelDispatch(kernelname, get_add_features)
+        else:  # indicates that there is no matching predictor for this op
+            return KernelDispatch(kernelname, None)
+
+
+# the dispatch table used when no table is given
+default_dispatch_table = KernelDispatchTable()
+
+
+def get_kernel_features(item, dispatch_table=None):
+    """
+    get the prediction features of a detected kernel, or None if there is no matching predictor for the op of the kernel
+    """
+    if dispatch_table is None:
+        dispatch_table = default_dispatch_table
+    extract = dispatch_table.resolve(item["op"]).extract
+    return extract(item) if extract is not None else None
+
+
+def get_predict_features(config, kernel_indices=None, dispatch_table=None):
+    """
+    get prediction features
+    @params:
+    config: the list of detected kernels
+    kernel_indices: an optional list to be filled with the index in `config` of each layer of the returned features
+    dispatch_table: the `KernelDispatchTable` to resolve the ops, or None to use the default table
+    """
+    mdicts = {}
+    layer = 0
+    for item in config:
+        logging.info(item)
+    for index, item in enumerate(config):
+        features = get_kernel_features(item, dispatch_table)
+        if features is None:
             continue
         mdicts[layer] = {}
-        mdicts[layer][op] = features
+        mdicts[layer][item["op"]] = features
+        if kernel_indices is not None:
+            kernel_indices.append(index)
         layer += 1
     return mdicts
 
 
+def get_feature_matrices(config, kernel_indices=None, dispatch_table=None):
+    """
+    get prediction features in columns. The kernels are grouped once by the op with the conv and dwconv ops merged by
+    `merge_conv_kernels`, together with the kernel predictor name and feature extractor given by the dispatch table.
+    The features of each group are extracted into one numpy matrix, with the FLOPs and parameters computed in array
+    expressions. The features are the same as `get_predict_features` in float.
+    @params:
+    config: the list of detected kernels
+    kernel_indices: an optional list to be filled with the index in `config` of each kernel with prediction features,
+        in order
+    dispatch_table: the `KernelDispatchTable` to resolve the ops, or None to use the default table
+
+    return a list of (kernel predictor name, indices, features) in the order of the first kernel of each group, where
+    indices is the array of the kernel indices in `config` and features is the feature matrix with a row for each kernel
+    """
+    if dispatch_table is None:
+        dispatch_table = default_dispatch_table
+    resolve = dispatch_table.resolve
+    groups = {}
+    for index, item in enumerate(config):
+        entry = resolve(item["op"])
+        if entry.extract_matrix is not None:  # drop the kernels without matching predictors
+            key = (merge_conv_kernels(item["op"]), entry.kernelname, entry.extract_matrix)
+            groups.setdefault(key, []).append(index)
+
+    result = []
+    for (_, kernelname, extract_matrix), indices in groups.items():
+        features = extract_matrix([config[index] for index in indices])
+        result.append((kernelname, np.array(indices), features))
+    if kernel_indices is not None:
+        kernel_indices.extend(sorted(index for _, indices, _ in result for index in indices))
+    return result
+
+
 def read_model_latency(latency_file):
     """
     read model latency csv files. It can provide the benchmarked latency, and compare with the predicted latency
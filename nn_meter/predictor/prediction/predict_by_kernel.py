@@ -1,55 +1,271 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
-from .utils import get_kernel_name
-from .extract_feature import get_predict_features
+import os
+import pickle
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from .extract_feature import get_feature_matrices, get_kernel_features
+from .breakdown import LatencyBreakdown
+logging = logging.getLogger("nn-Meter")
 
 
-def merge_conv_kernels(kernelname):
+class KernelLatencyCache:
     """
-    to speed up, we merge conv and dwconv related kernels into one kernel by their name
+    a bounded LRU cache of predicted kernel latency, keyed by the kernel predictor name and the feature tuple of the
+    kernel. Only the kernels missing from the cache are sent to the kernel predictors. A cache should only be used
+    together with one predictor, since the key does not identify the predictor. The cache is thread-safe, so that it
+    could be shared by the predictors used in several threads.
+    @params:
+
+    maxsize: the maximum number of cached kernels. The least recently used kernel is dropped when the cache is full.
+    filename: the path to persist the cache. If the file exists, the cache is initialized from it. Call `save()` to
+        write the cache to the file.
     """
-    if "conv" in kernelname and "dwconv" not in kernelname:
-        return "conv-bn-relu"
-    elif "dwconv" in kernelname:
-        return "dwconv-bn-relu"
-    else:
-        return kernelname
+    item_name = "kernels"
+
+    def __init__(self, maxsize=100000, filename=None):
+        self.maxsize = maxsize
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        if filename is not None and os.path.isfile(filename):
+            self.load(filename)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ return the cached latency of the key, or None if the key is not cached
+        """
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._put(key, value)
+
+    def _put(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def save(self, filename=None):
+        filename = filename or self.filename
+        if filename is None:
+            raise ValueError("Please specify the file name to save the kernel latency cache.")
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        with self._lock:
+            items = list(self._cache.items())
+        with open(filename, "wb") as fp:
+            pickle.dump(items, fp)
+        logging.info(f"Save {len(items)} cached {self.item_name} to {filename}")
+
+    def load(self, filename):
+        with open(filename, "rb") as fp:
+            items = pickle.load(fp)
+        with self._lock:
+            for key, value in items:
+                self._put(key, value)
+        logging.info(f"Load {len(items)} cached {self.item_name} from {filename}")
+
+
+class ModelLatencyMemo(KernelLatencyCache):
+    """
+    a bounded LRU memo of predicted model latency, keyed by the predictor name, the predictor version and the
+    fingerprint of the nn-Meter IR graph given by `get_graph_fingerprint`. Since the key identifies the predictor, a
+    memo could be shared by several predictors. Refer to `KernelLatencyCache` for the parameters and persistence.
+    """
+    item_name = "models"
+
+    def __init__(self, maxsize=10000, filename=None):
+        super().__init__(maxsize, filename)
+
+
+def predict_kernel(pred, kernelname, features, cache=None):
+    """
+    predict the latency of a list of kernel features by the kernel predictor. If `cache` is given, only the features
+    missing from the cache are predicted by the kernel predictor.
+    """
+    if cache is None:
+        return pred.predict(features)  # in unit of ms
+
+    # the keys of feature matrices are built from python floats, the same as the keys of feature lists
+    rows = features.tolist() if isinstance(features, np.ndarray) else features
+    keys = [(kernelname, tuple(f)) for f in rows]
+    pys = np.empty(len(keys))
+    missing_keys, missing_features, missing_rows = {}, [], []
+    for i, key in enumerate(keys):
+        py = cache.get(key)
+        if py is not None:
+            pys[i] = py
+        elif key in missing_keys:
+            missing_rows.append((i, missing_keys[key]))
+        else:
+            missing_keys[key] = len(missing_features)
+            missing_features.append(features[i])
+            missing_rows.append((i, missing_keys[key]))
+
+    if missing_features:
+        missing_pys = pred.predict(missing_features)
+        for key, j in missing_keys.items():
+            cache.put(key, missing_pys[j])
+        for i, j in missing_rows:
+            pys[i] = missing_pys[j]
+    return pys
 
 
-def predict_model(model, predictors):
+def predict_feature_matrices(groups, predictors, cache=None, breakdown=None, latencies=None):
     """
+    predict the latency of a model from the feature matrices given by `get_feature_matrices`
     @params:
-    model: the model config with prediction features
+    groups: the list of (kernel predictor name, kernel indices, feature matrix) of the model
     predictors: loaded pkl predictors
+    cache: an optional `KernelLatencyCache` object to look up the latency of kernels before calling the predictors
+    breakdown: an optional dict to be filled with the total latency of each kernel predictor
+    latencies: an optional array to be filled with the latency of each kernel at its kernel index
     """
     py = 0
-    dicts = {}
-    for layer in model:
-        kernel = list(model[layer].keys())[0]
-        features = model[layer][kernel]
-        rkernel = merge_conv_kernels(kernel)
-        if rkernel not in dicts:
-            dicts[rkernel] = []
-        dicts[rkernel].append(features)
-
-    for kernel in dicts:
-        kernelname = get_kernel_name(kernel)
+    for kernelname, indices, features in groups:
         if kernelname in predictors:
-            pred = predictors[kernelname]
-            pys = pred.predict(dicts[kernel]) # in unit of ms
+            pys = predict_kernel(predictors[kernelname], kernelname, features, cache)  # in unit of ms
             if len(pys) != 0:
                 py += sum(pys)
-
+                if breakdown is not None:
+                    breakdown[kernelname] = breakdown.get(kernelname, 0) + float(sum(pys))
+                if latencies is not None:
+                    latencies[indices] = pys
     return py
 
 
-def nn_predict(predictors, kernel_units):
+def predict_feature_matrices_batch(models, predictors, cache=None):
+    """
+    predict the latency of a list of models from their feature matrices given by `get_feature_matrices`, with one
+    `predict` call for each kernel predictor
+    @params:
+    models: a list of the feature matrix groups of each model
+    predictors: loaded pkl predictors
+    cache: an optional `KernelLatencyCache` object to look up the latency of kernels before calling the predictors
+    """
+    # stack the matrices of all models by kernel predictor, recording the row range of each model
+    matrices, sizes, ranges = {}, {}, []
+    for groups in models:
+        model_ranges = []
+        for kernelname, _, features in groups:
+            if kernelname in predictors:
+                start = sizes.get(kernelname, 0)
+                matrices.setdefault(kernelname, []).append(features)
+                sizes[kernelname] = start + len(features)
+                model_ranges.append((kernelname, start, sizes[kernelname]))
+        ranges.append(model_ranges)
+
+    kernel_pys = {
+        kernelname: predict_kernel(predictors[kernelname], kernelname, np.concatenate(features), cache)  # in unit of ms
+        for kernelname, features in matrices.items()
+    }
+
+    # scatter the results back to models, summing in the same order as `predict_feature_matrices`
+    result = []
+    for model_ranges in ranges:
+        py = 0
+        for kernelname, start, end in model_ranges:
+            if end > start:
+                py += sum(kernel_pys[kernelname][start: end])
+        result.append(py)
+    return result
+
+
+def nn_predict(predictors, kernel_units, cache=None, breakdown=None, dispatch_table=None):
     """
     @params:
     predictors: dictionary object, key: kernel name, object: loaded pkl latency model
     kernel_units: the divided kernel units and the features of a model.
+    cache: an optional `KernelLatencyCache` object to look up the latency of kernels before calling the predictors
+    breakdown: an optional dict to be filled with the total latency of each kernel predictor
+    dispatch_table: the `KernelDispatchTable` to resolve the ops of kernels, or None to use the default table
     """
 
-    features = get_predict_features(kernel_units)
-    py = predict_model(features, predictors)
+    groups = get_feature_matrices(kernel_units, dispatch_table=dispatch_table)
+    py = predict_feature_matrices(groups, predictors, cache, breakdown)
     return py
+
+
+def nn_predict_breakdown(predictors, kernel_units, cache=None, breakdown=None, dispatch_table=None):
+    """
+    return the `LatencyBreakdown` of a model, including the predicted latency of each kernel and the total latency
+    @params:
+    predictors: dictionary object, key: kernel name, object: loaded pkl latency model
+    kernel_units: the divided kernel units and the features of a model.
+    cache: an optional `KernelLatencyCache` object to look up the latency of kernels before calling the predictors
+    breakdown: an optional dict to be filled with the total latency of each kernel predictor
+    dispatch_table: the `KernelDispatchTable` to resolve the ops of kernels, or None to use the default table
+    """
+    groups = get_feature_matrices(kernel_units, dispatch_table=dispatch_table)
+    latencies = np.zeros(len(kernel_units))
+    py = predict_feature_matrices(groups, predictors, cache, breakdown, latencies)
+
+    # report the features in the original types of `get_kernel_features`
+    kernel_features = [None] * len(kernel_units)
+    for kernelname, indices, _ in groups:
+        if kernelname in predictors:
+            for index in indices:
+                kernel_features[index] = get_kernel_features(kernel_units[index], dispatch_table)
+    return LatencyBreakdown(
+        names=[kernel.get("name", kernel["op"]) for kernel in kernel_units],
+        ops=[kernel["op"] for kernel in kernel_units],
+        features=kernel_features,
+        latencies=latencies,
+        total=py
+    )
+
+
+def nn_predict_batch(predictors, kernel_units_list, cache=None, dispatch_table=None):
+    """
+    @params:
+    predictors: dictionary object, key: kernel name, object: loaded pkl latency model
+    kernel_units_list: a list of the divided kernel units and the features of each model.
+    cache: an optional `KernelLatencyCache` object to look up the latency of kernels before calling the predictors
+    dispatch_table: the `KernelDispatchTable` to resolve the ops of kernels, or None to use the default table
+    """
+    models = [get_feature_matrices(kernel_units, dispatch_table=dispatch_table) for kernel_units in kernel_units_list]
+    pys = predict_feature_matrices_batch(models, predictors, cache)
+    return pys
@@ -0,0 +1,105 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import numpy as np
+
+
+class FlatForestRegressor:
+    """
+    A tree ensemble regressor stored in contiguous node arrays. The nodes of all trees are concatenated, and the
+    children indices are global indices into the node arrays. Leaf nodes are marked by a negative `feature`, following
+    the convention of sklearn. The prediction is the mean of the leaf values over all trees, which is identical to the
+    prediction of the sklearn forest it is compiled from.
+    @params:
+
+    feature: int array of the split feature of each node, negative for leaf nodes
+    threshold: float array of the split threshold of each node. A sample goes left if its feature <= threshold
+    children_left: int array of the global index of the left child of each node
+    children_right: int array of the global index of the right child of each node
+    value: float array of the predicted value of each node
+    roots: int array of the global index of the root node of each tree
+    n_features: the number of features of the input samples
+    """
+    arrays = ["feature", "threshold", "children_left", "children_right", "value", "roots"]
+
+    def __init__(self, feature, threshold, children_left, children_right, value, roots, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.value = value
+        self.roots = roots
+        self.n_features = n_features
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """ compile a fitted sklearn forest regressor (such as `RandomForestRegressor`) to a `FlatForestRegressor`
+        """
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only the forest with single output could be compiled.")
+
+        feature, threshold, children_left, children_right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            left = tree.children_left.astype(np.int32)
+            right = tree.children_right.astype(np.int32)
+            is_leaf = left < 0
+            feature.append(np.where(is_leaf, -2, tree.feature).astype(np.int32))
+            threshold.append(tree.threshold.astype(np.float64))
+            children_left.append(np.where(is_leaf, -1, left + offset).astype(np.int32))
+            children_right.append(np.where(is_leaf, -1, right + offset).astype(np.int32))
+            value.append(tree.value.reshape(tree.node_count, -1)[:, 0].astype(np.float64))
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            children_left=np.concatenate(children_left),
+            children_right=np.concatenate(children_right),
+            value=np.concatenate(value),
+            roots=np.array(roots, dtype=np.int64),
+            n_features=getattr(forest, "n_features_in_", None) or forest.n_features_,
+        )
+
+    def to_arrays(self):
+        return {name: getattr(self, name) for name in self.arrays}
+
+    def apply(self, X):
+        """ return the global index of the leaf node reached by each sample in each tree, in shape of
+        (n_samples, n_estimators)
+        """
+        # sklearn evaluates the splits on float32 samples
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X should be in shape of (n_samples, {self.n_features}), but got {X.shape}.")
+        n_samples, n_trees = X.shape[0], len(self.roots)
+        X = X.ravel()
+
+        # traverse all (sample, tree) pairs at once, dropping the pairs reaching a leaf in each step
+        nodes = np.tile(np.asarray(self.roots), n_samples)
+        feature = self.feature[nodes]
+        active = np.flatnonzero(feature >= 0)
+        current, feature = nodes[active], feature[active]
+        base = active // n_trees * self.n_features
+        while active.size:
+            go_left = X[base + feature] <= self.threshold[current]
+            current = np.where(go_left, self.children_left[current], self.children_right[current])
+            nodes[active] = current
+            feature = self.feature[current]
+            inner = feature >= 0
+            active, current, feature, base = active[inner], current[inner], feature[inner], base[inner]
+        return nodes.reshape(n_samples, n_trees)
+
+    def predict(self, X):
+        values = self.value[self.apply(X)]
+        # accumulate the trees in order, which gives the same rounding as sklearn
+        return np.cumsum(values, axis=1)[:, -1] / self.n_estimators
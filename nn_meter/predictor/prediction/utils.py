@@ -35,6 +35,18 @@ def get_kernel_name(optype):
     return optype
 
 
+def merge_conv_kernels(kernelname):
+    """
+    to speed up, we merge conv and dwconv related kernels into one kernel by their name
+    """
+    if "conv" in kernelname and "dwconv" not in kernelname:
+        return "conv-bn-relu"
+    elif "dwconv" in kernelname:
+        return "dwconv-bn-relu"
+    else:
+        return kernelname
+
+
 def get_accuracy(y_pred, y_true, threshold=0.01):
     a = (y_true - y_pred) / y_true
     b = np.where(abs(a) <= threshold)
@@ -52,4 +64,44 @@ def latency_metrics(y_pred, y_true):
     acc5 = get_accuracy(y_pred, y_true, threshold=0.05)
     acc10 = get_accuracy(y_pred, y_true, threshold=0.10)
     acc15 = get_accuracy(y_pred, y_true, threshold=0.15)
-    return rmse, rmspe, rmse / np.mean(y_true), acc5, acc10, acc15
\ No newline at end of file
+    return rmse, rmspe, rmse / np.mean(y_true), acc5, acc10, acc15
+
+
+class LatencyMetrics:
+    """
+    accumulate the evaluation metrics of `latency_metrics` incrementally, so that the predictions are evaluated batch by
+    batch without being kept in memory. The accumulators of several workers could be combined by `merge`.
+    """
+    thresholds = (0.05, 0.10, 0.15)
+
+    def __init__(self):
+        self.count = 0
+        self.sum_squared_error = 0.0
+        self.sum_squared_relative_error = 0.0
+        self.sum_true = 0.0
+        self.hits = [0] * len(self.thresholds)
+
+    def update(self, y_pred, y_true):
+        y_true = np.asarray(y_true, dtype=float)
+        y_pred = np.asarray(y_pred, dtype=float)
+        relative_error = (y_true - y_pred) / y_true
+        self.count += len(y_true)
+        self.sum_squared_error += float(np.sum(np.square(y_true - y_pred)))
+        self.sum_squared_relative_error += float(np.sum(np.square(relative_error)))
+        self.sum_true += float(np.sum(y_true))
+        for i, threshold in enumerate(self.thresholds):
+            self.hits[i] += int(np.count_nonzero(abs(relative_error) <= threshold))
+
+    def merge(self, other):
+        self.count += other.count
+        self.sum_squared_error += other.sum_squared_error
+        self.sum_squared_relative_error += other.sum_squared_relative_error
+        self.sum_true += other.sum_true
+        self.hits = [a + b for a, b in zip(self.hits, other.hits)]
+
+    def result(self):
+        """ return (rmse, rmspe, rmse / mean latency, acc5, acc10, acc15) in the same order as `latency_metrics`
+        """
+        rmse = np.sqrt(self.sum_squared_error / self.count)
+        rmspe = np.sqrt(self.sum_squared_relative_error / self.count) * 100
+        return (rmse, rmspe, rmse / (self.sum_true / self.count), *[hits / self.count for hits in self.hits])
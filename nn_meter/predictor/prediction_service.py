@@ -0,0 +1,334 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import pickle
+import asyncio
+import logging
+import threading
+import numpy as np
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .prediction.extract_feature import get_feature_matrices
+from .prediction.predict_by_kernel import predict_kernel
+logging = logging.getLogger("nn-Meter")
+
+
+class PredictionService:
+    """
+    An asyncio prediction service wrapping a `nnMeterPredictor` for many concurrent prediction requests. The models are
+    converted and their kernels are detected on a worker pool, and the kernel feature rows of concurrent requests are
+    coalesced into micro-batches for each kernel predictor. A micro-batch is sent to the kernel predictor once it has
+    `max_batch_size` rows, or `max_wait` seconds after its first row arrives. The predicted latency is identical to
+    `nnMeterPredictor.predict`.
+
+    The service should be used in one event loop, e.g.,
+    ```
+    async with PredictionService(predictor) as service:
+        latencies = await asyncio.gather(*[service.predict(model, "onnx") for model in models])
+    ```
+    @params:
+
+    predictor: the `nnMeterPredictor` object. Its `cache` and `memo` are used if set.
+
+    max_batch_size: the number of rows to send a micro-batch to a kernel predictor immediately
+
+    max_wait: the maximum time in seconds for a row to wait for other rows before being sent to a kernel predictor
+
+    workers: the number of threads or processes to convert models and detect kernels
+
+    processes: whether to convert models and detect kernels in worker processes instead of threads. The kernel detection
+        of a predictor is run by one thread at a time, so that worker processes give much higher throughput for many
+        concurrent requests, while the models should be picklable (e.g., model files or nn-Meter IR graphs). The ops
+        registered to the `dispatch_table` of the predictor are registered in each worker again, so that their feature
+        extractors should be picklable (e.g., module-level functions). The `cache` and `memo` of the predictor are used
+        in the service process.
+    """
+    def __init__(self, predictor, max_batch_size=1024, max_wait=0.002, workers=4, processes=False):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.processes = processes
+        if processes:
+            registrations = predictor.dispatch_table.get_registrations()
+            try:
+                pickle.dumps(registrations)
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                raise ValueError(
+                    "The feature extractors registered to the dispatch table should be picklable in the processes "
+                    f"mode: {e}"
+                )
+            # each worker process holds a predictor without kernel predictors, only to convert models and detect kernels
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_service_worker,
+                initargs=(predictor.fusionrule, predictor.name, predictor.version, registrations)
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="nn-meter-convert")
+        # the kernel predictors and the kernel latency cache are called by one thread
+        self.predict_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nn-meter-predict")
+        self._memo_lock = threading.Lock()
+        self._pending = {}  # kernel predictor name -> list of (features, future)
+        self._pending_rows = {}
+        self._timers = {}
+        self.requests = 0
+        self.batches = 0
+        self.rows = 0
+
+    async def predict(self, model, model_type, input_shape=(1, 3, 224, 224), apply_nni=False, static_only=False):
+        """
+        return the predicted latency in microseconds (ms) of the model. Refer to `nnMeterPredictor.predict` for the
+        parameters.
+        """
+        loop = asyncio.get_running_loop()
+        self.requests += 1
+        if self.processes:
+            memo_key, groups = await loop.run_in_executor(
+                self.executor,
+                partial(
+                    _prepare_in_worker, model, model_type, input_shape, apply_nni, static_only,
+                    self.predictor.memo is not None
+                )
+            )
+            py = self._get_memoized(memo_key)
+        else:
+            memo_key, py, groups = await loop.run_in_executor(
+                self.executor, partial(self._prepare, model, model_type, input_shape, apply_nni, static_only)
+            )
+        if py is not None:
+            return py
+
+        predictors = self.predictor.kernel_predictors
+        futures = [self._submit(kernelname, features) for kernelname, _, features in groups if kernelname in predictors]
+        py = 0
+        for pys in await asyncio.gather(*futures):
+            if len(pys) != 0:
+                py += sum(pys)  # in unit of ms, summed in the same order as `nn_predict`
+        if memo_key is not None:
+            with self._memo_lock:
+                self.predictor.memo.put(memo_key, py)
+        return py
+
+    def _prepare(self, model, model_type, input_shape, apply_nni, static_only):
+        """ convert the model and extract the feature matrices of its kernels, or return the memoized latency
+        """
+        predictor = self.predictor
+        graph = predictor._convert_model(model, model_type, input_shape, apply_nni, static_only=static_only)
+        memo_key = predictor.get_memo_key(graph) if predictor.memo is not None else None
+        py = self._get_memoized(memo_key)
+        if py is not None:
+            return memo_key, py, None
+        kernels = predictor._detect_graph_kernels(graph, graph is model)
+        return memo_key, None, get_feature_matrices(kernels, dispatch_table=predictor.dispatch_table)
+
+    def _get_memoized(self, memo_key):
+        if memo_key is None:
+            return None
+        with self._memo_lock:
+            return self.predictor.memo.get(memo_key)
+
+    def _submit(self, kernelname, features):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(kernelname, []).append((features, future))
+        self._pending_rows[kernelname] = self._pending_rows.get(kernelname, 0) + len(features)
+        if self._pending_rows[kernelname] >= self.max_batch_size:
+            self._flush(kernelname)
+        elif kernelname not in self._timers:
+            self._timers[kernelname] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, kernelname)
+        return future
+
+    def _flush(self, kernelname):
+        """ send the pending rows of the kernel predictor as one micro-batch
+        """
+        timer = self._timers.pop(kernelname, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(kernelname, [])
+        self._pending_rows.pop(kernelname, None)
+        if not batch:
+            return
+        features = np.concatenate([rows for rows, _ in batch]) if len(batch) > 1 else batch[0][0]
+        self.batches += 1
+        self.rows += len(features)
+        task = asyncio.get_running_loop().run_in_executor(
+            self.predict_executor, self._predict_rows, kernelname, features
+        )
+        task.add_done_callback(partial(self._scatter, batch))
+
+    def _predict_rows(self, kernelname, features):
+        predictor = self.predictor
+        # in unit of ms
+        return predict_kernel(predictor.kernel_predictors[kernelname], kernelname, features, predictor.cache)
+
+    @staticmethod
+    def _scatter(batch, task):
+        """ split the results of a micro-batch to the requests
+        """
+        if task.cancelled() or task.exception() is not None:
+            for _, future in batch:
+                if not future.done():
+                    if task.cancelled():
+                        future.cancel()
+                    else:
+                        future.set_exception(task.exception())
+            return
+        pys, start = task.result(), 0
+        for rows, future in batch:
+            if not future.done():
+                future.set_result(pys[start: start + len(rows)])
+            start += len(rows)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+        }
+
+    async def close(self):
+        """ send all pending rows to the kernel predictors and shut down the thread pools
+        """
+        for kernelname in list(self._pending):
+            self._flush(kernelname)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, partial(self.executor.shutdown, wait=True))
+        await loop.run_in_executor(None, partial(self.predict_executor.shutdown, wait=True))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+# the predictor without kernel predictors in each worker process of `PredictionService`
+_worker_predictor = None
+
+
+def _init_service_worker(fusionrule, name, version, registrations=()):
+    global _worker_predictor
+    from .nn_meter_predictor import nnMeterPredictor
+    _worker_predictor = nnMeterPredictor({}, fusionrule, name=name, version=version)
+    for op, kernelname, extract, extract_matrix in registrations:
+        _worker_predictor.dispatch_table.register(op, kernelname, extract, extract_matrix)
+
+
+def _prepare_in_worker(model, model_type, input_shape, apply_nni, static_only, use_memo):
+    """ convert the model and extract the feature matrices of its kernels in a worker process, returning the memo key
+    if needed
+    """
+    predictor = _worker_predictor
+    graph = predictor._convert_model(model, model_type, input_shape, apply_nni, static_only=static_only)
+    memo_key = predictor.get_memo_key(graph) if use_memo else None
+    # the model is a private copy unpickled in the worker, which could be modified by the detector
+    kernels = predictor._detect_graph_kernels(graph, False)
+    return memo_key, get_feature_matrices(kernels, dispatch_table=predictor.dispatch_table)
+
+
+_http_reasons = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"
+}
+
+
+async def _write_response(writer, status, content, keep_alive):
+    body = json.dumps(content).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {_http_reasons[status]}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+
+async def _handle_request(service, method, path, body):
+    """ return the status code and the json content of the response to a request
+    """
+    if path == "/stats":
+        return 200, service.stats()
+    if path != "/predict":
+        return 404, {"error": f"Unknown path {path}."}
+    if method != "POST":
+        return 405, {"error": "Please POST the prediction request."}
+    try:
+        request = json.loads(body)
+        model, model_type = request["model"], request["model_type"]
+    except (ValueError, TypeError, KeyError):
+        return 400, {"error": 'The request should be a json object with the fields "model" and "model_type".'}
+    try:
+        latency = await service.predict(
+            model, model_type,
+            input_shape=tuple(request.get("input_shape", (1, 3, 224, 224))),
+            static_only=request.get("static_only", False)
+        )
+    except Exception as e:
+        logging.warning(f"Failed to predict the latency of {model if isinstance(model, str) else 'the model'}: {e}")
+        return 500, {"error": str(e)}
+    return 200, {"latency": float(latency)}
+
+
+async def handle_http_connection(service, reader, writer):
+    """
+    serve the HTTP/1.1 requests of a connection. `POST /predict` with a json body
+    {"model": <model path or nn-Meter IR graph>, "model_type": <model type>, "input_shape": <optional>,
+    "static_only": <optional>} returns {"latency": <latency in ms>}, and `GET /stats` returns the micro-batch statistics
+    of the service.
+    """
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            keep_alive = headers.get("connection", "").lower() != "close"
+
+            status, content = await _handle_request(service, method, path.split("?", 1)[0], body)
+            await _write_response(writer, status, content, keep_alive)
+            if not keep_alive:
+                break
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(service, host="127.0.0.1", port=8000, unix_socket=None):
+    """
+    start serving the prediction service over HTTP on the host and port, or on the unix socket if `unix_socket` is
+    given, and return the `asyncio` server
+    """
+    handler = partial(handle_http_connection, service)
+    if unix_socket:
+        return await asyncio.start_unix_server(handler, path=unix_socket)
+    return await asyncio.start_server(handler, host, port)
+
+
+async def _serve_forever(predictor, host, port, unix_socket, **kwargs):
+    async with PredictionService(predictor, **kwargs) as service:
+        server = await start_server(service, host, port, unix_socket)
+        logging.keyinfo(f"Serving latency prediction on {unix_socket or f'http://{host}:{port}'} ...")
+        async with server:
+            await server.serve_forever()
+
+
+def serve(
+    predictor, host="127.0.0.1", port=8000, unix_socket=None, max_batch_size=1024, max_wait=0.002, workers=4,
+    processes=False
+):
+    """
+    run the prediction service of the predictor as a local server until interrupted. Refer to `PredictionService` for
+    the batching options and `handle_http_connection` for the requests.
+    """
+    try:
+        asyncio.run(_serve_forever(
+            predictor, host, port, unix_socket, max_batch_size=max_batch_size, max_wait=max_wait, workers=workers,
+            processes=processes
+        ))
+    except KeyboardInterrupt:
+        pass
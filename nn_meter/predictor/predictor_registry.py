@@ -0,0 +1,112 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import logging
+import threading
+from .utils import get_package_signature, __user_config_folder__
+from .nn_meter_predictor import load_predictor_config, load_predictor_by_info, get_predictor_path, \
+    __predictors_cfg_filename__
+logging = logging.getLogger("nn-Meter")
+
+
+def get_file_signature(filename):
+    try:
+        stat = os.stat(filename)
+        return (stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+class PredictorRegistry:
+    """
+    A thread-safe registry of loaded predictors, which returns the same `nnMeterPredictor` object for the same predictor
+    name, version and package path. A registered predictor is reloaded when the files in its package (kernel predictors,
+    fusion rules and compiled package) are changed, which is detected by the size and modification time of the files.
+    The resolved predictor information is cached until the predictors config file is changed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._predictors = {}  # (name, version, package path) -> (predictor, package signature)
+        self._pred_infos = {}  # (name, version) -> predictor information
+        self._config_signature = None
+
+    def get(self, predictor_name: str, predictor_version: float = None, **kwargs):
+        """
+        return the shared predictor according to the given predictor name and version, loading it if it is not
+        registered or its files are changed. The keyword arguments are passed to `load_latency_predictor` when loading.
+        """
+        pred_info = self._get_pred_info(predictor_name, predictor_version)
+        key = self._get_key(pred_info)
+        signature = get_package_signature(key[2])
+
+        entry = self._predictors.get(key)
+        if entry is not None and entry[1] == signature:
+            return entry[0]
+
+        with self._get_load_lock(key):
+            entry = self._predictors.get(key)
+            if entry is not None and entry[1] == signature:
+                return entry[0]
+            if entry is not None:
+                logging.info(f"Predictor {key[0]} (version {key[1]}) has been changed, reload it.")
+            predictor = load_predictor_by_info(pred_info, **kwargs)
+            # take the signature after loading, since the predictor may be downloaded or compiled during loading
+            self._predictors[key] = (predictor, get_package_signature(key[2]))
+            return predictor
+
+    def reload(self, predictor_name: str, predictor_version: float = None, **kwargs):
+        """
+        load the predictor again and replace the registered one
+        """
+        self.evict(predictor_name, predictor_version)
+        return self.get(predictor_name, predictor_version, **kwargs)
+
+    def evict(self, predictor_name: str, predictor_version: float = None):
+        """
+        remove the registered predictors with the given name and version (all versions if not specified). Return the
+        number of removed predictors. The predictors in use are not affected.
+        """
+        with self._lock:
+            keys = [key for key in self._predictors
+                    if key[0] == predictor_name and (predictor_version is None or key[1] == predictor_version)]
+            for key in keys:
+                del self._predictors[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._predictors.clear()
+            self._pred_infos.clear()
+
+    def __len__(self):
+        return len(self._predictors)
+
+    def __contains__(self, key):
+        return key in self._predictors
+
+    def _get_pred_info(self, predictor_name, predictor_version):
+        config_signature = get_file_signature(os.path.join(__user_config_folder__, __predictors_cfg_filename__))
+        with self._lock:
+            if config_signature != self._config_signature:
+                self._pred_infos.clear()
+                self._config_signature = config_signature
+            pred_info = self._pred_infos.get((predictor_name, predictor_version))
+        if pred_info is None:
+            pred_info = load_predictor_config(predictor_name, predictor_version)
+            with self._lock:
+                self._pred_infos[(predictor_name, predictor_version)] = pred_info
+        return pred_info
+
+    def _get_key(self, pred_info):
+        return (pred_info['name'], pred_info['version'], os.path.abspath(get_predictor_path(pred_info)))
+
+    def _get_load_lock(self, key):
+        with self._lock:
+            if key not in self._load_locks:
+                self._load_locks[key] = threading.Lock()
+            return self._load_locks[key]
+
+
+# the process-wide predictor registry
+predictor_registry = PredictorRegistry()
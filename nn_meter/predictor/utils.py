@@ -1,24 +1,34 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import os
+import json
 import yaml
 import pickle
 import logging
+import threading
+import numpy as np
 from glob import glob
+from functools import partial
+from collections.abc import Mapping
+from .prediction.tree_ensemble import FlatForestRegressor
 from nn_meter.utils import download_from_url, create_user_configs
 logging = logging.getLogger("nn-Meter")
 
 
 __user_config_folder__ = os.path.expanduser('~/.nn_meter/config')
+__compiled_manifest_filename__ = 'compiled_predictors.json'
+__compiled_data_filename__ = 'compiled_predictors.bin'
 
 
-def loading_to_local(pred_info, dir):
+def loading_to_local(pred_info, dir, compile_forest=False, lazy=False):
     """ loading builtin predictors to local
 
     @params:
 
     pred_info: a dictionary containing predictor information
     dir: the local directory to store the kernel predictors and fusion rules
+    compile_forest: whether to compile the forest kernel predictors to `FlatForestRegressor`
+    lazy: whether to load each kernel predictor only when it is used for the first time
     """
     os.makedirs(dir, exist_ok=True)
     hardware = pred_info['name']
@@ -30,14 +40,7 @@ def loading_to_local(pred_info, dir):
         download_from_url(pred_info["download"], dir)
 
     # load predictors
-    predictors = {}
-    ps = glob(os.path.join(ppath, "**.pkl"))
-    for p in ps:
-        pname =  os.path.basename(p).replace(".pkl", "")
-        with open(p, "rb") as f:
-            logging.info("load predictor %s" % p)
-            model = pickle.load(f)
-            predictors[pname] = model
+    predictors = load_kernel_predictors(ppath, compile_forest, lazy=lazy)
     fusionrule = os.path.join(ppath, "fusion_rules.json")
     # logging.info(fusionrule)
     if not os.path.isfile(fusionrule):
@@ -47,11 +50,13 @@ def loading_to_local(pred_info, dir):
     return predictors, fusionrule
 
 
-def loading_customized_predictor(pred_info):
+def loading_customized_predictor(pred_info, compile_forest=False, lazy=False):
     """ loading customized predictor
 
     @params:
     pred_info: a dictionary containing predictor information
+    compile_forest: whether to compile the forest kernel predictors to `FlatForestRegressor`
+    lazy: whether to load each kernel predictor only when it is used for the first time
     """
     hardware = pred_info['name']
     ppath = pred_info['package_location']
@@ -61,14 +66,7 @@ def loading_customized_predictor(pred_info):
         raise FileExistsError(f"The predictor {hardware} in {ppath} does not exist.")
 
     # load predictors
-    predictors = {}
-    ps = glob(os.path.join(ppath, "**.pkl"))
-    for p in ps:
-        pname =  os.path.basename(p).replace(".pkl", "")
-        with open(p, "rb") as f:
-            logging.info("load predictor %s" % p)
-            model = pickle.load(f)
-            predictors[pname] = model
+    predictors = load_kernel_predictors(ppath, compile_forest, lazy=lazy)
     fusionrule = os.path.join(ppath, "fusion_rules.json")
     # logging.info(fusionrule)
     if not os.path.isfile(fusionrule):
@@ -78,6 +76,202 @@ def loading_customized_predictor(pred_info):
     return predictors, fusionrule
 
 
+class LazyKernelPredictors(Mapping):
+    """ a read-only mapping from kernel name to kernel predictor, in which each kernel predictor is loaded the first
+    time it is accessed. Checking whether a kernel predictor exists by `in` does not load it.
+
+    @params:
+
+    loaders: a dictionary object, key: kernel name, object: a function without arguments returning the kernel predictor
+    """
+    def __init__(self, loaders):
+        self._loaders = loaders
+        self._predictors = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        if name not in self._predictors:
+            loader = self._loaders[name]
+            with self._lock:
+                if name not in self._predictors:
+                    self._predictors[name] = loader()
+        return self._predictors[name]
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def __iter__(self):
+        return iter(self._loaders)
+
+    def __len__(self):
+        return len(self._loaders)
+
+    def is_loaded(self, name):
+        return name in self._predictors
+
+    def warmup(self, names=None):
+        """ load the given kernel predictors in advance. All kernel predictors are loaded if `names` is None.
+        """
+        for name in (self._loaders if names is None else names):
+            if name in self._loaders:
+                self[name]
+
+
+def load_kernel_predictors(ppath, compile_forest=False, use_compiled=None, lazy=False):
+    """ load all kernel predictors (*.pkl) in the predictor folder
+
+    @params:
+
+    ppath: the folder of the kernel predictors
+    compile_forest: whether to compile the forest kernel predictors to `FlatForestRegressor`, which holds the trees in
+        contiguous arrays and predicts the small number of kernels of a model much faster than sklearn
+    use_compiled: whether to memory-map the compiled package created by `dump_compiled_predictors` if it is up to date,
+        which holds the `FlatForestRegressor` of the forest kernel predictors. Default to `compile_forest`, so that the
+        sklearn kernel predictors are loaded unless `compile_forest` is True.
+    lazy: whether to return a `LazyKernelPredictors` object, which loads each kernel predictor when it is used for the
+        first time
+    """
+    if use_compiled is None:
+        use_compiled = compile_forest
+    loaders = get_compiled_predictor_loaders(ppath) if use_compiled else None
+    if loaders is None:
+        loaders = {}
+        ps = glob(os.path.join(ppath, "**.pkl"))
+        for p in ps:
+            pname = os.path.basename(p).replace(".pkl", "")
+            loaders[pname] = partial(load_pickle_predictor, p, compile_forest)
+
+    if lazy:
+        return LazyKernelPredictors(loaders)
+    return {pname: loader() for pname, loader in loaders.items()}
+
+
+def load_pickle_predictor(filename, compile_forest=False):
+    with open(filename, "rb") as f:
+        logging.info("load predictor %s" % filename)
+        model = pickle.load(f)
+    if compile_forest:
+        model = compile_kernel_predictor(model)
+    return model
+
+
+def compile_kernel_predictor(model):
+    """ compile a sklearn forest kernel predictor to `FlatForestRegressor`. Other predictors are returned unchanged.
+    """
+    if not hasattr(model, "estimators_") or not all(hasattr(e, "tree_") for e in model.estimators_):
+        logging.info(f"{type(model).__name__} is not a forest regressor and will not be compiled.")
+        return model
+    return FlatForestRegressor.from_sklearn(model)
+
+
+def get_source_signature(ppath):
+    """ return the size and modification time of the kernel predictor files (*.pkl) in the predictor folder
+    """
+    signature = {}
+    for p in sorted(glob(os.path.join(ppath, "**.pkl"))):
+        stat = os.stat(p)
+        signature[os.path.basename(p)] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def get_package_signature(ppath):
+    """ return the size and modification time of all files in the predictor folder, which is used to detect the changes
+    of the kernel predictors, fusion rules and compiled package
+    """
+    signature = {}
+    if os.path.isdir(ppath):
+        for entry in os.scandir(ppath):
+            if entry.is_file():
+                stat = entry.stat()
+                signature[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return signature
+
+
+def dump_compiled_predictors(ppath):
+    """ compile the forest kernel predictors in the predictor folder and save them in a raw binary file with a json
+    manifest. The binary file holds the node arrays of all forests, each aligned to 64 bytes, and the manifest records
+    the dtype, shape and offset of each array. The compiled package is loaded by memory mapping in
+    `get_compiled_predictor_loaders`.
+
+    @params:
+
+    ppath: the folder of the kernel predictors
+    """
+    signature = get_source_signature(ppath)
+    predictors = load_kernel_predictors(ppath, compile_forest=True, use_compiled=False)
+    manifest = {"sources": signature, "predictors": {}}
+    data_file = os.path.join(ppath, __compiled_data_filename__)
+    manifest_file = os.path.join(ppath, __compiled_manifest_filename__)
+
+    # write to temporary files first, so that an interrupted compilation leaves the previous package intact
+    offset = 0
+    with open(data_file + ".tmp", "wb") as fp:
+        for pname, model in predictors.items():
+            if not isinstance(model, FlatForestRegressor):
+                continue
+            arrays = {}
+            for name, array in model.to_arrays().items():
+                padding = -offset % 64
+                fp.write(b"\0" * padding)
+                offset += padding
+                array = np.ascontiguousarray(array)
+                fp.write(array.tobytes())
+                arrays[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+                offset += array.nbytes
+            manifest["predictors"][pname] = {"n_features": int(model.n_features), "arrays": arrays}
+    with open(manifest_file + ".tmp", "w") as fp:
+        json.dump(manifest, fp, indent=4)
+    os.replace(data_file + ".tmp", data_file)
+    os.replace(manifest_file + ".tmp", manifest_file)
+    logging.keyinfo(
+        f"Compiled {len(manifest['predictors'])} kernel predictors to {data_file} ({offset / 2 ** 20:.1f} MB)"
+    )
+    return manifest
+
+
+def get_compiled_predictor_loaders(ppath):
+    """ return the loaders of the kernel predictors in the compiled package, which map the node arrays of the package
+    into memory. The node arrays are read-only views of the mapped file, so that the pages are only read when used and
+    are shared by all processes loading the same package. Return None if there is no compiled package or the package is
+    outdated compared with the kernel predictors (*.pkl).
+
+    @params:
+
+    ppath: the folder of the kernel predictors
+    """
+    manifest_file = os.path.join(ppath, __compiled_manifest_filename__)
+    if not os.path.isfile(manifest_file):
+        return None
+    with open(manifest_file, "r") as fp:
+        manifest = json.load(fp)
+    if manifest["sources"] != get_source_signature(ppath):
+        logging.warning(f"The compiled predictors in {ppath} are outdated. Please compile the predictors again.")
+        return None
+
+    loaders = {}
+    if manifest["predictors"]:
+        buffer = np.memmap(os.path.join(ppath, __compiled_data_filename__), dtype=np.uint8, mode="r")
+        for pname, info in manifest["predictors"].items():
+            loaders[pname] = partial(map_compiled_predictor, buffer, pname, info)
+
+    # the predictors could not be compiled are loaded from pickle files
+    for p in manifest["sources"]:
+        pname = p.replace(".pkl", "")
+        if pname not in loaders:
+            loaders[pname] = partial(load_pickle_predictor, os.path.join(ppath, p))
+    return loaders
+
+
+def map_compiled_predictor(buffer, pname, info):
+    logging.info(f"map compiled predictor {pname}")
+    arrays = {}
+    for name, array in info["arrays"].items():
+        dtype = np.dtype(array["dtype"])
+        count = int(np.prod(array["shape"]))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=array["offset"]).reshape(array["shape"])
+    return FlatForestRegressor(**arrays, n_features=info["n_features"])
+
+
 def check_predictors(ppath, kernel_predictors):
     """
     @params:
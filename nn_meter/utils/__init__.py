@@ -5,4 +5,5 @@ from .config_manager import (
     get_user_data_folder,
     change_user_data_folder
 )
-from .utils import download_from_url
\ No newline at end of file
+from .utils import download_from_url
+from .graph_fingerprint import get_graph_fingerprint
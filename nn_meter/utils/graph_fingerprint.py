@@ -0,0 +1,85 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import hashlib
+
+
+# the node attributes not describing the structure of the model, which are excluded from the fingerprint
+IGNORED_ATTRS = {"name"}
+
+
+def _to_json(value):
+    if hasattr(value, "tolist"):  # numpy arrays and scalars
+        return value.tolist()
+    return str(value)
+
+
+_encoder = json.JSONEncoder(sort_keys=True, default=_to_json, separators=(",", ":"))
+
+
+def get_node_label(attr):
+    """ return the canonical string of the op type, attributes and shapes of a node, excluding its name
+    """
+    return _encoder.encode({key: value for key, value in attr.items() if key not in IGNORED_ATTRS})
+
+
+def _hash(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part)
+    return digest.digest()
+
+
+def get_graph_fingerprint(graph):
+    """
+    return the canonical structural hash of a nn-Meter IR graph in hex string. The forward hash of each node is
+    computed in topological order from its label (op type, attributes and shapes) and the forward hashes of its
+    inbound nodes in order, and the backward hash in reverse topological order from its label and the sorted
+    backward hashes of its outbound nodes with the input slots. The graph hash is computed from the sorted node
+    hashes combining both directions, and the sorted edges of (source node hash, target node hash, input slot).
+    Therefore, the fingerprint is independent of the node names and the order of nodes in the graph dict, while the
+    graphs with different op types, attributes, shapes or connections (including the fan-out of nodes) get different
+    fingerprints.
+    @params:
+
+    graph: the nn-Meter IR graph in dict. The inbounds referring to the nodes out of the graph are ignored.
+    """
+    inbounds = {
+        name: [inbound for inbound in value.get("inbounds", []) if inbound in graph] for name, value in graph.items()
+    }
+    indegree = {name: len(nodes) for name, nodes in inbounds.items()}
+    succs = {name: [] for name in graph}  # list of (successor, input slot)
+    for name, nodes in inbounds.items():
+        for slot, inbound in enumerate(nodes):
+            succs[inbound].append((name, slot))
+
+    labels = {name: get_node_label(value.get("attr", {})).encode() for name, value in graph.items()}
+    order = [name for name, degree in indegree.items() if degree == 0]
+    for name in order:
+        for succ, _ in succs[name]:
+            indegree[succ] -= 1
+            if indegree[succ] == 0:
+                order.append(succ)
+    if len(order) != len(graph):
+        raise ValueError("The graph contains a cycle.")
+
+    forward = {}
+    for name in order:
+        forward[name] = _hash(labels[name], *[forward[inbound] for inbound in inbounds[name]])
+    backward = {}
+    for name in reversed(order):
+        backward[name] = _hash(labels[name], *sorted(
+            backward[succ] + slot.to_bytes(4, "little") for succ, slot in succs[name]
+        ))
+    node_hashes = {name: _hash(forward[name], backward[name]) for name in graph}
+    edges = sorted(
+        node_hashes[inbound] + node_hashes[name] + slot.to_bytes(4, "little")
+        for name, nodes in inbounds.items() for slot, inbound in enumerate(nodes)
+    )
+
+    digest = hashlib.blake2b(digest_size=16)
+    for node_hash in sorted(node_hashes.values()):
+        digest.update(node_hash)
+    for edge in edges:
+        digest.update(edge)
+    return digest.hexdigest()
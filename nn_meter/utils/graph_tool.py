@@ -8,16 +8,25 @@ logging = logging.getLogger("nn-Meter")
 
 
 class ModelGraph:
-    def __init__(self, filename=None, graph=None):
+    def __init__(self, filename=None, graph=None, copy_graph=True):
+        """
+        filename: the json file of the graph to load
+        graph: the graph in dict
+        copy_graph: if False, the given graph is owned and modified in place instead of being deep copied
+        """
         if filename is not None:
             self.graph = json.load(open(filename, "r"))
         elif graph is not None:
-            self.graph = copy.deepcopy(graph)
+            self.graph = copy.deepcopy(graph) if copy_graph else graph
         else:
             self.graph = {}
+        # the nodes whose edges are changed by the edge mutation APIs since the last refresh, or None if the graph has
+        # never been refreshed and needs a full refresh
+        self._dirty = None
 
     def node(self, name, inbound_nodes=None):
         self.graph[name] = {}
+        self.mark_dirty(name)
         if inbound_nodes is not None:
             self.graph[name]["inbounds"] = inbound_nodes
             for node in inbound_nodes:
@@ -26,8 +35,21 @@ class ModelGraph:
                 if "outbounds" not in self.graph[node].keys():
                     self.graph[node]["outbounds"] = []
                 self.graph[node]["outbounds"].append(name)
+                self.mark_dirty(node)
+
+    def refresh(self, incremental=False):
+        """
+        make the outbounds consistent with the inbounds, remove the inbounds referring to nonexistent nodes, and remove
+        the isolated nodes.
+        @params:
+        incremental: if True, only the nodes marked dirty by the edge mutation APIs (`add_edge`, `remove_edge`,
+            `remove_node`, etc.) since the last refresh are refreshed, which requires that the graph dict is not edited
+            directly since then. A full refresh is done if the graph has never been refreshed.
+        """
+        if incremental and self._dirty is not None:
+            self._refresh_dirty_nodes()
+            return
 
-    def refresh(self):
         last_remove_nodes_cnt = -1
         while True:
             for name in self.graph.keys():
@@ -59,6 +81,86 @@ class ModelGraph:
             last_remove_nodes_cnt = len(spare_nodes)
             for removing_node_name in spare_nodes:
                 del self.graph[removing_node_name]
+        self._dirty = set()
+
+    def _refresh_dirty_nodes(self):
+        dirty_nodes = [name for name in self._dirty if name in self.graph]
+        self._dirty = set()
+        if not dirty_nodes:
+            return
+
+        # the edge mutation APIs mark both ends of a changed edge dirty, so that the outbounds of a dirty node are
+        # derived from the inbounds of its clean outbounds, which are unchanged since the last refresh, and the inbounds
+        # of the dirty nodes
+        dirty_set = set(dirty_nodes)
+        dirty_succs = {name: set() for name in dirty_nodes}
+        for name in dirty_nodes:
+            node = self.graph[name]
+            node["inbounds"] = [inbound for inbound in node.get("inbounds", []) if inbound in self.graph]
+            for inbound in node["inbounds"]:
+                if inbound in dirty_set:
+                    dirty_succs[inbound].add(name)
+
+        # keep the outbounds in the same order as a full refresh, i.e., the order of the outbound nodes in the graph,
+        # with one outbound for each inbound of the outbound node
+        order = {name: index for index, name in enumerate(self.graph)}
+        for name in dirty_nodes:
+            succs = dirty_succs[name].union(
+                outbound for outbound in self.graph[name].get("outbounds", [])
+                if outbound in self.graph and outbound not in dirty_set
+            )
+            self.graph[name]["outbounds"] = [
+                succ for succ in sorted(succs, key=order.__getitem__)
+                for _ in range(self.graph[succ]["inbounds"].count(name))
+            ]
+
+        # removing isolated nodes never makes other nodes isolated, so one pass is enough
+        for name in dirty_nodes:
+            if not self.graph[name]["inbounds"] and not self.graph[name]["outbounds"]:
+                del self.graph[name]
+
+    def mark_dirty(self, name):
+        """ mark the node to be refreshed by the next incremental refresh. The edge mutation APIs mark both ends of the
+        changed edges, so that the next incremental refresh makes the outbounds consistent with the inbounds as a full
+        refresh does.
+        """
+        if self._dirty is not None:
+            self._dirty.add(name)
+
+    def add_edge(self, src, dst):
+        """ add an edge from `src` to `dst`, updating the outbounds of `src` and the inbounds of `dst`
+        """
+        self.graph[dst].setdefault("inbounds", []).append(src)
+        self.graph[src].setdefault("outbounds", []).append(dst)
+        self.mark_dirty(src)
+        self.mark_dirty(dst)
+
+    def remove_edge(self, src, dst):
+        """ remove one edge from `src` to `dst`, updating the outbounds of `src` and the inbounds of `dst`
+        """
+        self.remove_node_inbounds(dst, src)
+        self.remove_node_outbounds(src, dst)
+
+    def remove_node(self, name):
+        """ remove the node and all its edges, updating the inbounds and outbounds of its neighbors
+        """
+        node = self.graph.pop(name)
+        for inbound in set(node.get("inbounds", [])):
+            if inbound in self.graph:
+                self.graph[inbound]["outbounds"] = [
+                    outbound for outbound in self.get_node_outbounds(inbound) if outbound != name
+                ]
+                self.mark_dirty(inbound)
+        for outbound in set(node.get("outbounds", [])):
+            if outbound in self.graph:
+                self.graph[outbound]["inbounds"] = [
+                    inbound for inbound in self.get_node_inbounds(outbound) if inbound != name
+                ]
+                self.mark_dirty(outbound)
+
+    def remove_nodes(self, names):
+        for name in names:
+            self.remove_node(name)
 
     def get_graph(self):
         return self.graph
@@ -76,24 +178,42 @@ class ModelGraph:
             return []
 
     def set_node_inbounds(self, name, inbounds):
+        for inbound in self.get_node_inbounds(name):
+            self.mark_dirty(inbound)
         self.graph[name]["inbounds"] = inbounds
+        self.mark_dirty(name)
+        for inbound in inbounds:
+            self.mark_dirty(inbound)
 
     def set_node_outbounds(self, name, outbounds):
+        for outbound in self.get_node_outbounds(name):
+            self.mark_dirty(outbound)
         self.graph[name]["outbounds"] = outbounds
+        self.mark_dirty(name)
+        for outbound in outbounds:
+            self.mark_dirty(outbound)
 
     def remove_node_inbounds(self, name, inbound):
         if inbound in self.graph[name]["inbounds"]:
             self.graph[name]["inbounds"].remove(inbound)
+            self.mark_dirty(name)
+            self.mark_dirty(inbound)
 
     def remove_node_outbounds(self, name, outbound):
         if outbound in self.graph[name]["outbounds"]:
             self.graph[name]["outbounds"].remove(outbound)
+            self.mark_dirty(name)
+            self.mark_dirty(outbound)
 
     def add_node_inbounds(self, name, inbound):
         self.graph[name]["inbounds"].append(inbound)
+        self.mark_dirty(name)
+        self.mark_dirty(inbound)
 
     def add_node_outbounds(self, name, outbound):
         self.graph[name]["outbounds"].append(outbound)
+        self.mark_dirty(name)
+        self.mark_dirty(outbound)
 
     def get_graph_head(self):
         self.heads = []
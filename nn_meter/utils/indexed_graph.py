@@ -0,0 +1,340 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import numpy as np
+from bisect import insort
+from .graph_tool import ModelGraph
+
+
+class GraphNode:
+    """
+    The record of a node in `IndexedGraph`.
+    @params:
+
+    name: the node name
+
+    type: the interned op type code of the node, which indexes `IndexedGraph.type_names`
+
+    attr: the "attr" dict of the node in the dict IR, which is shared with the dict IR instead of copied
+    """
+    __slots__ = ("name", "type", "attr")
+
+    def __init__(self, name, type, attr):
+        self.name = name
+        self.type = type
+        self.attr = attr
+
+    def __repr__(self):
+        return f"GraphNode(name={self.name!r}, type={self.type})"
+
+
+class IndexedGraph:
+    """
+    An array-backed graph converted from the dict IR of `ModelGraph`. The nodes are numbered by integer ids in the order
+    of the dict IR, the op types are interned as integer codes, and the inbounds and outbounds of all nodes are stored
+    in CSR arrays, keeping the order and multiplicity of the dict IR. The inbounds and outbounds referring to nodes out
+    of the graph are dropped, the same as `ModelGraph.refresh`. The graph is not modified by itself; convert it back by
+    `to_dict` or `to_model_graph` for modification, and call `update` to follow the modified dict IR in place.
+    @params:
+
+    nodes: list of `GraphNode`
+
+    type_names: list of the op type of each type code
+
+    in_indptr, in_indices: the CSR arrays of inbounds, where the inbounds of node `i` are
+        `in_indices[in_indptr[i]: in_indptr[i + 1]]`
+
+    out_indptr, out_indices: the CSR arrays of outbounds
+    """
+    # the type code of the dead nodes removed by `update`
+    dead_type = -2
+
+    def __init__(self, nodes, type_names, in_indptr, in_indices, out_indptr, out_indices):
+        self.nodes = nodes
+        self.type_names = type_names
+        self.type_codes = {node_type: code for code, node_type in enumerate(type_names)}
+        self.index = {node.name: i for i, node in enumerate(nodes)}
+        self.n_dead = 0
+        self._types = None
+        self._in_csr = (in_indptr, in_indices)
+        self._out_csr = (out_indptr, out_indices)
+        # the adjacency lists derived from the CSR arrays, which are cached and kept up to date by `update`. The CSR
+        # arrays are derived from the adjacency lists again after `update`.
+        self._inbound_lists = None
+        self._outbound_lists = None
+        self._successors = None
+        self._type_index = None
+
+    @classmethod
+    def from_dict(cls, graph):
+        """ build the indexed graph from the dict IR of `ModelGraph`
+        """
+        index = {name: i for i, name in enumerate(graph)}
+        type_codes, type_names = {}, []
+        nodes = []
+        in_indptr, in_indices, out_indptr, out_indices = [0], [], [0], []
+        for name, value in graph.items():
+            attr = value.get("attr", {})
+            node_type = attr.get("type")
+            if node_type not in type_codes:
+                type_codes[node_type] = len(type_names)
+                type_names.append(node_type)
+            nodes.append(GraphNode(name, type_codes[node_type], attr))
+            if value.get("inbounds"):
+                in_indices += [index[inbound] for inbound in value["inbounds"] if inbound in index]
+            in_indptr.append(len(in_indices))
+            if value.get("outbounds"):
+                out_indices += [index[outbound] for outbound in value["outbounds"] if outbound in index]
+            out_indptr.append(len(out_indices))
+
+        return cls(
+            nodes, type_names,
+            np.array(in_indptr, dtype=np.int64), np.array(in_indices, dtype=np.int32),
+            np.array(out_indptr, dtype=np.int64), np.array(out_indices, dtype=np.int32)
+        )
+
+    @classmethod
+    def from_model_graph(cls, model_graph: ModelGraph):
+        return cls.from_dict(model_graph.get_graph())
+
+    def to_dict(self):
+        """ convert the indexed graph to the dict IR. The "attr" dicts are shallow copies of the node records.
+        """
+        names = [node.name if node is not None else None for node in self.nodes]
+        inbound_lists, outbound_lists = self.get_inbound_lists(), self.get_outbound_lists()
+        graph = {}
+        for i, node in enumerate(self.nodes):
+            if node is None:
+                continue
+            graph[node.name] = {
+                "attr": dict(node.attr, type=self.type_names[node.type]),
+                "inbounds": [names[j] for j in inbound_lists[i]],
+                "outbounds": [names[j] for j in outbound_lists[i]],
+            }
+        return graph
+
+    def to_model_graph(self):
+        return ModelGraph(graph=self.to_dict())
+
+    def update(self, graph, names):
+        """
+        update the indexed graph after the dict IR is modified in place, such as by `ModelGraph.fuse`, instead of
+        indexing the whole graph again. The removed nodes are kept as dead nodes, which are None in `nodes` and have no
+        type and edges, so that the ids of the live nodes stay in the order of the dict IR.
+        @params:
+
+        graph: the modified dict IR
+
+        names: the names of the removed, added and changed nodes. The added nodes should be appended to the dict IR in
+            the order of `names`. The edges of the nodes next to the removed nodes are updated without listing them.
+        """
+        inbound_lists, outbound_lists = self.get_inbound_lists(), self.get_outbound_lists()
+        succs, type_index = self.get_successors(), self.get_type_index()
+        names = list(dict.fromkeys(names))
+        # the nodes whose inbounds or outbounds are to be read from the dict IR again, in dicts as ordered sets
+        changed_in, changed_out = {}, {}
+
+        for name in names:
+            if name in self.index and name not in graph:
+                node = self.index.pop(name)
+                type_index[self.nodes[node].type].remove(node)
+                changed_out.update(dict.fromkeys(inbound_lists[node]))
+                changed_in.update(dict.fromkeys(succs[node]))
+                self._set_inbounds(node, [])
+                outbound_lists[node] = []
+                self.nodes[node] = None
+                self.n_dead += 1
+
+        for name in names:
+            if name not in graph:
+                continue
+            attr = graph[name].get("attr", {})
+            node_type = self._intern_type(attr.get("type"))
+            if name not in self.index:
+                self.index[name] = len(self.nodes)
+                self.nodes.append(GraphNode(name, node_type, attr))
+                inbound_lists.append([])
+                outbound_lists.append([])
+                succs.append([])
+                type_index.setdefault(node_type, []).append(self.index[name])
+            else:
+                node = self.index[name]
+                if self.nodes[node].type != node_type:
+                    type_index[self.nodes[node].type].remove(node)
+                    insort(type_index.setdefault(node_type, []), node)
+                self.nodes[node] = GraphNode(name, node_type, attr)
+            changed_in[self.index[name]] = None
+            changed_out[self.index[name]] = None
+
+        for node in changed_in:
+            if self.nodes[node] is not None:
+                inbounds = graph[self.nodes[node].name].get("inbounds") or []
+                self._set_inbounds(node, [self.index[inbound] for inbound in inbounds if inbound in self.index])
+        for node in changed_out:
+            if self.nodes[node] is not None:
+                outbounds = graph[self.nodes[node].name].get("outbounds") or []
+                outbound_lists[node] = [self.index[outbound] for outbound in outbounds if outbound in self.index]
+
+        self._types = self._in_csr = self._out_csr = None
+
+    def _set_inbounds(self, node, inbounds):
+        inbound_lists, succs = self.get_inbound_lists(), self.get_successors()
+        for inbound in set(inbound_lists[node]):
+            succs[inbound] = [succ for succ in succs[inbound] if succ != node]
+        for inbound in inbounds:
+            insort(succs[inbound], node)
+        inbound_lists[node] = inbounds
+
+    def _intern_type(self, node_type):
+        if node_type not in self.type_codes:
+            self.type_codes[node_type] = len(self.type_names)
+            self.type_names.append(node_type)
+        return self.type_codes[node_type]
+
+    @staticmethod
+    def _to_csr(lists):
+        indptr = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum([len(items) for items in lists], out=indptr[1:])
+        indices = np.array([item for items in lists for item in items], dtype=np.int32)
+        return indptr, indices
+
+    @property
+    def types(self):
+        if self._types is None:
+            self._types = np.array(
+                [node.type if node is not None else self.dead_type for node in self.nodes], dtype=np.int32
+            )
+        return self._types
+
+    @property
+    def in_indptr(self):
+        return self._get_in_csr()[0]
+
+    @property
+    def in_indices(self):
+        return self._get_in_csr()[1]
+
+    @property
+    def out_indptr(self):
+        return self._get_out_csr()[0]
+
+    @property
+    def out_indices(self):
+        return self._get_out_csr()[1]
+
+    def _get_in_csr(self):
+        if self._in_csr is None:
+            self._in_csr = self._to_csr(self._inbound_lists)
+        return self._in_csr
+
+    def _get_out_csr(self):
+        if self._out_csr is None:
+            self._out_csr = self._to_csr(self._outbound_lists)
+        return self._out_csr
+
+    def __len__(self):
+        """ return the number of live nodes
+        """
+        return len(self.nodes) - self.n_dead
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def get_node_id(self, name):
+        return self.index[name]
+
+    def get_node_name(self, node):
+        return self.nodes[node].name
+
+    def get_node_type(self, node):
+        return self.type_names[self.nodes[node].type]
+
+    def get_node_attr(self, node):
+        return self.nodes[node].attr
+
+    def get_type_code(self, node_type):
+        """ return the code of the op type, or -1 if no node is of the op type
+        """
+        return self.type_codes.get(node_type, -1)
+
+    def get_node_inbounds(self, node):
+        return self.in_indices[self.in_indptr[node]: self.in_indptr[node + 1]]
+
+    def get_node_outbounds(self, node):
+        return self.out_indices[self.out_indptr[node]: self.out_indptr[node + 1]]
+
+    def get_nodes_by_type(self, node_type):
+        return np.flatnonzero(self.types == self.get_type_code(node_type))
+
+    def count_edges(self, src, dst):
+        """ return the number of edges from `src` to `dst`, counted by the inbounds of `dst`
+        """
+        return int(np.count_nonzero(self.get_node_inbounds(dst) == src))
+
+    def get_inbound_lists(self):
+        """ return the inbounds of each node in python lists, which are faster than the CSR arrays to visit single nodes
+        """
+        if self._inbound_lists is None:
+            in_indptr, in_indices = self.in_indptr.tolist(), self.in_indices.tolist()
+            self._inbound_lists = [in_indices[in_indptr[i]: in_indptr[i + 1]] for i in range(len(self.nodes))]
+        return self._inbound_lists
+
+    def get_outbound_lists(self):
+        """ return the outbounds of each node in python lists
+        """
+        if self._outbound_lists is None:
+            out_indptr, out_indices = self.out_indptr.tolist(), self.out_indices.tolist()
+            self._outbound_lists = [out_indices[out_indptr[i]: out_indptr[i + 1]] for i in range(len(self.nodes))]
+        return self._outbound_lists
+
+    def get_successors(self):
+        """ return the successors of each node derived from the inbounds, with multiplicity, in the order of node ids
+        """
+        if self._successors is None:
+            succs = [[] for _ in self.nodes]
+            for node, inbounds in enumerate(self.get_inbound_lists()):
+                for inbound in inbounds:
+                    succs[inbound].append(node)
+            self._successors = succs
+        return self._successors
+
+    def get_type_index(self):
+        """ return the dict from the op type code to the list of node ids of the op type
+        """
+        if self._type_index is None:
+            type_index = {}
+            for i, node in enumerate(self.nodes):
+                if node is not None:
+                    type_index.setdefault(node.type, []).append(i)
+            self._type_index = type_index
+        return self._type_index
+
+    def topological_sort(self):
+        """ return the node ids in topological order of the edges given by inbounds, which is the same order as
+        `networkx.topological_sort(model_graph.get_networkx_graph())`. `networkx.NetworkXUnfeasible` is raised if the
+        graph contains a cycle.
+        """
+        inbound_lists = self.get_inbound_lists()
+        indegree = [len(inbounds) for inbounds in inbound_lists]
+        succs = self.get_successors()
+
+        # the networkx graph adds the inbounds of a node right after the node if they are not added yet
+        added = {}
+        for node, inbounds in enumerate(inbound_lists):
+            if self.nodes[node] is None:
+                continue
+            added[node] = None
+            for inbound in inbounds:
+                added[inbound] = None
+
+        # networkx visits the nodes generation by generation, which is the same as a FIFO queue
+        order = [node for node in added if indegree[node] == 0]
+        for node in order:
+            for succ in succs[node]:
+                indegree[succ] -= 1
+                if indegree[succ] == 0:
+                    order.append(succ)
+        if len(order) != len(self):
+            # raise the same exception as `networkx.topological_sort`
+            from networkx import NetworkXUnfeasible
+            raise NetworkXUnfeasible("Graph contains a cycle or graph changed during iteration")
+        return order
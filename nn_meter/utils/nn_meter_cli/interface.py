@@ -4,7 +4,8 @@ import sys
 import logging
 import argparse
 from .registry import register_module_cli, unregister_module_cli
-from .predictor import list_latency_predictors_cli, apply_latency_predictor_cli, get_nnmeter_ir_cli
+from .predictor import list_latency_predictors_cli, apply_latency_predictor_cli, get_nnmeter_ir_cli, \
+    compile_latency_predictor_cli, serve_latency_predictor_cli, evaluate_latency_predictor_cli
 from .builder import list_backends_cli, list_kernels_cli, list_operators_cli, list_special_testcases_cli, \
     test_backend_connection_cli, create_workspace_cli
 
@@ -104,6 +105,38 @@ def nn_meter_cli():
         nargs='+',
         help="name of the input torch model from the torchvision model zoo"
     )
+    lat_pred.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes to convert models and detect kernels in parallel (default to be 1)",
+        default=1
+    )
+    lat_pred.add_argument(
+        "--cache",
+        help="reuse the results of unchanged model files from previous predictions, which are appended to a cache file "
+             "in the user data folder",
+        action="store_true",
+        default=False
+    )
+    lat_pred.add_argument(
+        "-o", "--output",
+        type=str,
+        help="path to a jsonl file to append the prediction record of each model, including the latency, the latency "
+             "of each kernel type and the time cost of each stage"
+    )
+    lat_pred.add_argument(
+        "--resume",
+        help="skip the models already recorded in the output file",
+        action="store_true",
+        default=False
+    )
+    lat_pred.add_argument(
+        "--static-only",
+        help="convert Tensorflow models without importing tensorflow, which fails on the ops not supported by static "
+             "shape inference",
+        action="store_true",
+        default=False
+    )
     lat_pred.set_defaults(func=apply_latency_predictor_cli)
 
     # Usage 2: get nn-meter-ir model from tensorflow pbfile or onnx file
@@ -128,9 +161,133 @@ def nn_meter_cli():
         type=str,
         help="path to save the output nn-meter ir graph for tensorflow and onnx (*.json), default to be /path/to/input/file/<input_file_name>_ir.json"
     )
+    get_ir.add_argument(
+        "--static-only",
+        help="convert Tensorflow models without importing tensorflow, which fails on the ops not supported by static "
+             "shape inference",
+        action="store_true",
+        default=False
+    )
     get_ir.set_defaults(func=get_nnmeter_ir_cli)
 
-    # Usage 3: create workspace folder for nn-Meter builder 
+    # Usage 3: compile kernel predictors into a memory-mapped package for fast loading
+    # Usage: nn-meter compile --predictor <hardware>
+    compile_pred = subparsers.add_parser(
+        'compile',
+        help='compile the kernel predictors of a latency predictor into a memory-mapped package for fast loading'
+    )
+    compile_pred.add_argument(
+        "--predictor",
+        type=str,
+        help="name of target predictor (hardware)"
+    )
+    compile_pred.add_argument(
+        "--predictor-version",
+        type=float,
+        help="the version of the latency predictor (if not specified, use the lateast version)",
+        default=None
+    )
+    compile_pred.set_defaults(func=compile_latency_predictor_cli)
+
+    # Usage 4: serve a latency predictor for concurrent prediction requests
+    # Usage: nn-meter serve --predictor <hardware> --port <port>
+    serve_pred = subparsers.add_parser(
+        'serve',
+        help='serve a latency predictor as a local HTTP server, which coalesces concurrent requests into micro-batches'
+    )
+    serve_pred.add_argument(
+        "--predictor",
+        type=str,
+        help="name of target predictor (hardware)"
+    )
+    serve_pred.add_argument(
+        "--predictor-version",
+        type=float,
+        help="the version of the latency predictor (if not specified, use the lateast version)",
+        default=None
+    )
+    serve_pred.add_argument(
+        "--host",
+        type=str,
+        help="the host to listen on (default to be 127.0.0.1)",
+        default="127.0.0.1"
+    )
+    serve_pred.add_argument(
+        "--port",
+        type=int,
+        help="the port to listen on (default to be 8000)",
+        default=8000
+    )
+    serve_pred.add_argument(
+        "--unix-socket",
+        type=str,
+        help="path to a unix socket to listen on instead of the host and port"
+    )
+    serve_pred.add_argument(
+        "--max-batch-size",
+        type=int,
+        help="number of kernel feature rows to send a micro-batch to a kernel predictor immediately "
+             "(default to be 1024)",
+        default=1024
+    )
+    serve_pred.add_argument(
+        "--max-wait",
+        type=float,
+        help="maximum time in seconds for kernel feature rows to wait for a micro-batch (default to be 0.002)",
+        default=0.002
+    )
+    serve_pred.add_argument(
+        "--workers",
+        type=int,
+        help="number of threads (or processes with --processes) to convert models and detect kernels (default to be 4)",
+        default=4
+    )
+    serve_pred.add_argument(
+        "--processes",
+        help="convert models and detect kernels in worker processes instead of threads",
+        action="store_true",
+        default=False
+    )
+    serve_pred.set_defaults(func=serve_latency_predictor_cli)
+
+    # Usage 5: evaluate latency predictors on the benchmark dataset
+    # Usage: nn-meter evaluate --predictor <hardware> [<hardware> ...] --workers <num>
+    evaluate = subparsers.add_parser(
+        'evaluate',
+        help='evaluate latency predictors on the benchmark dataset in parallel'
+    )
+    evaluate.add_argument(
+        "--predictor",
+        type=str,
+        nargs='+',
+        help="names of the evaluated predictors (hardware), default to be all built-in predictors"
+    )
+    evaluate.add_argument(
+        "--dataset",
+        type=str,
+        help="path to a jsonl file or a folder of jsonl files of the dataset, "
+             "default to be the downloaded benchmark dataset"
+    )
+    evaluate.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes to evaluate the dataset shards in parallel (default to be 1)",
+        default=1
+    )
+    evaluate.add_argument(
+        "--shard-size",
+        type=int,
+        help="number of models in a dataset shard predicted in one batch (default to be 256)",
+        default=256
+    )
+    evaluate.add_argument(
+        "-o", "--output",
+        type=str,
+        help="path to a jsonl file to write the predicted and real latency of each model"
+    )
+    evaluate.set_defaults(func=evaluate_latency_predictor_cli)
+
+    # Usage 6: create workspace folder for nn-Meter builder
     # Usage: nn-meter create --tflite-workspace <path/to/workspace>
     create_workspace = subparsers.add_parser(
         'create', 
@@ -159,7 +316,7 @@ def nn_meter_cli():
     )
     create_workspace.set_defaults(func=create_workspace_cli)
 
-    # Usage 4: test the connection to backend 
+    # Usage 7: test the connection to backend
     # Usage: nn-meter connect --backend <backend-name> --workspace <path/to/workspace>
     test_connection = subparsers.add_parser(
         'connect', 
@@ -177,7 +334,7 @@ def nn_meter_cli():
     )
     test_connection.set_defaults(func=test_backend_connection_cli)
     
-    # Usage 5: register customized module 
+    # Usage 8: register customized module
     # Usage: nn-meter register --backend <path/to/meta/file>
     register = subparsers.add_parser(
         'register', 
@@ -211,7 +368,7 @@ def nn_meter_cli():
     )
     register.set_defaults(func=register_module_cli)
     
-    # Usage 6: unregister customized module 
+    # Usage 9: unregister customized module
     # Usage: nn-meter unregister --backend <path/to/meta/file>
     unregister = subparsers.add_parser(
         'unregister', 
@@ -253,7 +410,7 @@ def nn_meter_cli():
     )
     unregister.set_defaults(func=unregister_module_cli)
 
-    # Usage 7: change data folder
+    # Usage 10: change data folder
     # Usage: nn-meter set_data --data <path/to/new-folder>
     # TODO
 
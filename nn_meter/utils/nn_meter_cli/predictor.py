@@ -1,8 +1,12 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT license.
 import os
+import json
 import logging
+import jsonlines
+import multiprocessing
 from glob import glob
+from functools import partial
 from nn_meter import list_latency_predictors, load_latency_predictor, model_file_to_graph
 
 
@@ -14,6 +18,131 @@ def list_latency_predictors_cli():
     return
 
 
+class PredictionResultCache:
+    """cache of the prediction records of model files, which is reused when the model file, the predictor and the
+    `static_only` option are unchanged. The records are appended to a jsonl file in the user data folder for each
+    predictor, and only the offset of the latest record of each model file is kept in memory. The file is started over
+    when the predictor is changed.
+    """
+    def __init__(self, predictor_name, predictor_version):
+        from nn_meter.utils import get_user_data_folder
+        from nn_meter.predictor.utils import get_package_signature
+        from nn_meter.predictor.nn_meter_predictor import load_predictor_config, get_predictor_path
+        pred_info = load_predictor_config(predictor_name, predictor_version)
+        self.filename = os.path.join(
+            get_user_data_folder(), 'cache', f"{pred_info['name']}_{pred_info['version']}_results.jsonl"
+        )
+        self.signature = json.loads(json.dumps(sorted(get_package_signature(get_predictor_path(pred_info)).items())))
+        # the dict from (model file, static_only) to the file signature and the offset of the record
+        self.offsets = {}
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        if not self._load():
+            with open(self.filename, "w") as fp:
+                fp.write(json.dumps({"predictor": self.signature}) + "\n")
+        self.fp = open_output_file(self.filename, binary=True)
+
+    def _load(self):
+        """index the records in the cache file, and return False if the file is missing or made by another predictor
+        """
+        if not os.path.isfile(self.filename):
+            return False
+        offset = 0
+        with open(self.filename, "rb") as fp:
+            for i, line in enumerate(fp):
+                try:
+                    item = json.loads(line)
+                except ValueError:  # broken lines, such as the last line written by an interrupted run
+                    item = None
+                if i == 0 and not (isinstance(item, dict) and item.get("predictor") == self.signature):
+                    return False
+                if i > 0 and isinstance(item, dict) and "model" in item:
+                    self.offsets[item["model"], item["static_only"]] = (item["file"], offset)
+                offset += len(line)
+        return offset > 0
+
+    @staticmethod
+    def get_file_signature(model):
+        stat = os.stat(model)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(self, model, static_only=False):
+        if not os.path.isfile(model):
+            return None
+        file_signature, offset = self.offsets.get((os.path.abspath(model), static_only), (None, None))
+        if file_signature != self.get_file_signature(model):
+            return None
+        with open(self.filename, "rb") as fp:
+            fp.seek(offset)
+            return json.loads(fp.readline())["record"]
+
+    def put(self, model, record, static_only=False):
+        if not os.path.isfile(model):
+            return
+        item = {
+            "model": os.path.abspath(model), "static_only": static_only,
+            "file": self.get_file_signature(model), "record": record
+        }
+        offset = self.fp.seek(0, os.SEEK_END)
+        self.fp.write((json.dumps(item) + "\n").encode())
+        self.fp.flush()
+        self.offsets[item["model"], static_only] = (item["file"], offset)
+
+    def close(self):
+        self.fp.close()
+
+
+def get_model_id(model):
+    """return the identifier of a model in the output file, which is the absolute path for model files and the model
+    name for torchvision models
+    """
+    return os.path.abspath(model) if os.path.isfile(model) else model
+
+
+def load_finished_models(output):
+    """return the identifiers of the models recorded in the output jsonl file. Broken lines, such as the last line
+    written by an interrupted run, are skipped.
+    """
+    if not os.path.isfile(output):
+        return set()
+    with jsonlines.open(output) as reader:
+        return {record["model"] for record in reader.iter(type=dict, skip_invalid=True) if "model" in record}
+
+
+def open_output_file(output, binary=False):
+    """open the output jsonl file for appending records, starting from a new line if the file is not ended with one.
+    Return a `jsonlines` writer, or the file object opened in binary mode if `binary` is True.
+    """
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "ab+") as fp:
+        if fp.tell() > 0:
+            fp.seek(-1, os.SEEK_END)
+            if fp.read(1) != b"\n":
+                fp.write(b"\n")
+    if binary:
+        return open(output, "ab")
+    return jsonlines.open(output, mode="a", flush=True)
+
+
+def predict_record(predictor, model, model_type, static_only=False):
+    details = {}
+    latency = predictor.predict(model, model_type, details=details, static_only=static_only)  # in unit of ms
+    return model, {"latency": float(latency), "kernels": details["kernels"], "timings": details["timings"]}
+
+
+# the predictor loaded once in each worker process
+_worker_predictor = None
+
+
+def init_prediction_worker(predictor_name, predictor_version):
+    global _worker_predictor
+    _worker_predictor = load_latency_predictor(predictor_name, predictor_version, lazy=True)
+
+
+def predict_in_worker(model, model_type, static_only=False):
+    return predict_record(_worker_predictor, model, model_type, static_only)
+
+
 def apply_latency_predictor_cli(args):
     """apply latency predictor to predict model latency according to the command line interface arguments
     """
@@ -35,8 +164,9 @@ def apply_latency_predictor_cli(args):
         logging.keyinfo('You must specify a predictor. Use "nn-meter --list-predictors" to see all supporting predictors.')
         return
 
-    # load predictor
-    predictor = load_latency_predictor(args.predictor, args.predictor_version)
+    if args.resume and not args.output:
+        logging.keyinfo('You must specify an output file by "--output" to resume the prediction.')
+        return
 
     # specify model for prediction
     if not args.torchvision: # input of tensorflow, onnx, nnmeter-ir and nni-ir is file name, while input of torchvision is string list
@@ -50,23 +180,126 @@ def apply_latency_predictor_cli(args):
         else:
             logging.error(f'Cannot find any model satisfying the arguments.')
 
-    # predict latency
+    # skip the models recorded in the output file
+    if args.resume:
+        finished_models = load_finished_models(args.output)
+        num_models = len(input_model_list)
+        input_model_list = [model for model in input_model_list if get_model_id(model) not in finished_models]
+        logging.keyinfo(f'Skip {num_models - len(input_model_list)} models recorded in {args.output}.')
+
+    # the results are only kept in memory if no output file is specified
     result = {}
+    writer = open_output_file(args.output) if args.output else None
+
+    def report(model, record):
+        logging.result(f'[RESULT] predict latency for {os.path.basename(model)}: {record["latency"]} ms')
+        if writer:
+            writer.write({"model": get_model_id(model), **record})
+        else:
+            result[os.path.basename(model)] = record["latency"]
+
+    # reuse the results of unchanged model files
+    result_cache = None
+    if args.cache and not args.torchvision:
+        result_cache = PredictionResultCache(args.predictor, args.predictor_version)
+    pending_model_list = []
     for model in input_model_list:
-        latency = predictor.predict(model, model_type) # in unit of ms
-        result[os.path.basename(model)] = latency
-        logging.result(f'[RESULT] predict latency for {os.path.basename(model)}: {latency} ms')
-    
+        record = result_cache.get(model, args.static_only) if result_cache else None
+        if record is None:
+            pending_model_list.append(model)
+        else:
+            report(model, record)
+    if result_cache and len(pending_model_list) < len(input_model_list):
+        logging.keyinfo(f'Reuse the results of {len(input_model_list) - len(pending_model_list)} unchanged models.')
+
+    # predict latency
+    if args.workers > 1 and len(pending_model_list) > 1:
+        # convert models and detect kernels in a process pool, where each worker loads the predictor once
+        pool = multiprocessing.Pool(
+            processes=min(args.workers, len(pending_model_list)),
+            initializer=init_prediction_worker,
+            initargs=(args.predictor, args.predictor_version)
+        )
+        predictions = pool.imap_unordered(
+            partial(predict_in_worker, model_type=model_type, static_only=args.static_only), pending_model_list
+        )
+    else:
+        # load predictor
+        predictor = None
+        if pending_model_list:
+            predictor = load_latency_predictor(args.predictor, args.predictor_version, lazy=True)
+        predictions = (predict_record(predictor, model, model_type, args.static_only) for model in pending_model_list)
+
+    try:
+        for model, record in predictions:
+            report(model, record)
+            if result_cache:
+                result_cache.put(model, record, args.static_only)
+    finally:
+        if args.workers > 1 and len(pending_model_list) > 1:
+            pool.terminate()
+        if result_cache:
+            result_cache.close()
+        if writer:
+            writer.close()
+
     return result
 
 
+def serve_latency_predictor_cli(args):
+    """serve a latency predictor as a local HTTP server according to the command line interface arguments
+    """
+    from nn_meter.predictor.prediction_service import serve
+    if not args.predictor:
+        logging.keyinfo(
+            'You must specify a predictor. Use "nn-meter --list-predictors" to see all supporting predictors.'
+        )
+        return
+    predictor = load_latency_predictor(args.predictor, args.predictor_version, lazy=True)
+    serve(
+        predictor, host=args.host, port=args.port, unix_socket=args.unix_socket,
+        max_batch_size=args.max_batch_size, max_wait=args.max_wait, workers=args.workers, processes=args.processes
+    )
+
+
+def evaluate_latency_predictor_cli(args):
+    """evaluate latency predictors on the benchmark dataset according to the command line interface arguments
+    """
+    from nn_meter.dataset import evaluate_bench_dataset
+    datasets = None
+    if args.dataset:
+        if os.path.isdir(args.dataset):
+            datasets = sorted(glob(os.path.join(args.dataset, "**.jsonl")))
+        elif os.path.isfile(args.dataset):
+            datasets = [args.dataset]
+        else:
+            logging.error(f'Cannot find the dataset {args.dataset}.')
+            return
+    evaluate_bench_dataset(
+        datasets, args.predictor, workers=args.workers, shard_size=args.shard_size, output=args.output
+    )
+
+
+def compile_latency_predictor_cli(args):
+    """compile the kernel predictors of a latency predictor into a memory-mapped package according to the command line
+    interface arguments
+    """
+    from nn_meter.predictor import compile_latency_predictor
+    if not args.predictor:
+        logging.keyinfo(
+            'You must specify a predictor. Use "nn-meter --list-predictors" to see all supporting predictors.'
+        )
+        return
+    compile_latency_predictor(args.predictor, args.predictor_version)
+
+
 def get_nnmeter_ir_cli(args):
     """convert pb file or onnx file to nn-Meter IR graph according to the command line interface arguments
     """
     import json
     from nn_meter.utils.utils import NumpyEncoder
     if args.tensorflow:
-        graph = model_file_to_graph(args.tensorflow, 'pb')
+        graph = model_file_to_graph(args.tensorflow, 'pb', static_only=args.static_only)
         filename = args.output if args.output else args.tensorflow.replace(".pb", "_pb_ir.json") 
     elif args.onnx:
         graph = model_file_to_graph(args.onnx, 'onnx')
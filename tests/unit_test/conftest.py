@@ -0,0 +1,118 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import json
+import copy
+import pickle
+import pytest
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# these scripts need a nn-Meter builder workspace or change the user config, and should be run directly
+# instead of by pytest
+collect_ignore = [
+    "test_fusion_rule_detector.py",
+    "test_module_register.py",
+    "test_predictor_builder.py",
+]
+
+MODEL_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "material", "testmodels", "mobilenetv3small_0.json"
+)
+
+# the number of features of each kernel predictor
+KERNEL_FEATURES = {
+    "conv-bn-relu": 7, "dwconv-bn-relu": 7, "fc": 4, "global-avgpool": 2, "hswish": 2, "relu": 2, "se": 2, "split": 2,
+    "add": 3, "addrelu": 3, "maxpool": 5, "avgpool": 5, "bn": 2, "bnrelu": 2, "channelshuffle": 2, "concat": 6,
+}
+
+FUSION_RULES = {
+    **{f"BF_{a}_{b}": {"obey": True} for a, b in [
+        ("conv", "bn"), ("conv", "relu"), ("bn", "relu"), ("dwconv", "bn"), ("dwconv", "relu"), ("add", "relu"),
+        ("conv", "hswish"), ("dwconv", "hswish")
+    ]},
+    "BF_conv_bn_relu": {"obey": True},
+    "BF_dwconv_bn_relu": {"obey": True},
+    "BF_fc_relu": {"obey": False},
+}
+
+
+@pytest.fixture(scope="session")
+def kernel_predictors():
+    """ small random forest kernel predictors fitted on random features
+    """
+    rng = np.random.RandomState(0)
+    predictors = {}
+    for name, n_features in KERNEL_FEATURES.items():
+        X = rng.rand(200, n_features) * 200
+        y = X.sum(axis=1) * 0.01 + rng.rand(200)
+        predictors[name] = RandomForestRegressor(n_estimators=5, max_depth=8, random_state=0).fit(X, y)
+    return predictors
+
+
+@pytest.fixture(scope="session")
+def fusion_rule_file(tmp_path_factory):
+    filename = tmp_path_factory.mktemp("predictor") / "fusion_rules.json"
+    filename.write_text(json.dumps(FUSION_RULES))
+    return str(filename)
+
+
+@pytest.fixture(scope="session")
+def ir_graph():
+    with open(MODEL_FILE, "r") as fp:
+        return json.load(fp)
+
+
+def get_variant(graph, channels):
+    """ return a copy of the nn-Meter IR graph with `channels` more channels in all 4-D shapes
+    """
+    graph = copy.deepcopy(graph)
+    for value in graph.values():
+        for shape in value["attr"].get("output_shape", []) + value["attr"].get("input_shape", []):
+            if shape and len(shape) == 4:
+                shape[3] += channels
+    return graph
+
+
+@pytest.fixture(scope="session")
+def ir_graphs(ir_graph):
+    return [ir_graph] + [get_variant(ir_graph, channels) for channels in range(1, 6)]
+
+
+@pytest.fixture
+def predictor(kernel_predictors, fusion_rule_file):
+    from nn_meter.predictor.nn_meter_predictor import nnMeterPredictor
+    return nnMeterPredictor(kernel_predictors, fusion_rule_file, name="testhw", version=1.0)
+
+
+@pytest.fixture
+def predictor_package(tmp_path, kernel_predictors):
+    """ a predictor folder with the pickled kernel predictors and the fusion rules
+    """
+    ppath = tmp_path / "testhw"
+    ppath.mkdir()
+    for name, model in kernel_predictors.items():
+        with open(ppath / f"{name}.pkl", "wb") as fp:
+            pickle.dump(model, fp)
+    (ppath / "fusion_rules.json").write_text(json.dumps(FUSION_RULES))
+    return str(ppath)
+
+
+@pytest.fixture
+def registered_predictor(tmp_path, monkeypatch, predictor_package):
+    """ register the predictor folder as the predictor "testhw" of version 1.0 in a temporary user config folder
+    """
+    import yaml
+    from importlib import import_module
+    config_folder = tmp_path / "config"
+    config_folder.mkdir()
+    pred_info = {
+        "name": "testhw", "version": 1.0, "category": "cpu", "package_location": predictor_package,
+        "kernel_predictors": sorted(KERNEL_FEATURES)
+    }
+    (config_folder / "predictors.yaml").write_text(yaml.dump([pred_info]))
+    (config_folder / "settings.yaml").write_text(yaml.dump({"data_folder": str(tmp_path / "data")}))
+    modules = ["nn_meter.utils.config_manager", "nn_meter.predictor.utils", "nn_meter.predictor.predictor_registry"]
+    for module in modules:
+        monkeypatch.setattr(import_module(module), "__user_config_folder__", str(config_folder))
+    return pred_info
@@ -0,0 +1,63 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import pickle
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import RandomForestRegressor
+from nn_meter.predictor.prediction.tree_ensemble import FlatForestRegressor
+from nn_meter.predictor.utils import dump_compiled_predictors, get_compiled_predictor_loaders, load_kernel_predictors
+
+
+def get_test_features(n_features):
+    return np.random.RandomState(n_features).rand(100, n_features) * 200
+
+
+def test_compiled_predictors(predictor_package, kernel_predictors):
+    # the predictors could not be compiled are loaded from the pickle files
+    with open(os.path.join(predictor_package, "linear.pkl"), "wb") as fp:
+        pickle.dump(LinearRegression().fit(np.eye(3), np.arange(3)), fp)
+    assert get_compiled_predictor_loaders(predictor_package) is None
+    manifest = dump_compiled_predictors(predictor_package)
+    assert sorted(manifest["predictors"]) == sorted(kernel_predictors)
+
+    loaders = get_compiled_predictor_loaders(predictor_package)
+    assert sorted(loaders) == sorted(list(kernel_predictors) + ["linear"])
+    assert isinstance(loaders["linear"](), LinearRegression)
+    for name, model in kernel_predictors.items():
+        compiled = loaders[name]()
+        assert isinstance(compiled, FlatForestRegressor)
+        # the node arrays are read-only views of the mapped package
+        assert not compiled.threshold.flags.writeable
+        X = get_test_features(compiled.n_features)
+        assert np.array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_use_compiled_with_compile_forest(predictor_package):
+    dump_compiled_predictors(predictor_package)
+    # the sklearn predictors are loaded from the pickle files unless compiling the forests
+    predictors = load_kernel_predictors(predictor_package)
+    assert all(isinstance(model, RandomForestRegressor) for model in predictors.values())
+    predictors = load_kernel_predictors(predictor_package, compile_forest=True)
+    assert all(not model.threshold.flags.writeable for model in predictors.values())
+    predictors = load_kernel_predictors(predictor_package, compile_forest=True, use_compiled=False)
+    assert all(model.threshold.flags.writeable for model in predictors.values())
+
+
+def test_outdated_package(predictor_package, kernel_predictors):
+    dump_compiled_predictors(predictor_package)
+    assert get_compiled_predictor_loaders(predictor_package) is not None
+
+    # update a kernel predictor after the compilation
+    model = RandomForestRegressor(n_estimators=3, random_state=1).fit(get_test_features(2), np.arange(100))
+    with open(os.path.join(predictor_package, "relu.pkl"), "wb") as fp:
+        pickle.dump(model, fp)
+    assert get_compiled_predictor_loaders(predictor_package) is None
+    predictors = load_kernel_predictors(predictor_package, compile_forest=True)
+    X = get_test_features(2)
+    assert np.array_equal(predictors["relu"].predict(X), model.predict(X))
+
+    # the package is up to date after compiling again
+    dump_compiled_predictors(predictor_package)
+    loaders = get_compiled_predictor_loaders(predictor_package)
+    assert np.array_equal(loaders["relu"]().predict(X), model.predict(X))
@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import threading
+import pytest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from nn_meter.dataset import evaluate as evaluate_module
+from nn_meter.dataset.evaluate import evaluate_bench_dataset, get_shards, read_shard
+from nn_meter.predictor import latency_metrics
+
+
+@pytest.fixture
+def datasets(tmp_path, ir_graphs, predictor):
+    """ two jsonl files of synthetic records with blank lines, whose real latency is close to the predicted latency
+    """
+    rng = np.random.RandomState(0)
+    datasets = []
+    for i, n_records in enumerate([7, 4]):
+        filename = tmp_path / f"dataset_{i}.jsonl"
+        with open(filename, "w") as fp:
+            for j in range(n_records):
+                graph = ir_graphs[(i + j) % len(ir_graphs)]
+                real = predictor.predict(graph, "nnmeter-ir") * rng.uniform(0.9, 1.1)
+                # the latency of another device is missing in some records
+                record = {"id": f"{i}_{j}", "graph": graph, "testhw": real, "otherhw": None}
+                fp.write(json.dumps(record) + ("\n\n" if j % 3 == 0 else "\n"))
+        datasets.append(str(filename))
+    return datasets
+
+
+def read_records(filename):
+    with open(filename, "r") as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+
+def test_shards(datasets):
+    for filename in datasets:
+        for shard_size in [1, 2, 3, 100]:
+            shards = list(get_shards(filename, shard_size))
+            assert all(name == filename for name, _, _ in shards)
+            assert [count for _, _, count in shards[:-1]] == [shard_size] * (len(shards) - 1)
+            records = [record for shard in shards for record in read_shard(*shard)]
+            assert records == read_records(filename)
+
+
+def test_same_metrics_as_serial(registered_predictor, datasets, predictor, tmp_path):
+    metrics = evaluate_bench_dataset(datasets, ["testhw"], [1.0], output=str(tmp_path / "serial.jsonl"))
+    records = [record for filename in datasets for record in read_records(filename)]
+    expected = latency_metrics(
+        [predictor.predict(record["graph"], "nnmeter-ir") for record in records],
+        [record["testhw"] for record in records]
+    )
+    assert metrics["testhw"]["all"].result() == pytest.approx(expected)
+    assert metrics["testhw"][datasets[1]].count == 4
+
+    parallel = evaluate_bench_dataset(
+        datasets, ["testhw"], [1.0], workers=2, shard_size=2, output=str(tmp_path / "parallel.jsonl")
+    )
+    for filename in datasets + ["all"]:
+        assert parallel["testhw"][filename].result() == pytest.approx(metrics["testhw"][filename].result())
+    parallel_records = sorted(read_records(tmp_path / "parallel.jsonl"), key=lambda record: record["id"])
+    assert parallel_records == read_records(tmp_path / "serial.jsonl")
+
+
+def test_shards_in_flight(registered_predictor, datasets, monkeypatch):
+    # evaluate the shards in threads, recording the number of evaluated shards when each shard is read from the files
+    evaluated, evaluated_before_read = [], []
+    lock = threading.Lock()
+    evaluate_shard, get_shards = evaluate_module.evaluate_shard, evaluate_module.get_shards
+
+    def record_evaluation(*shard):
+        result = evaluate_shard(*shard)
+        with lock:
+            evaluated.append(shard)
+        return result
+
+    def record_reading(filename, shard_size):
+        for shard in get_shards(filename, shard_size):
+            with lock:
+                evaluated_before_read.append(len(evaluated))
+            yield shard
+
+    monkeypatch.setattr(evaluate_module, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(evaluate_module, "evaluate_shard", record_evaluation)
+    monkeypatch.setattr(evaluate_module, "get_shards", record_reading)
+    workers = 2
+    metrics = evaluate_bench_dataset(datasets, ["testhw"], [1.0], workers=workers, shard_size=1)
+    assert metrics["testhw"]["all"].count == len(evaluated) == 11
+    # at most 2 * workers shards are in flight
+    assert all(count >= i - 2 * workers + 1 for i, count in enumerate(evaluated_before_read))
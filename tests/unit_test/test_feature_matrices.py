@@ -0,0 +1,68 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import copy
+import pytest
+from nn_meter.predictor.prediction.utils import get_kernel_name
+from nn_meter.predictor.prediction.extract_feature import get_predict_features, get_feature_matrices
+from nn_meter.predictor.prediction.predict_by_kernel import (
+    predict_feature_matrices, nn_predict, nn_predict_batch, nn_predict_breakdown, KernelLatencyCache
+)
+
+
+def detect_kernels(predictor, graph):
+    predictor.kd.load_graph(graph)
+    return predictor.kd.get_kernels()
+
+
+def mix_fc_kernels(kernels):
+    # kernels of "fc" and "fc-relu" share the "fc" predictor but are separate ops
+    kernels = copy.deepcopy(kernels)
+    fc_kernels = [kernel for kernel in kernels if kernel["op"] == "fc"]
+    assert fc_kernels
+    for kernel in fc_kernels[::2]:
+        kernel["op"] = "fc-relu"
+    return kernels
+
+
+def test_feature_matrices(predictor, ir_graphs):
+    for graph in ir_graphs:
+        for kernels in [detect_kernels(predictor, graph), mix_fc_kernels(detect_kernels(predictor, graph))]:
+            indices, matrix_indices = [], []
+            features = get_predict_features(kernels, indices)
+            groups = get_feature_matrices(kernels, matrix_indices)
+            assert indices == matrix_indices
+
+            rows = {}
+            for kernelname, kernel_indices, matrix in groups:
+                assert matrix.shape == (len(kernel_indices), predictor.kernel_predictors[kernelname].n_features_in_)
+                rows.update(zip(kernel_indices, matrix.tolist()))
+            assert sorted(rows) == sorted(indices)
+            for layer, index in enumerate(indices):
+                assert [float(x) for x in list(features[layer].values())[0]] == rows[index]
+
+
+def test_nn_predict(predictor, ir_graphs):
+    kernels_list = []
+    for graph in ir_graphs:
+        kernels_list += [detect_kernels(predictor, graph), mix_fc_kernels(detect_kernels(predictor, graph))]
+
+    expected = []
+    for kernels in kernels_list:
+        latency = predict_feature_matrices(get_feature_matrices(kernels), predictor.kernel_predictors)
+        # predict the kernels one by one as the reference, which only differs in the order of summation
+        reference = 0
+        for layer in get_predict_features(kernels).values():
+            (op, features), = layer.items()
+            reference += predictor.kernel_predictors[get_kernel_name(op)].predict([features])[0]
+        assert latency == pytest.approx(reference)
+        expected.append(latency)
+
+    cache = KernelLatencyCache()
+    for kernels, latency in zip(kernels_list, expected):
+        assert nn_predict(predictor.kernel_predictors, kernels) == latency
+        assert nn_predict(predictor.kernel_predictors, kernels, cache) == latency
+        assert nn_predict(predictor.kernel_predictors, kernels, cache) == latency
+        breakdown = nn_predict_breakdown(predictor.kernel_predictors, kernels)
+        assert breakdown.total == latency
+    assert nn_predict_batch(predictor.kernel_predictors, kernels_list) == expected
+    assert nn_predict_batch(predictor.kernel_predictors, kernels_list, KernelLatencyCache()) == expected
@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import pytest
+import numpy as np
+from nn_meter.ir_converter import model_file_to_graph
+from nn_meter.ir_converter.frozenpb_converter.graph_def import GraphDef
+
+
+# the attributes of data types, whose values are the enums of tensorflow, e.g., 1 for float32 and 3 for int32
+TYPE_ATTRS = ["T", "dtype", "Tidx", "out_idx"]
+
+
+def add_node(graph_def, name, op, inputs=(), **attrs):
+    node = graph_def.node.add(name=name, op=op, input=list(inputs))
+    for key, value in attrs.items():
+        if key in TYPE_ATTRS:
+            node.attr[key].type = value
+        elif key == "shape":
+            for size in value:
+                node.attr[key].shape.dim.add(size=size)
+        elif isinstance(value, bool):
+            node.attr[key].b = value
+        elif isinstance(value, int):
+            node.attr[key].i = value
+        elif isinstance(value, bytes):
+            node.attr[key].s = value
+        elif isinstance(value, list):
+            node.attr[key].list.i.extend(value)
+        elif isinstance(value, np.ndarray):
+            tensor = node.attr[key].tensor
+            tensor.dtype = 3 if value.dtype == np.int32 else 1
+            for size in value.shape:
+                tensor.tensor_shape.dim.add(size=size)
+            tensor.tensor_content = value.tobytes()
+    return node
+
+
+def add_const(graph_def, name, value, read=True):
+    add_node(graph_def, name, "Const", dtype=3 if value.dtype == np.int32 else 1, value=value)
+    if not read:
+        return name
+    add_node(graph_def, f"{name}/read", "Identity", [name], T=1)
+    return f"{name}/read"
+
+
+def write_pb(filename, dynamic=False):
+    """ write a small frozen pb file of a conv block with a depthwise conv branch
+    """
+    graph_def = GraphDef()
+    conv_attrs = dict(T=1, padding=b"SAME", strides=[1, 2, 2, 1], dilations=[1, 1, 1, 1], data_format=b"NHWC")
+    add_node(graph_def, "input", "Placeholder", dtype=1, shape=[1, 32, 32, 3])
+    weight = add_const(graph_def, "conv/weight", np.ones((3, 3, 3, 8), np.float32))
+    add_node(graph_def, "conv/Conv2D", "Conv2D", ["input", weight], **conv_attrs)
+    bias = add_const(graph_def, "conv/bias", np.ones(8, np.float32))
+    add_node(graph_def, "conv/BiasAdd", "BiasAdd", ["conv/Conv2D", bias], T=1, data_format=b"NHWC")
+    add_node(graph_def, "conv/Relu6", "Relu6", ["conv/BiasAdd"], T=1)
+    weight = add_const(graph_def, "dwconv/weight", np.ones((3, 3, 8, 1), np.float32))
+    add_node(graph_def, "dwconv/depthwise", "DepthwiseConv2dNative", ["conv/Relu6", weight],
+             **dict(conv_attrs, strides=[1, 1, 1, 1]))
+    add_node(graph_def, "add", "AddV2", ["conv/Relu6", "dwconv/depthwise"], T=1)
+    add_node(graph_def, "pool", "MaxPool", ["add"], T=1, padding=b"VALID", ksize=[1, 2, 2, 1], strides=[1, 2, 2, 1],
+             data_format=b"NHWC")
+    axis = add_const(graph_def, "concat/axis", np.array(3, np.int32), read=False)
+    add_node(graph_def, "concat", "ConcatV2", ["pool", "pool", axis], T=1, N=2, Tidx=3)
+    indices = add_const(graph_def, "mean/reduction_indices", np.array([1, 2], np.int32), read=False)
+    add_node(graph_def, "mean", "Mean", ["concat", indices], T=1, Tidx=3, keep_dims=True)
+    if dynamic:
+        add_node(graph_def, "unique", "Unique", ["mean"], T=1, out_idx=3)
+    with open(filename, "wb") as fp:
+        fp.write(graph_def.SerializeToString())
+    return str(filename)
+
+
+def test_static_conversion(tmp_path):
+    graph = model_file_to_graph(write_pb(tmp_path / "model.pb"), "pb", static_only=True)
+    assert list(graph) == [
+        "input", "conv/Conv2D", "conv/BiasAdd", "conv/Relu6", "dwconv/depthwise", "add", "pool", "concat", "mean"
+    ]
+    output_shapes = {name: value["attr"]["output_shape"] for name, value in graph.items()}
+    assert output_shapes["conv/Conv2D"] == [[1, 16, 16, 8]]
+    assert output_shapes["dwconv/depthwise"] == [[1, 16, 16, 8]]
+    assert output_shapes["pool"] == [[1, 8, 8, 8]]
+    assert graph["concat"]["attr"]["attr"]["axis"] == [3]
+    assert graph["mean"]["attr"]["attr"]["reduction_indices"] == [1, 2]
+    assert graph["add"]["inbounds"] == ["conv/Relu6", "dwconv/depthwise"]
+
+
+def test_same_graph_as_tensorflow(tmp_path):
+    pytest.importorskip("tensorflow")
+    filename = write_pb(tmp_path / "model.pb")
+    assert model_file_to_graph(filename, "pb", static_only=True) == model_file_to_graph(filename, "pb")
+
+
+def test_dynamic_nodes(tmp_path):
+    with pytest.raises(ValueError, match="Unique"):
+        model_file_to_graph(write_pb(tmp_path / "model.pb", dynamic=True), "pb", static_only=True)
@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import json
+import pytest
+import numpy as np
+
+pytest.importorskip("torch")
+import nn_meter.dataset.gnn_dataloader as gnn_dataloader  # noqa: E402
+
+
+DEVICE = "cortexA76cpu_tflite21"
+
+
+def make_graph(index):
+    # input -> conv -> relu -> concat(conv, relu)
+    channels = 8 + index % 4
+    return {
+        "input": {
+            "attr": {"type": "Input", "attr": {}, "output_shape": [[1, 32, 32, 3]]},
+            "inbounds": [], "outbounds": ["conv"],
+        },
+        "conv": {
+            "attr": {
+                "type": "Conv2D", "output_shape": [[1, 32, 32, channels]],
+                "attr": {"weight_shape": [3, 3, 3, channels], "strides": [1, 1]},
+            },
+            "inbounds": ["input", "weight"], "outbounds": ["relu", "concat"],
+        },
+        "relu": {
+            "attr": {"type": "Relu", "attr": {}, "output_shape": [[1, 32, 32, channels]]},
+            "inbounds": ["conv"], "outbounds": ["concat"],
+        },
+        "concat": {
+            "attr": {"type": "ConCat", "attr": {}, "output_shape": [[1, 32, 32, 2 * channels]]},
+            "inbounds": ["conv", "relu"], "outbounds": [],
+        },
+    }
+
+
+@pytest.fixture
+def dataset_files(tmp_path, monkeypatch):
+    files = []
+    for f in range(2):
+        filename = str(tmp_path / f"models_{f}.jsonl")
+        with open(filename, "w") as fp:
+            for i in range(20):
+                record = {"id": f"m{f}_{i:02d}", "graph": make_graph(i), DEVICE: None if i % 7 == 3 else float(i + 1)}
+                fp.write(json.dumps(record) + "\n")
+        files.append(filename)
+    monkeypatch.setattr(gnn_dataloader, "bench_dataset", lambda data_folder=None: files)
+    monkeypatch.setattr(gnn_dataloader, "__user_dataset_folder__", str(tmp_path / "dataset"))
+    return files
+
+
+def test_split(dataset_files):
+    train = gnn_dataloader.GNNDataset(train=True, device=DEVICE, cache=False)
+    test = gnn_dataloader.GNNDataset(train=False, device=DEVICE, cache=False)
+    for f in range(2):
+        names = sorted(f"m{f}_{i:02d}" for i in range(20) if i % 7 != 3)
+        assert [name for name in train.name_list if name.startswith(f"m{f}_")] == names[:int(len(names) * 0.8)]
+        assert [name for name in test.name_list if name.startswith(f"m{f}_")] == names[-int(len(names) * (1 - 0.8)):]
+    assert test.latencies["m0_19"] == 20.0
+
+
+def test_item(dataset_files):
+    dataset = gnn_dataloader.GNNDataset(train=True, device=DEVICE, cache=False)
+    assert dataset.op_types == {"Input", "Conv2D", "Relu", "ConCat"}
+    (adj, attrs), latency, _ = dataset[0]
+    assert latency == 1.0
+    expected = np.eye(4, dtype=np.int32)
+    for src, dst in [(0, 1), (1, 2), (1, 3), (2, 3)]:
+        expected[src, dst] = 1
+    assert np.array_equal(np.asarray(adj), expected)
+    attrs = np.asarray(attrs)
+    assert attrs[1, dataset.opname2id["Conv2D"]] == 1
+    assert attrs[1, -6:].tolist() == [3, 8, 32, 32, 3, 1]
+    assert attrs[3, -6:].tolist() == [16, 16, 32, 32, 0, 0]
+
+
+def test_concat_channels(dataset_files):
+    # the input channels of a concat node are summed over all its inbounds, which are looked up in the same model
+    dataset = gnn_dataloader.GNNDataset(train=True, device=DEVICE, cache=False)
+    graph = make_graph(1)
+    graph["pool"] = {
+        "attr": {"type": "MaxPool", "attr": {}, "output_shape": [[1, 32, 32, 5]]},
+        "inbounds": ["input"], "outbounds": ["concat"],
+    }
+    graph["concat"]["inbounds"].append("pool")
+    graph["concat"]["attr"]["output_shape"] = [[1, 32, 32, 23]]
+    assert dataset.parse_node(graph, "concat") == [9 + 9 + 5, 23, 32, 32, 0, 0]
+
+
+def test_cache(dataset_files):
+    dataset = gnn_dataloader.GNNDataset(train=True, device=DEVICE, cache=False)
+    gnn_dataloader.GNNDataset(train=True, device=DEVICE)
+    cached = gnn_dataloader.GNNDataset(train=True, device=DEVICE)
+    assert isinstance(cached.edges, np.memmap)
+    assert cached.name_list == dataset.name_list and cached.opname2id == dataset.opname2id
+    for i in range(len(dataset)):
+        (adj, attrs), latency, _ = dataset[i]
+        (cached_adj, cached_attrs), cached_latency, _ = cached[i]
+        assert np.array_equal(np.asarray(adj), np.asarray(cached_adj))
+        assert np.array_equal(np.asarray(attrs), np.asarray(cached_attrs))
+        assert latency == cached_latency
+
+    # the cache is built again once a dataset file is changed
+    with open(dataset_files[0], "a") as fp:
+        fp.write(json.dumps({"id": "m0_99", "graph": make_graph(0), DEVICE: 5.0}) + "\n")
+    stat = os.stat(dataset_files[0])
+    os.utime(dataset_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    updated = gnn_dataloader.GNNDataset(train=False, device=DEVICE)
+    assert "m0_99" in updated.name_list
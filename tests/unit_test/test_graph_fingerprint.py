@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+from nn_meter.utils import get_graph_fingerprint
+
+
+def make_node(name, node_type, inbounds, outbounds):
+    attr = {
+        "name": name,
+        "type": node_type,
+        "attr": {"kernel_shape": [3, 3], "strides": [1, 1]} if node_type == "Conv2D" else {},
+        "input_shape": [[1, 56, 56, 32]],
+        "output_shape": [[1, 56, 56, 32]],
+    }
+    return {"attr": attr, "inbounds": inbounds, "outbounds": outbounds}
+
+
+def make_graph(edges, types):
+    graph = {}
+    for name, node_type in types.items():
+        inbounds = [src for src, dst in edges if dst == name]
+        outbounds = [dst for src, dst in edges if src == name]
+        graph[name] = make_node(name, node_type, inbounds, outbounds)
+    return graph
+
+
+TYPES = {"in": "Placeholder", "c1": "Conv2D", "c2": "Conv2D", "r1": "Relu", "r2": "Relu"}
+
+
+def test_fan_out_changes_fingerprint():
+    # in -> c1, c2; c1 -> r1; c2 -> r2
+    graph_a = make_graph([("in", "c1"), ("in", "c2"), ("c1", "r1"), ("c2", "r2")], TYPES)
+    # in -> c1, c2; c1 -> r1, r2
+    graph_b = make_graph([("in", "c1"), ("in", "c2"), ("c1", "r1"), ("c1", "r2")], TYPES)
+    assert get_graph_fingerprint(graph_a) != get_graph_fingerprint(graph_b)
+
+
+def test_input_slot_changes_fingerprint():
+    types = {"in": "Placeholder", "c": "Conv2D", "r": "Relu", "cat": "Concat"}
+    graph_a = make_graph([("in", "c"), ("in", "r"), ("c", "cat"), ("r", "cat")], types)
+    graph_b = make_graph([("in", "c"), ("in", "r"), ("r", "cat"), ("c", "cat")], types)
+    assert get_graph_fingerprint(graph_a) != get_graph_fingerprint(graph_b)
+
+
+def test_fingerprint_ignores_names_and_order():
+    edges = [("in", "c1"), ("in", "c2"), ("c1", "r1"), ("c2", "r2")]
+    graph = make_graph(edges, TYPES)
+    renamed = {f"x_{name}": name for name in reversed(list(TYPES))}
+    graph_renamed = make_graph(
+        [(f"x_{src}", f"x_{dst}") for src, dst in edges],
+        {new_name: TYPES[name] for new_name, name in renamed.items()}
+    )
+    assert list(graph_renamed) != [f"x_{name}" for name in graph]
+    assert get_graph_fingerprint(graph) == get_graph_fingerprint(graph_renamed)
+
+
+def test_attributes_change_fingerprint():
+    graph = make_graph([("in", "c1"), ("in", "c2"), ("c1", "r1"), ("c2", "r2")], TYPES)
+    fingerprint = get_graph_fingerprint(graph)
+    graph["c1"]["attr"]["attr"]["strides"] = [2, 2]
+    assert get_graph_fingerprint(graph) != fingerprint
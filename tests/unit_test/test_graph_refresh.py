@@ -0,0 +1,83 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import copy
+import random
+from nn_meter.utils.graph_tool import ModelGraph
+
+
+def make_graph(edges, names):
+    graph = {name: {"attr": {"type": "Relu", "attr": {}}, "inbounds": [], "outbounds": []} for name in names}
+    for src, dst in edges:
+        graph[dst]["inbounds"].append(src)
+    model_graph = ModelGraph(graph=graph)
+    model_graph.refresh()
+    return model_graph
+
+
+def assert_same_as_full_refresh(model_graph):
+    expected = ModelGraph(graph=copy.deepcopy(model_graph.get_graph()))
+    # a full refresh skips the inbound next to a removed inbound, so the inbounds to removed nodes are dropped first
+    for node in expected.get_graph().values():
+        node["inbounds"] = [inbound for inbound in node["inbounds"] if inbound in expected.get_graph()]
+    model_graph.refresh(incremental=True)
+    expected.refresh()
+    assert model_graph.get_graph() == expected.get_graph()
+
+
+def test_set_node_inbounds():
+    model_graph = make_graph([("a", "b"), ("a", "c")], ["a", "b", "c"])
+    model_graph.set_node_inbounds("c", ["b"])
+    model_graph.refresh(incremental=True)
+    assert model_graph.get_node_outbounds("a") == ["b"]
+    assert model_graph.get_node_outbounds("b") == ["c"]
+
+
+def test_one_sided_mutations():
+    model_graph = make_graph([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")], ["a", "b", "c", "d"])
+    model_graph.add_node_inbounds("d", "a")
+    model_graph.remove_node_inbounds("d", "b")
+    model_graph.set_node_outbounds("c", [])
+    assert_same_as_full_refresh(model_graph)
+    assert model_graph.get_node_outbounds("a") == ["b", "c", "d"]
+    assert model_graph.get_node_outbounds("c") == ["d"]
+    assert model_graph.get_node_outbounds("b") == []
+
+
+def test_random_mutations():
+    for seed in range(300):
+        rng = random.Random(seed)
+        names = [f"n{i}" for i in range(rng.randint(3, 12))]
+        edges = [(names[i], names[j]) for j in range(len(names)) for i in range(j) if rng.random() < 0.3]
+        model_graph = make_graph(edges, names)
+
+        for _ in range(rng.randint(1, 5)):
+            nodes = list(model_graph.get_graph())
+            if len(nodes) < 2:
+                break
+            src, dst = sorted(rng.sample(nodes, 2), key=nodes.index)
+            action = rng.randrange(6)
+            if action == 0:
+                model_graph.add_edge(src, dst)
+            elif action == 1:
+                model_graph.remove_edge(src, dst)
+            elif action == 2:
+                model_graph.set_node_inbounds(dst, [node for node in nodes[:nodes.index(dst)] if rng.random() < 0.3])
+            elif action == 3:
+                model_graph.add_node_inbounds(dst, src)
+            elif action == 4:
+                model_graph.remove_node_inbounds(dst, rng.choice(model_graph.get_node_inbounds(dst) or [src]))
+            else:
+                model_graph.remove_node(src)
+        assert_same_as_full_refresh(model_graph)
+
+
+def test_fuse():
+    for seed in range(100):
+        rng = random.Random(seed)
+        names = [f"n{i}" for i in range(10)]
+        edges = [(names[i], names[i + 1]) for i in range(9)]
+        edges += [(names[i], names[j]) for j in range(10) for i in range(j - 1) if rng.random() < 0.2]
+        model_graph = make_graph(edges, names)
+        start = rng.randrange(8)
+        model_graph.fuse(names[start: start + 2], "fused")
+        assert_same_as_full_refresh(model_graph)
@@ -0,0 +1,141 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import json
+import random
+import pytest
+import networkx as nx
+from nn_meter.utils.graph_tool import ModelGraph
+from nn_meter.utils.indexed_graph import IndexedGraph
+
+MODEL_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "material", "testmodels", "mobilenetv3small_0.json"
+)
+
+
+def make_random_graph(seed, n_nodes=30):
+    rng = random.Random(seed)
+    names = [f"n{i}" for i in range(n_nodes)]
+    graph = {}
+    for i, name in enumerate(names):
+        inbounds = [names[rng.randrange(i)] for _ in range(min(rng.choice([1, 1, 2, 3]), i))]
+        graph[name] = {"attr": {"type": rng.choice(["Conv2D", "Relu", "Add"]), "attr": {}}, "inbounds": inbounds}
+    model_graph = ModelGraph(graph=graph)
+    model_graph.refresh()
+    return model_graph
+
+
+def get_networkx_order(model_graph):
+    return list(nx.topological_sort(model_graph.get_networkx_graph()))
+
+
+def test_round_trip():
+    with open(MODEL_FILE, "r") as fp:
+        graph = json.load(fp)
+    model_graph = ModelGraph(graph=graph)
+    model_graph.refresh()
+    indexed = IndexedGraph.from_model_graph(model_graph)
+    assert len(indexed) == len(model_graph.get_graph())
+    assert indexed.to_dict() == model_graph.get_graph()
+    for name, value in model_graph.get_graph().items():
+        node = indexed.get_node_id(name)
+        assert indexed.get_node_type(node) == value["attr"]["type"]
+        assert [indexed.get_node_name(i) for i in indexed.get_node_inbounds(node)] == value["inbounds"]
+        assert [indexed.get_node_name(i) for i in indexed.get_node_outbounds(node)] == value["outbounds"]
+
+
+def test_topological_sort():
+    with open(MODEL_FILE, "r") as fp:
+        model_graph = ModelGraph(graph=json.load(fp))
+    model_graph.refresh()
+    for graph in [model_graph] + [make_random_graph(seed) for seed in range(20)]:
+        indexed = IndexedGraph.from_model_graph(graph)
+        assert [indexed.get_node_name(node) for node in indexed.topological_sort()] == get_networkx_order(graph)
+
+
+def test_cycle():
+    graph = {
+        "a": {"attr": {"type": "Relu", "attr": {}}, "inbounds": ["b"], "outbounds": ["b"]},
+        "b": {"attr": {"type": "Relu", "attr": {}}, "inbounds": ["a"], "outbounds": ["a"]},
+    }
+    with pytest.raises(nx.NetworkXUnfeasible):
+        IndexedGraph.from_dict(graph).topological_sort()
+
+
+def test_update_after_fuse():
+    for seed in range(20):
+        model_graph = make_random_graph(seed)
+        indexed = IndexedGraph.from_model_graph(model_graph)
+        rng = random.Random(seed)
+        start = rng.randrange(1, 28)
+        subgraph = [f"n{start}", f"n{start + 1}"]
+        model_graph.fuse(subgraph, "fused", name="fused")
+        indexed.update(model_graph.get_graph(), subgraph + ["fused"])
+
+        assert indexed.to_dict() == model_graph.get_graph()
+        assert len(indexed) == len(model_graph.get_graph())
+        for node_type in ["Conv2D", "Relu", "Add", "fused"]:
+            expected = [name for name, value in model_graph.get_graph().items() if value["attr"]["type"] == node_type]
+            names = [indexed.get_node_name(node) for node in indexed.get_nodes_by_type(node_type)]
+            assert sorted(names) == sorted(expected)
+
+
+def get_live_graph(indexed):
+    """ return the live nodes of the indexed graph by name, with their types, edges and successors
+    """
+    succs = indexed.get_successors()
+    live = {}
+    for node, graph_node in enumerate(indexed.nodes):
+        if graph_node is None:
+            continue
+        live[graph_node.name] = (
+            indexed.get_node_type(node),
+            [indexed.get_node_name(i) for i in indexed.get_node_inbounds(node)],
+            [indexed.get_node_name(i) for i in indexed.get_node_outbounds(node)],
+            [indexed.get_node_name(i) for i in succs[node]],
+        )
+    return live
+
+
+def get_topological_order(indexed):
+    # fusing a chain may create a cycle through the nodes outside the chain
+    try:
+        return [indexed.get_node_name(node) for node in indexed.topological_sort()]
+    except nx.NetworkXUnfeasible:
+        return None
+
+
+def test_update_matches_rebuild():
+    for seed in range(20):
+        model_graph = make_random_graph(seed, n_nodes=40)
+        indexed = IndexedGraph.from_model_graph(model_graph)
+        rng = random.Random(seed)
+        n_removed = 0
+        # fuse several chains, including the nodes fused before
+        for i in range(5):
+            names = list(model_graph.get_graph())
+            start = rng.randrange(len(names) - 2)
+            subgraph = names[start: start + rng.choice([2, 3])]
+            model_graph.fuse(subgraph, f"fused{i % 2}", name=f"fused_{i}")
+            indexed.update(model_graph.get_graph(), subgraph + [f"fused_{i}"])
+            n_removed += len(subgraph)
+
+            rebuilt = IndexedGraph.from_model_graph(model_graph)
+            assert get_live_graph(indexed) == get_live_graph(rebuilt)
+            assert list(get_live_graph(indexed)) == list(model_graph.get_graph())
+            assert indexed.to_dict() == rebuilt.to_dict() == model_graph.get_graph()
+            assert get_topological_order(indexed) == get_topological_order(rebuilt)
+            for node_type in ["Conv2D", "Relu", "Add", "fused0", "fused1"]:
+                assert [indexed.get_node_name(node) for node in indexed.get_nodes_by_type(node_type)] == \
+                    [rebuilt.get_node_name(node) for node in rebuilt.get_nodes_by_type(node_type)]
+
+            # the removed nodes are kept as dead nodes without type and edges
+            dead = [node for node, graph_node in enumerate(indexed.nodes) if graph_node is None]
+            assert len(dead) == indexed.n_dead == n_removed
+            assert len(indexed) == len(rebuilt) == len(indexed.nodes) - n_removed
+            assert all(name not in indexed for name in subgraph)
+            for node in dead:
+                assert indexed.types[node] == IndexedGraph.dead_type
+                assert len(indexed.get_node_inbounds(node)) == len(indexed.get_node_outbounds(node)) == 0
+                assert not indexed.get_successors()[node]
+            assert not set(dead) & (set(indexed.in_indices.tolist()) | set(indexed.out_indices.tolist()))
@@ -0,0 +1,20 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import numpy as np
+from nn_meter.predictor.prediction.utils import latency_metrics, LatencyMetrics
+
+
+def test_latency_metrics():
+    rng = np.random.RandomState(0)
+    y_true = rng.rand(1000) * 50 + 1
+    y_pred = y_true * (1 + rng.normal(scale=0.1, size=1000))
+
+    metrics = LatencyMetrics()
+    for start in range(0, 600, 60):
+        metrics.update(y_pred[start: start + 60], y_true[start: start + 60])
+    other = LatencyMetrics()
+    other.update(y_pred[600:], y_true[600:])
+    metrics.merge(other)
+
+    assert metrics.count == 1000
+    assert np.allclose(metrics.result(), latency_metrics(y_pred, y_true))
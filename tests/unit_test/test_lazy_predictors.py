@@ -0,0 +1,53 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from nn_meter.predictor.nn_meter_predictor import nnMeterPredictor
+from nn_meter.predictor.utils import LazyKernelPredictors, load_kernel_predictors
+
+
+def test_load_on_first_access(predictor_package, kernel_predictors):
+    predictors = load_kernel_predictors(predictor_package, lazy=True)
+    assert isinstance(predictors, LazyKernelPredictors)
+    # listing and checking the kernel predictors do not load them
+    assert len(predictors) == len(kernel_predictors)
+    assert sorted(predictors) == sorted(kernel_predictors)
+    assert "relu" in predictors and "gelu" not in predictors
+    assert not any(predictors.is_loaded(name) for name in kernel_predictors)
+
+    X = np.random.RandomState(0).rand(10, 2)
+    assert np.array_equal(predictors["relu"].predict(X), kernel_predictors["relu"].predict(X))
+    assert predictors["relu"] is predictors["relu"]
+    assert [name for name in kernel_predictors if predictors.is_loaded(name)] == ["relu"]
+
+    predictors.warmup(["fc", "gelu"])
+    assert sorted(name for name in kernel_predictors if predictors.is_loaded(name)) == ["fc", "relu"]
+    predictors.warmup()
+    assert all(predictors.is_loaded(name) for name in kernel_predictors)
+
+
+def test_load_once_in_threads():
+    calls = []
+
+    def loader():
+        calls.append(None)
+        time.sleep(0.05)
+        return object()
+
+    predictors = LazyKernelPredictors({"conv": loader})
+    with ThreadPoolExecutor(8) as executor:
+        loaded = list(executor.map(lambda _: predictors["conv"], range(8)))
+    assert len(calls) == 1
+    assert all(model is loaded[0] for model in loaded)
+
+
+def test_same_latency_as_eager(predictor_package, fusion_rule_file, ir_graphs):
+    eager = nnMeterPredictor(load_kernel_predictors(predictor_package), fusion_rule_file)
+    predictors = load_kernel_predictors(predictor_package, lazy=True)
+    lazy = nnMeterPredictor(predictors, fusion_rule_file)
+    for graph in ir_graphs:
+        assert lazy.predict(graph, "nnmeter-ir") == eager.predict(graph, "nnmeter-ir")
+    # only the kernel predictors of the kernels in the models are loaded
+    loaded = [name for name in predictors if predictors.is_loaded(name)]
+    assert 0 < len(loaded) < len(predictors)
@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import pytest
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from nn_meter.predictor import nnMeterPredictor, MultiDevicePredictor, ModelLatencyMemo
+
+
+@pytest.fixture
+def devices(tmp_path, kernel_predictors, fusion_rule_file):
+    """ return the arguments of `nnMeterPredictor` of three devices, where the first two devices have the same fusion
+    rules in different files
+    """
+    rng = np.random.RandomState(1)
+    other_predictors = {}
+    for name, model in kernel_predictors.items():
+        X = rng.rand(200, model.n_features_in_) * 200
+        y = X.sum(axis=1) * 0.02 + rng.rand(200)
+        other_predictors[name] = RandomForestRegressor(n_estimators=5, max_depth=8, random_state=0).fit(X, y)
+
+    with open(fusion_rule_file, "r") as fp:
+        rules = json.load(fp)
+    same_rule_file = tmp_path / "same_rules.json"
+    same_rule_file.write_text(json.dumps(rules))
+    other_rule_file = tmp_path / "other_rules.json"
+    other_rule_file.write_text(json.dumps({name: {"obey": False} for name in rules}))
+    return {
+        "a": (kernel_predictors, fusion_rule_file),
+        "b": (other_predictors, str(same_rule_file)),
+        "c": (other_predictors, str(other_rule_file)),
+    }
+
+
+@pytest.fixture
+def detections(monkeypatch):
+    """ record the number of kernel detections
+    """
+    detections = []
+    detect_graph_kernels = nnMeterPredictor._detect_graph_kernels
+
+    def record_detection(self, graph, shared, timings=None):
+        detections.append(None)
+        return detect_graph_kernels(self, graph, shared, timings)
+
+    monkeypatch.setattr(nnMeterPredictor, "_detect_graph_kernels", record_detection)
+    return detections
+
+
+def make_multi_device_predictor(devices, memo=None):
+    return MultiDevicePredictor({
+        device: nnMeterPredictor(predictors, rule_file, memo=memo, name=device, version=1.0)
+        for device, (predictors, rule_file) in devices.items()
+    })
+
+
+def test_same_latency_as_standalone(devices, detections, ir_graphs):
+    multi_device = make_multi_device_predictor(devices)
+    assert multi_device.device_groups == [["a", "b"], ["c"]]
+    standalone = {device: nnMeterPredictor(*args) for device, args in devices.items()}
+    expected = [
+        {device: predictor.predict(graph, "nnmeter-ir") for device, predictor in standalone.items()}
+        for graph in ir_graphs
+    ]
+    assert len(set(expected[0].values())) == 3
+
+    # the kernels are detected once for the devices sharing the fusion rules
+    del detections[:]
+    assert [multi_device.predict(graph, "nnmeter-ir") for graph in ir_graphs] == expected
+    assert len(detections) == 2 * len(ir_graphs)
+    del detections[:]
+    assert multi_device.predict_batch(ir_graphs, "nnmeter-ir") == expected
+    assert len(detections) == 2 * len(ir_graphs)
+
+
+def test_reuse_memo(devices, detections, ir_graphs):
+    memo = ModelLatencyMemo()
+    multi_device = make_multi_device_predictor(devices, memo)
+    expected = [multi_device.predict(graph, "nnmeter-ir") for graph in ir_graphs[:3]]
+    assert len(memo) == 3 * 3 and len(detections) == 2 * 3
+
+    # the models in the memo are not detected again
+    del detections[:]
+    assert [multi_device.predict(graph, "nnmeter-ir") for graph in ir_graphs[:3]] == expected
+    assert multi_device.predict_batch(ir_graphs[:3], "nnmeter-ir") == expected
+    assert not detections
+    latencies = multi_device.predict_batch(ir_graphs, "nnmeter-ir")
+    assert latencies[:3] == expected
+    assert len(detections) == 2 * (len(ir_graphs) - 3)
+    assert len(memo) == 3 * len(ir_graphs)
+
+    # the memo is shared with the standalone predictor of the same name and version
+    predictor = nnMeterPredictor(*devices["c"], memo=memo, name="c", version=1.0)
+    del detections[:]
+    assert [predictor.predict(graph, "nnmeter-ir") for graph in ir_graphs] == [py["c"] for py in latencies]
+    assert not detections
@@ -0,0 +1,48 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import pytest
+import numpy as np
+from nn_meter.ir_converter.onnx_converter import OnnxConverter
+from nn_meter.ir_converter.onnx_converter.utils import has_static_shape
+
+onnx = pytest.importorskip("onnx")
+from onnx import helper, numpy_helper, shape_inference, TensorProto  # noqa: E402
+
+
+def make_model(annotated=True):
+    """ make a conv-relu onnx model, where the shape of the conv output is annotated in value_info if `annotated`
+    """
+    weight = numpy_helper.from_array(np.ones((4, 3, 3, 3), np.float32), "weight")
+    nodes = [
+        helper.make_node("Conv", ["input", "weight"], ["conv"], name="conv", kernel_shape=[3, 3], pads=[1, 1, 1, 1]),
+        helper.make_node("Relu", ["conv"], ["output"], name="relu"),
+    ]
+    value_info = [helper.make_tensor_value_info("conv", TensorProto.FLOAT, [1, 4, 8, 8])] if annotated else []
+    graph = helper.make_graph(
+        nodes, "conv_relu",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, [1, 3, 8, 8])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [1, 4, 8, 8])],
+        initializer=[weight], value_info=value_info,
+    )
+    return helper.make_model(graph)
+
+
+def test_has_static_shape():
+    assert has_static_shape(helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 3, 8, 8]))
+    assert not has_static_shape(helper.make_tensor_value_info("x", TensorProto.FLOAT, ["batch", 3, 8, 8]))
+    assert not has_static_shape(helper.make_tensor_value_info("x", TensorProto.FLOAT, None))
+
+
+def test_is_fully_annotated():
+    assert OnnxConverter.is_fully_annotated(make_model().graph)
+    assert not OnnxConverter.is_fully_annotated(make_model(annotated=False).graph)
+
+
+def test_skip_shape_inference(monkeypatch):
+    expected = OnnxConverter(make_model(annotated=False)).convert()
+
+    def infer_shapes(model):
+        raise AssertionError("shape inference should be skipped for a fully annotated model")
+    monkeypatch.setattr(shape_inference, "infer_shapes", infer_shapes)
+    assert OnnxConverter(make_model()).convert() == expected
+    assert expected["conv"]["attr"]["output_shape"] == [[1, 8, 8, 4]]
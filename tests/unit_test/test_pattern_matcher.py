@@ -0,0 +1,111 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import copy
+import json
+import random
+import pytest
+from nn_meter.kernel_detector.rule_reader import RuleReader, CompiledRulesCache
+from nn_meter.kernel_detector.rule_splitter import RuleSplitter
+from nn_meter.kernel_detector.utils.match_helper import MatchHelper
+from nn_meter.kernel_detector.utils.pattern_matcher import PatternMatcher
+from nn_meter.utils.graph_tool import ModelGraph
+
+
+@pytest.fixture
+def fusion_units(tmp_path):
+    rules = {
+        f"BF_{a}_{b}": {"obey": True} for a, b in [("conv", "bn"), ("conv", "relu"), ("bn", "relu"), ("add", "relu")]
+    }
+    rules["BF_conv_bn_relu"] = {"obey": True}
+    rule_file = tmp_path / "fusion_rules.json"
+    rule_file.write_text(json.dumps(rules))
+    reader = RuleReader(str(rule_file), cache=CompiledRulesCache())
+    return [unit for units in reader.fusion_units.values() for unit in units]
+
+
+def make_random_graph(rng, n_nodes, units, types):
+    graph = {}
+    names = [f"n{i}" for i in range(n_nodes)]
+    for i, name in enumerate(names):
+        n_inbounds = min(rng.choice([0, 1, 1, 1, 2, 2, 3]), i)
+        inbounds = [names[rng.randrange(max(0, i - 6), i)] for _ in range(n_inbounds)]
+        graph[name] = {"attr": {"type": rng.choice(types), "attr": {}}, "inbounds": inbounds, "outbounds": []}
+
+    # embed some fusion units, connecting their inputs to the random graph
+    for _ in range(n_nodes // 8):
+        unit = rng.choice(units)
+        prefix = f"p{rng.randrange(10 ** 6)}/"
+        anchor = rng.choice(list(graph))
+        for name, value in unit.get_graph().items():
+            node_type = value["attr"]["type"]
+            inbounds = [prefix + inbound for inbound in value.get("inbounds", [])]
+            if not inbounds and rng.random() < 0.5:
+                inbounds = [anchor]
+            graph[prefix + name] = {
+                "attr": {"type": node_type if node_type != "dummy" else rng.choice(types), "attr": {}},
+                "inbounds": inbounds, "outbounds": []
+            }
+    for name, value in graph.items():
+        for inbound in value["inbounds"]:
+            graph[inbound]["outbounds"].append(name)
+    return ModelGraph(graph=graph)
+
+
+def get_matches(matches):
+    # keep the order of the matches and the order of the keys in each match
+    return [list(match.items()) for match in matches]
+
+
+def test_same_matches_as_vf2(fusion_units):
+    types = sorted({value["attr"]["type"] for unit in fusion_units for value in unit.get_graph().values()} - {"dummy"})
+    rng = random.Random(0)
+    total = 0
+    for _ in range(60):
+        model_graph = make_random_graph(rng, rng.randrange(5, 60), fusion_units, types)
+        if rng.random() < 0.2:
+            for name in rng.sample(list(model_graph.get_graph()), 2):
+                model_graph.get_graph()[name]["attr"]["attr"]["_tagged"] = ""
+        for unit in fusion_units:
+            expected = get_matches(model_graph.find_subgraphs(unit, MatchHelper.op_type_matcher))
+            assert get_matches(PatternMatcher(unit).find_subgraphs(model_graph)) == expected
+            total += len(expected)
+    assert total > 0
+
+
+def fuse_by_vf2(model_graph, reader):
+    # the multi-op block fusion of `RuleSplitter` by the networkx VF2 matcher, where the first of the overlapping
+    # matches is fused
+    for type, blocks in reader.fusion_units.items():
+        for block in blocks:
+            for subgraph in model_graph.find_subgraphs(block, MatchHelper.op_type_matcher):
+                model_graph.fuse(subgraph.keys(), type)
+
+
+def make_shuffle_chain(n_nodes):
+    # a chain of reshape and transpose nodes with a branch, where the channelshuffle units overlap
+    graph, inbounds = {}, {}
+    for i in range(n_nodes):
+        inbounds[f"n{i}"] = [f"n{i - 1}"] if i else []
+    inbounds[f"n{n_nodes}"] = ["n2"]
+    inbounds[f"n{n_nodes + 1}"] = [f"n{n_nodes}"]
+    for i, (name, value) in enumerate(inbounds.items()):
+        node_type = "reshape" if i % 2 == 0 else "transpose"
+        graph[name] = {"attr": {"type": node_type, "attr": {}}, "inbounds": value, "outbounds": []}
+    for name, value in graph.items():
+        for inbound in value["inbounds"]:
+            graph[inbound]["outbounds"].append(name)
+    return ModelGraph(graph=graph)
+
+
+def test_same_fusion_as_vf2(fusion_rule_file):
+    reader = RuleReader(fusion_rule_file, cache=CompiledRulesCache())
+    units = [unit for units in reader.fusion_units.values() for unit in units]
+    types = sorted({value["attr"]["type"] for unit in units for value in unit.get_graph().values()} - {"dummy"})
+    rng = random.Random(1)
+    model_graphs = [make_shuffle_chain(n_nodes) for n_nodes in range(3, 12)]
+    model_graphs += [make_random_graph(rng, rng.randrange(5, 80), units, types) for _ in range(60)]
+    for model_graph in model_graphs:
+        expected = ModelGraph(graph=copy.deepcopy(model_graph.get_graph()))
+        fuse_by_vf2(expected, reader)
+        RuleSplitter(reader).fuse_multiop_blocks(model_graph)
+        assert list(model_graph.get_graph().items()) == list(expected.get_graph().items())
@@ -0,0 +1,57 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import json
+import asyncio
+import pytest
+from nn_meter.predictor import PredictionService
+from nn_meter.predictor.prediction_service import start_server
+
+
+async def predict_concurrently(predictor, graphs, **kwargs):
+    async with PredictionService(predictor, max_wait=0.01, workers=2, **kwargs) as service:
+        latencies = await asyncio.gather(*[service.predict(graph, "nnmeter-ir") for graph in graphs])
+        return latencies, service.stats()
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_service_batching(predictor, ir_graphs, processes):
+    graphs = ir_graphs * 5
+    expected = [predictor.predict(graph, "nnmeter-ir") for graph in graphs]
+    latencies, stats = asyncio.run(predict_concurrently(predictor, graphs, processes=processes))
+    assert latencies == expected
+    assert stats["requests"] == len(graphs)
+    # the rows of concurrent requests are coalesced into micro-batches
+    assert stats["batches"] < stats["rows"]
+    assert stats["mean_batch_size"] > 1
+
+
+async def request(port, method, path, content=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(content).encode() if content is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+def test_http_server(predictor, ir_graph):
+    async def main():
+        async with PredictionService(predictor) as service:
+            server = await start_server(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                predicted = await request(port, "POST", "/predict", {"model": ir_graph, "model_type": "nnmeter-ir"})
+                stats = await request(port, "GET", "/stats")
+                bad_request = await request(port, "POST", "/predict", {"model": ir_graph})
+                not_found = await request(port, "GET", "/unknown")
+        return predicted, stats, bad_request, not_found
+
+    predicted, stats, bad_request, not_found = asyncio.run(main())
+    assert predicted == (200, {"latency": predictor.predict(ir_graph, "nnmeter-ir")})
+    assert stats[0] == 200 and stats[1]["requests"] == 1
+    assert bad_request[0] == 400
+    assert not_found[0] == 404
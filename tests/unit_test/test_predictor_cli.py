@@ -0,0 +1,123 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import json
+import argparse
+import pytest
+from nn_meter.utils.nn_meter_cli import predictor as predictor_cli
+from nn_meter.utils.nn_meter_cli.predictor import apply_latency_predictor_cli, load_finished_models, \
+    open_output_file
+
+
+@pytest.fixture
+def model_folder(tmp_path, ir_graphs):
+    folder = tmp_path / "models"
+    folder.mkdir()
+    for i, graph in enumerate(ir_graphs[:4]):
+        (folder / f"model_{i}.json").write_text(json.dumps(graph))
+    return str(folder)
+
+
+@pytest.fixture
+def predicted(monkeypatch):
+    """ record the file name and the `static_only` option of the models predicted by the CLI
+    """
+    predicted = []
+    predict_record = predictor_cli.predict_record
+
+    def record_prediction(predictor, model, model_type, static_only=False):
+        predicted.append((os.path.basename(model), static_only))
+        return predict_record(predictor, model, model_type, static_only)
+
+    monkeypatch.setattr(predictor_cli, "predict_record", record_prediction)
+    return predicted
+
+
+def make_args(model_folder, **kwargs):
+    args = dict(
+        tensorflow=None, onnx=None, nn_meter_ir=model_folder, torchvision=None, predictor="testhw",
+        predictor_version=1.0, workers=1, cache=False, output=None, resume=False, static_only=False
+    )
+    args.update(kwargs)
+    return argparse.Namespace(**args)
+
+
+def test_predict_with_workers(registered_predictor, model_folder, predictor):
+    result = apply_latency_predictor_cli(make_args(model_folder))
+    assert result == {
+        name: predictor.predict(os.path.join(model_folder, name), "nnmeter-ir") for name in os.listdir(model_folder)
+    }
+    assert apply_latency_predictor_cli(make_args(model_folder, workers=2)) == result
+
+
+def test_reuse_cached_results(registered_predictor, model_folder, predicted):
+    result = apply_latency_predictor_cli(make_args(model_folder, cache=True))
+    assert len(predicted) == 4
+    # all results are reused
+    assert apply_latency_predictor_cli(make_args(model_folder, cache=True)) == result
+    assert len(predicted) == 4
+
+    # the changed model files and the results of another `static_only` option are not reused
+    model = os.path.join(model_folder, "model_1.json")
+    os.utime(model, ns=(os.stat(model).st_atime_ns, os.stat(model).st_mtime_ns + 10 ** 9))
+    assert apply_latency_predictor_cli(make_args(model_folder, cache=True)) == result
+    assert predicted[4:] == [("model_1.json", False)]
+    assert apply_latency_predictor_cli(make_args(model_folder, cache=True, static_only=True)) == result
+    assert sorted(predicted[5:]) == [(f"model_{i}.json", True) for i in range(4)]
+
+    # a broken line written by an interrupted run is skipped, and the cache is not used without `cache`
+    cache = predictor_cli.PredictionResultCache("testhw", 1.0)
+    cache.close()
+    with open(cache.filename, "a") as fp:
+        fp.write('{"model": "broken')
+    assert apply_latency_predictor_cli(make_args(model_folder, cache=True)) == result
+    assert len(predicted) == 9
+    assert apply_latency_predictor_cli(make_args(model_folder)) == result
+    assert len(predicted) == 13
+
+    # the cache is started over when the predictor is changed
+    with open(os.path.join(registered_predictor["package_location"], "fusion_rules.json"), "a") as fp:
+        fp.write("\n")
+    assert apply_latency_predictor_cli(make_args(model_folder, cache=True)) == result
+    assert len(predicted) == 17
+
+
+def test_output_file(tmp_path):
+    output = str(tmp_path / "output" / "results.jsonl")
+    assert load_finished_models(output) == set()
+    with open_output_file(output) as writer:
+        writer.write({"model": "a", "latency": 1.0})
+    # a truncated last line is skipped, and the next record starts from a new line
+    with open(output, "a") as fp:
+        fp.write('{"model": "b", "lat')
+    assert load_finished_models(output) == {"a"}
+    with open_output_file(output) as writer:
+        writer.write({"model": "c", "latency": 3.0})
+    with open(output, "r") as fp:
+        assert fp.read().splitlines()[1:] == ['{"model": "b", "lat', '{"model": "c", "latency": 3.0}']
+    assert load_finished_models(output) == {"a", "c"}
+
+
+def test_resume(registered_predictor, model_folder, tmp_path, predicted, predictor):
+    output = str(tmp_path / "results.jsonl")
+    models = sorted(os.listdir(model_folder))
+    expected = {name: predictor.predict(os.path.join(model_folder, name), "nnmeter-ir") for name in models}
+
+    # an interrupted run, which records two models and leaves a truncated line
+    with open_output_file(output) as writer:
+        for name in models[:2]:
+            writer.write({"model": os.path.join(model_folder, name), "latency": expected[name]})
+    with open(output, "a") as fp:
+        fp.write('{"model": "%s", "latency"' % os.path.join(model_folder, models[2]))
+
+    apply_latency_predictor_cli(make_args(model_folder, output=output, resume=True))
+    assert predicted == [(name, False) for name in models[2:]]
+    with open(output, "r") as fp:
+        lines = fp.read().splitlines()
+    records = [json.loads(line) for i, line in enumerate(lines) if i != 2]
+    assert {os.path.basename(record["model"]): record["latency"] for record in records} == expected
+    assert load_finished_models(output) == {os.path.join(model_folder, name) for name in models}
+
+    # all models are finished
+    apply_latency_predictor_cli(make_args(model_folder, output=output, resume=True))
+    assert predicted == [(name, False) for name in models[2:]]
@@ -0,0 +1,100 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import shutil
+import yaml
+import pytest
+from importlib import import_module
+from nn_meter.predictor import PredictorRegistry, load_latency_predictor, predictor_registry
+
+# the module of the registry, whose name is taken by the process-wide registry in `nn_meter.predictor`
+registry_module = import_module("nn_meter.predictor.predictor_registry")
+
+
+@pytest.fixture
+def loaded(monkeypatch):
+    """ record the predictor information of each predictor loaded by the registry
+    """
+    loaded = []
+    load_predictor_by_info = registry_module.load_predictor_by_info
+
+    def record_loading(pred_info, **kwargs):
+        loaded.append((pred_info["name"], pred_info["version"]))
+        return load_predictor_by_info(pred_info, **kwargs)
+
+    monkeypatch.setattr(registry_module, "load_predictor_by_info", record_loading)
+    return loaded
+
+
+def write_predictors_config(pred_infos):
+    config_file = os.path.join(registry_module.__user_config_folder__, "predictors.yaml")
+    with open(config_file, "w") as fp:
+        yaml.dump(pred_infos, fp)
+    # make sure the modification time is changed
+    stat = os.stat(config_file)
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_get_and_evict(registered_predictor, loaded, tmp_path):
+    registry = PredictorRegistry()
+    predictor = registry.get("testhw", 1.0)
+    assert registry.get("testhw", 1.0) is predictor
+    assert registry.get("testhw") is predictor
+    assert ("testhw", 1.0, os.path.abspath(registered_predictor["package_location"])) in registry
+    assert loaded == [("testhw", 1.0)]
+
+    # the same name and version in another package path is another predictor
+    package_copy = str(tmp_path / "testhw_copy")
+    shutil.copytree(registered_predictor["package_location"], package_copy)
+    write_predictors_config([
+        registered_predictor, dict(registered_predictor, version=2.0),
+    ])
+    other_version = registry.get("testhw", 2.0)
+    assert other_version is not predictor
+    write_predictors_config([dict(registered_predictor, package_location=package_copy)])
+    other_path = registry.get("testhw", 1.0)
+    assert other_path is not predictor and other_path is not other_version
+    assert registry.get("testhw", 1.0) is other_path
+    assert len(registry) == 3
+    assert loaded == [("testhw", 1.0), ("testhw", 2.0), ("testhw", 1.0)]
+
+    assert registry.evict("testhw", 2.0) == 1
+    assert registry.evict("testhw") == 2
+    assert registry.evict("testhw") == 0
+    assert len(registry) == 0
+    assert registry.get("testhw", 1.0) is not other_path
+    assert len(loaded) == 4
+
+
+def test_reload(registered_predictor, loaded):
+    registry = PredictorRegistry()
+    predictor = registry.get("testhw", 1.0)
+    reloaded = registry.reload("testhw", 1.0)
+    assert reloaded is not predictor
+    assert registry.get("testhw", 1.0) is reloaded
+    assert len(registry) == 1 and len(loaded) == 2
+
+
+def test_reload_changed_package(registered_predictor, loaded, ir_graph):
+    registry = PredictorRegistry()
+    predictor = registry.get("testhw", 1.0)
+    latency = predictor.predict(ir_graph, "nnmeter-ir")
+
+    # change the fusion rules, which changes the package signature
+    rule_file = os.path.join(registered_predictor["package_location"], "fusion_rules.json")
+    with open(rule_file, "a") as fp:
+        fp.write("\n")
+    reloaded = registry.get("testhw", 1.0)
+    assert reloaded is not predictor
+    assert registry.get("testhw", 1.0) is reloaded
+    assert reloaded.predict(ir_graph, "nnmeter-ir") == latency
+    assert len(registry) == 1 and len(loaded) == 2
+
+
+def test_shared_predictor(registered_predictor):
+    try:
+        predictor = load_latency_predictor("testhw", 1.0, shared=True)
+        assert load_latency_predictor("testhw", 1.0, shared=True) is predictor
+        assert load_latency_predictor("testhw", 1.0) is not predictor
+    finally:
+        predictor_registry.evict("testhw")
@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import os
+import json
+from nn_meter.kernel_detector import rule_reader
+from nn_meter.kernel_detector.rule_reader import RuleReader, CompiledRulesCache
+
+
+RULES = {"BF_conv_bn": {"obey": True}, "BF_conv_bn_relu": {"obey": True}, "BF_fc_relu": {"obey": False}}
+
+
+def write_rules(filename, rules):
+    with open(filename, "w") as fp:
+        json.dump(rules, fp)
+    return str(filename)
+
+
+def test_cache_by_content(tmp_path):
+    cache = CompiledRulesCache()
+    rule_a = write_rules(tmp_path / "a.json", RULES)
+    rule_b = write_rules(tmp_path / "b.json", RULES)
+    rule_c = write_rules(tmp_path / "c.json", dict(RULES, BF_fc_relu={"obey": True}))
+
+    reader = RuleReader(rule_a, cache=cache)
+    assert len(cache) == 1
+    assert RuleReader(rule_b, cache=cache).compiled is reader.compiled
+    assert RuleReader(rule_c, cache=cache).compiled is not reader.compiled
+    assert len(cache) == 2
+    assert reader.is_fusible("conv", "bn") and not reader.is_fusible("fc", "relu")
+    assert "conv-bn-relu" in reader.fusion_units and "se" in reader.fusion_units
+
+
+def test_persistent_cache(tmp_path):
+    rule_file = write_rules(tmp_path / "rules.json", RULES)
+    folder = str(tmp_path / "compiled")
+    reader = RuleReader(rule_file, cache=CompiledRulesCache(folder))
+    assert len(os.listdir(folder)) == 1
+
+    loaded = RuleReader(rule_file, cache=CompiledRulesCache(folder))
+    assert loaded.compiled is not reader.compiled
+    assert loaded.rules == reader.rules and loaded.fusible == reader.fusible
+    assert set(loaded.matchers) == set(reader.matchers)
+
+
+def test_persistent_cache_signature(tmp_path, monkeypatch):
+    rule_file = write_rules(tmp_path / "rules.json", RULES)
+    folder = str(tmp_path / "compiled")
+    RuleReader(rule_file, cache=CompiledRulesCache(folder))
+
+    # the pickled rules of another nn-Meter version or fusion library are not loaded
+    monkeypatch.setattr(rule_reader, "get_compiled_rules_signature", lambda: "another version")
+    RuleReader(rule_file, cache=CompiledRulesCache(folder))
+    assert len(os.listdir(folder)) == 2
+
+
+def test_empty_cache_is_used(tmp_path):
+    cache = CompiledRulesCache()
+    assert len(cache) == 0
+    RuleReader(write_rules(tmp_path / "rules.json", RULES), cache=cache)
+    assert len(cache) == 1
@@ -0,0 +1,42 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT license.
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, ExtraTreesRegressor
+from nn_meter.predictor.prediction.tree_ensemble import FlatForestRegressor
+from nn_meter.predictor.utils import compile_kernel_predictor
+
+
+def make_data(n_samples, n_features, seed):
+    rng = np.random.RandomState(seed)
+    # integer-like features as the kernel features, with many ties at the split thresholds
+    X = rng.randint(1, 512, size=(n_samples, n_features)).astype(float)
+    y = X @ rng.rand(n_features) * 1e-3 + rng.rand(n_samples)
+    return X, y
+
+
+def test_random_forest():
+    X, y = make_data(500, 7, 0)
+    for params in [dict(n_estimators=20, max_depth=None), dict(n_estimators=10, max_depth=5, bootstrap=False)]:
+        forest = RandomForestRegressor(random_state=0, **params).fit(X, y)
+        flat = FlatForestRegressor.from_sklearn(forest)
+        assert flat.n_estimators == len(forest.estimators_)
+        X_test, _ = make_data(300, 7, 1)
+        X_test = np.concatenate([X_test, X[:50]])
+        assert np.array_equal(flat.predict(X_test), forest.predict(X_test))
+
+
+def test_extra_trees():
+    X, y = make_data(300, 4, 2)
+    forest = ExtraTreesRegressor(n_estimators=15, random_state=0).fit(X, y)
+    flat = compile_kernel_predictor(forest)
+    assert isinstance(flat, FlatForestRegressor)
+    assert np.array_equal(flat.predict(X), forest.predict(X))
+
+
+def test_arrays_round_trip():
+    X, y = make_data(200, 5, 3)
+    forest = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    flat = FlatForestRegressor.from_sklearn(forest)
+    copied = FlatForestRegressor(**flat.to_arrays(), n_features=flat.n_features)
+    assert np.array_equal(copied.predict(X), forest.predict(X))
+    assert np.array_equal(flat.predict(X[:1]), forest.predict(X[:1]))